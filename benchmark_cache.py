@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+
+def measure(function, num_iterations):
+    """
+    Median time of a call of the function, in microseconds.
+    """
+    times = []
+    for i in range(num_iterations):
+        start = time.perf_counter()
+        function(i)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return 1e6 * times[len(times) // 2]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the latency of hits and writes of the cache backends (locmem, file, sqlite).')
+
+    parser.add_argument('sizes', type=int, nargs='*', default=[100, 10000, 100000], help='sizes of the cached values, in bytes')
+    parser.add_argument('-n', '--num_iterations', type=int, nargs='?', default=2000, help='number of operations for each measure')
+    parser.add_argument('-k', '--num_keys', type=int, nargs='?', default=100, help='number of cached values')
+    parser.add_argument('--seed', type=int, nargs='?', default=0, help='random seed')
+
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mtt.settings')
+    import django
+    django.setup()
+
+    from django.core.cache.backends.locmem import LocMemCache
+    from django.core.cache.backends.filebased import FileBasedCache
+    from tournament.sqlite_cache import SQLiteCache
+
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        params = {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': 10 * args.num_keys}}
+        backends = [
+            ('locmem', LocMemCache('benchmark', params)),
+            ('file', FileBasedCache(os.path.join(directory, 'file'), params)),
+            ('sqlite', SQLiteCache(os.path.join(directory, 'cache.sqlite3'), params)),
+        ]
+
+        print('{:>8} {:>8} {:>12} {:>12} {:>12}'.format('size', 'backend', 'hit (us)', 'miss (us)', 'set (us)'))
+        for size in args.sizes:
+            # a page-like value
+            value = (bytes(rng.getrandbits(8) for i in range(size)), 'text/html; charset=utf-8')
+            for (name, backend) in backends:
+                backend.clear()
+                for k in range(args.num_keys):
+                    backend.set('key-%d' % k, value)
+
+                hit = measure(lambda i: backend.get('key-%d' % (i % args.num_keys)), args.num_iterations)
+                miss = measure(lambda i: backend.get('missing-%d' % i), args.num_iterations)
+                write = measure(lambda i: backend.set('key-%d' % (i % args.num_keys), value), args.num_iterations)
+                print('{:>8} {:>8} {:>12.1f} {:>12.1f} {:>12.1f}'.format(size, name, hit, miss, write))
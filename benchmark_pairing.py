@@ -0,0 +1,242 @@
+import os
+import sys
+import time
+import random
+import argparse
+import itertools
+
+
+def random_swiss_instance(num_teams, num_rounds, rng):
+    """
+    Generate teams, integer scores and previous pairs/byes similar to those of a Swiss tournament
+    after the given number of rounds.
+    """
+    teams = list(range(1, num_teams+1))
+    scores = {team: 0 for team in teams}
+    previous_pairs = set()
+    previous_byes = set()
+    for r in range(num_rounds):
+        queue = sorted(teams, key=lambda team: (-scores[team], rng.random()))
+        if len(queue) % 2 == 1:
+            bye = queue.pop()
+            previous_byes.add(bye)
+            scores[bye] += 1030
+        for a, b in zip(queue[::2], queue[1::2]):
+            previous_pairs.add((min(a, b), max(a, b)))
+            secondary = rng.randint(0, 6)
+            scores[a] += 1000 + 10 * secondary
+            scores[b] += 10 * (6 - secondary)
+    return teams, scores, previous_pairs, previous_byes
+
+
+def score_groups_instance(num_teams, num_groups, rng):
+    """
+    Generate teams split into the given number of score groups,
+    with 5% of the pairs already played.
+    """
+    teams = list(range(1, num_teams+1))
+    values = sorted(rng.sample(range(100 * num_groups), num_groups))
+    scores = {team: values[(team-1) * num_groups // num_teams] for team in teams}
+    previous_pairs = set((a, b) for (a, b) in itertools.combinations(teams, 2) if rng.random() < 0.05)
+    return teams, scores, previous_pairs, set()
+
+
+def legacy_pairing(pairing, engine, teams, scores, previous_pairs, previous_byes):
+    """
+    Pair teams with the old weights -penalty * M ** level, where M = len(teams) * (max score - min score) + 1.
+    Return the pairs (as vertices) and the number of bits of the largest weight.
+    """
+    edges, num_levels = pairing.pairing_edges(teams, scores, previous_pairs, previous_byes)
+    M = len(teams) * (max(scores.values()) - min(scores.values())) + 1
+    weighted_edges = [(i, j, -penalty * M ** level) for (i, j, level, penalty) in edges]
+    pairs = engine.matching(len(teams) + len(teams) % 2, weighted_edges, maxcardinality=True)
+    return pairs, max(abs(w) for (i, j, w) in weighted_edges).bit_length()
+
+
+def benchmark_score_groups(pairing, args):
+    """
+    Compare the running time of the matching with the old weights M ** level and with the bounded ones,
+    and the number of bits of their largest weights.
+    """
+    engine = pairing.get_pairing_engine()
+    rng = random.Random(args.seed)
+
+    print('{:>6} {:>12} {:>8} {:>12} {:>8}'.format('groups', 'M**level', '(bits)', 'bounded', '(bits)'))
+
+    for num_groups in args.score_groups:
+        instance = score_groups_instance(args.num_teams, num_groups, rng)
+
+        start = time.perf_counter()
+        pairs, bits = legacy_pairing(pairing, engine, *instance)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pairing.pair_teams(*instance, engine=engine)
+        bounded_time = time.perf_counter() - start
+
+        edges, num_levels = pairing.pairing_edges(*instance)
+        multipliers = pairing.level_multipliers(pairing.level_bounds(edges, num_levels))
+        bounded_bits = max(penalty * multipliers[level] for (i, j, level, penalty) in edges).bit_length()
+
+        print('{:>6} {:>12.3f} {:>8} {:>12.3f} {:>8}'.format(num_groups, legacy_time, bits, bounded_time, bounded_bits), flush=True)
+
+
+def benchmark_tables(pairing, args):
+    """
+    Compare the running time of the table assignment (with 20% more tables than pairs).
+    """
+    from tournament.assignment import max_weight_assignment, scipy_linear_sum_assignment
+    engine = pairing.BlossomEngine()
+    rng = random.Random(args.seed)
+
+    print('{:>6} {:>7} {:>10} {:>10} {:>12}'.format('pairs', 'tables', 'scipy (s)', 'python (s)', 'blossom (s)'))
+
+    for num_pairs in args.sizes:
+        pairs = [(2*i, 2*i+1) for i in range(num_pairs)]
+        tables = [(j, rng.randint(0, 100)) for j in range(num_pairs + num_pairs // 5)]
+        previous_tables = {table: set(rng.sample(range(2*num_pairs), min(2*num_pairs, 40))) for (table, priority) in tables}
+        weights = pairing.table_weights(pairs, tables, previous_tables)
+
+        times = []
+        totals = set()
+        for use_scipy in (True, False):
+            if use_scipy and scipy_linear_sum_assignment is None:
+                times.append(None)
+                continue
+            start = time.perf_counter()
+            assignment = max_weight_assignment(weights, use_scipy=use_scipy)
+            times.append(time.perf_counter() - start)
+            totals.add(sum(weights[i][j] for (i, j) in assignment))
+
+        if num_pairs <= args.reference_max // 4:
+            edges = [(i, num_pairs + j, weights[i][j]) for i in range(num_pairs) for j in range(len(tables))]
+            start = time.perf_counter()
+            matching = engine.matching(num_pairs + len(tables), edges)
+            times.append(time.perf_counter() - start)
+            totals.add(pairing.matching_weight(edges, matching))
+        else:
+            times.append(None)
+
+        if len(totals) > 1:
+            print('Solvers disagree on {} pairs: weights {}'.format(num_pairs, totals), file=sys.stderr)
+
+        print('{:>6} {:>7} {:>10} {:>10} {:>12}'.format(
+            num_pairs, len(tables),
+            *('{:.3f}'.format(t) if t is not None else '-' for t in times)
+        ), flush=True)
+
+
+def benchmark_sparse(pairing, args):
+    """
+    Simulate tournaments, and at every round compare the pairings on the dense and on the sparse graph.
+    """
+    engine = pairing.get_pairing_engine()
+    rng = random.Random(args.seed)
+
+    print('{:>6} {:>6} {:>10} {:>10} {:>10} {:>10} {:>8}'.format('teams', 'round', 'dense', 'sparse', 'dense (s)', 'sparse (s)', 'quality'))
+
+    worse = 0
+    for num_teams in args.sizes:
+        for simulation in range(args.num_simulations):
+            teams, scores, previous_pairs, previous_byes = random_swiss_instance(num_teams, 0, rng)
+            strengths = {team: rng.random() for team in teams}
+
+            for round_number in range(1, args.num_rounds+1):
+                instance = (teams, scores, previous_pairs, previous_byes)
+                dense_edges, num_levels = pairing.pairing_edges(*instance)
+                sparse_edges, _ = pairing.pairing_edges(*instance, window=args.window)
+                index = {team: i for (i, team) in enumerate(teams)}
+
+                results = []
+                for window in (None, args.window):
+                    start = time.perf_counter()
+                    pairs = pairing.pair_teams(*instance, engine=engine, window=window)
+                    elapsed = time.perf_counter() - start
+                    penalties = pairing.level_penalties(dense_edges, num_levels, [(index[pair[0]], index[pair[1]] if len(pair) == 2 else num_teams) for pair in pairs])
+                    results.append((pairs, elapsed, penalties))
+
+                (pairs, dense_time, dense_penalties), (_, sparse_time, sparse_penalties) = results
+                quality = 'same' if sparse_penalties == dense_penalties else 'worse'
+                worse += quality == 'worse'
+
+                if simulation == 0:
+                    print('{:>6} {:>6} {:>10} {:>10} {:>10.3f} {:>10.3f} {:>8}'.format(num_teams, round_number, len(dense_edges), len(sparse_edges), dense_time, sparse_time, quality), flush=True)
+
+                # play the round (the stronger team wins with probability 2/3)
+                for pair in pairs:
+                    if len(pair) == 1:
+                        previous_byes.add(pair[0])
+                        scores[pair[0]] += 1030
+                    else:
+                        a, b = sorted(pair, key=lambda team: -strengths[team])
+                        if rng.random() > 2/3:
+                            a, b = b, a
+                        previous_pairs.add((min(pair), max(pair)))
+                        secondary = rng.randint(4, 6)
+                        scores[a] += 1000 + 10 * secondary
+                        scores[b] += 10 * (6 - secondary)
+
+    print('Rounds with a worse sparse pairing: {} / {}'.format(worse, len(args.sizes) * args.num_simulations * args.num_rounds))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the running time of the pairing engines.')
+
+    parser.add_argument('sizes', type=int, nargs='*', default=[64, 256, 1024, 4096], help='numbers of teams')
+    parser.add_argument('-r', '--num_rounds', type=int, nargs='?', default=4, help='number of rounds already played')
+    parser.add_argument('--reference_max', type=int, nargs='?', default=1024, help='largest number of teams for which the reference engine is run')
+    parser.add_argument('--seed', type=int, nargs='?', default=0, help='random seed')
+    parser.add_argument('-g', '--score_groups', type=int, nargs='+', help='compare pairing weights for these numbers of score groups, instead of comparing engines')
+    parser.add_argument('-t', '--num_teams', type=int, nargs='?', default=256, help='number of teams (with --score_groups)')
+    parser.add_argument('-w', '--window', type=int, nargs='?', help='compare the dense graph with the sparse graph with this window, on simulated tournaments')
+    parser.add_argument('-a', '--tables', action='store_true', help='compare the table assignment solvers, instead of comparing engines (sizes are numbers of pairs)')
+    parser.add_argument('-s', '--num_simulations', type=int, nargs='?', default=1, help='number of simulated tournaments for each size (with --window)')
+
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mtt.settings')
+
+    from tournament import pairing
+
+    if args.score_groups:
+        benchmark_score_groups(pairing, args)
+        sys.exit()
+
+    if args.tables:
+        benchmark_tables(pairing, args)
+        sys.exit()
+
+    if args.window is not None:
+        benchmark_sparse(pairing, args)
+        sys.exit()
+
+    engines = [pairing.BlossomEngine(), pairing.NetworkxEngine()]
+    rng = random.Random(args.seed)
+
+    print('{:>6} {:>10} {:>12} {:>12}'.format('teams', 'edges', 'blossom (s)', 'networkx (s)'))
+
+    for num_teams in args.sizes:
+        instance = random_swiss_instance(num_teams, args.num_rounds, rng)
+        index = {team: i for (i, team) in enumerate(instance[0])}
+
+        times = []
+        results = []
+        for engine in engines:
+            if engine.name == pairing.NetworkxEngine.name and num_teams > args.reference_max:
+                times.append(None)
+                continue
+            start = time.perf_counter()
+            results.append(pairing.pair_teams(*instance, engine=engine))
+            times.append(time.perf_counter() - start)
+
+        # the graph is built again only after timing the engines, so that a single copy of it is in memory at a time
+        edges, num_levels = pairing.pairing_edges(*instance)
+        penalties = [pairing.level_penalties(edges, num_levels, [(index[pair[0]], index[pair[1]] if len(pair) == 2 else num_teams) for pair in pairs]) for pairs in results]
+
+        if len(set(penalties)) > 1:
+            print('Engines disagree on {} teams: penalties {}'.format(num_teams, penalties), file=sys.stderr)
+
+        print('{:>6} {:>10} {:>12} {:>12}'.format(
+            num_teams, len(edges),
+            *('{:.3f}'.format(t) if t is not None else '-' for t in times)
+        ), flush=True)
@@ -13,6 +13,6 @@ if __name__ == '__main__':
     
     from tournament.models import *
     
-    tournament = Tournament.objects.latest()
+    tournament = Tournament.current()
     print("Tournament:", tournament)
     tournament.create_round()
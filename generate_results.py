@@ -19,7 +19,7 @@ if __name__ == '__main__':
     
     from tournament.models import *
     
-    tournament = Tournament.objects.latest()
+    tournament = Tournament.current()
     print("Tournament:", tournament)
     
     for match in Match.objects.filter(round__tournament=tournament):
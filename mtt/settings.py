@@ -151,5 +151,50 @@ CACHES = {
     }
 }
 
-# Cache for the public page
-PUBLIC_PAGE_CACHE_TIME = None    # set this to None to have no cache, and to the number of seconds otherwise
+# With several worker processes, use a cache shared by all of them (see tournament/sqlite_cache.py)
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'tournament.sqlite_cache.SQLiteCache',
+#         'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+#         'TIMEOUT': None,
+#         'OPTIONS': {'MAX_ENTRIES': 1000},
+#     }
+# }
+
+# Cache for the public page: pages and scoreboards are cached until the data of the tournament changes
+PUBLIC_PAGE_CACHE = True
+PUBLIC_PAGE_CACHE_TIMEOUT = 24 * 3600   # cached values of old versions of the data expire after this number of seconds
+PUBLIC_PAGE_ROUNDS = 3   # number of rounds shown in the public page (older rounds are loaded on demand)
+# The current tournament is cached by every process until any tournament changes, which is noticed through the cache.
+# None (default): only if the cache backend is shared by all processes (i.e., not LocMemCache); True: always (e.g., with a single process)
+CURRENT_TOURNAMENT_CACHE = None
+
+# Live feed of the changes (server-sent events, see tournament/live.py)
+# Every open stream keeps a thread of the web server busy (with WSGI, one worker thread per connected client),
+# so the server needs more threads than the expected number of display screens.
+# Events are kept in the cache: with several worker processes, use a shared cache backend (see above)
+LIVE_FEED_KEEPALIVE = 15   # seconds between keep-alive comments
+LIVE_FEED_MAX_DURATION = 300   # seconds after which a stream ends (clients reconnect automatically)
+LIVE_FEED_POLL_INTERVAL = 1   # seconds between checks for the events published by other processes
+
+# Static snapshot of the public site (see tournament/static_site.py): if set, the public pages are written to this path
+# (a symbolic link, replaced at every snapshot) after every change, to be served directly by the web server
+STATIC_SITE_ROOT = None
+STATIC_SITE_DELAY = 2   # seconds without changes before a snapshot is written
+STATIC_SITE_MAX_DELAY = 10   # maximum seconds between a change and the snapshot
+
+# Engine used to compute pairings and table assignments when a round is created
+# ('blossom' is the fast integer engine, 'networkx' is the reference engine)
+PAIRING_ENGINE = 'blossom'
+
+# If set, teams are paired considering only opponents within this number of score groups
+# (the window is widened automatically if not all teams can be paired); None to consider all opponents.
+# The sparse graph is faster on large tournaments, but the pairing can be worse than the optimal one
+# when the optimum needs an opponent outside the window
+PAIRING_WINDOW = None
+
+# Number of worker threads which create rounds in the background (0 to create rounds within the request)
+ROUND_JOB_WORKERS = 1
+
+# Round jobs which are still pending after this number of seconds are considered lost
+ROUND_JOB_TIMEOUT = 600
@@ -19,26 +19,36 @@ from tournament import views
 from tournament.admin import admin_site
 from django.conf import settings
 from django.urls import include, path
-from django.views.decorators.cache import cache_page
+from tournament.cache import cache_public_page, conditional_public_page
 
 from django.views.generic.base import RedirectView
 
 urlpatterns = [
     path('admin/createround/<int:pk>/', views.CreateRoundView.as_view(), name='createround'),
+    path('admin/previewround/<int:pk>/', views.PreviewRoundView.as_view(), name='previewround'),
+    path('admin/commitround/<int:pk>/', views.CommitRoundView.as_view(), name='commitround'),
+    path('admin/roundjob/<int:pk>/', views.RoundJobView.as_view(), name='roundjob'),
     path('admin/', admin_site.urls),
-    # path('', cache_page(30)(views.IndexView.as_view()), name='index'),
-    # path('', views.IndexView.as_view(), name='index'),
     path('registration/', views.RegistrationView.as_view(), name='registration'),
     path('player-registration/', views.PlayerRegistrationView.as_view(), name='player-registration'),
     path('thanks/', views.ThanksView.as_view(), name='thanks'),
-    path('tables/', views.TablesView.as_view(), name='tables'),
+    path('tables/', conditional_public_page(views.TablesView.as_view()), name='tables'),
+    path('progression/', conditional_public_page(views.ProgressionView.as_view()), name='progression'),
 ]
 
-# public page
-if settings.PUBLIC_PAGE_CACHE_TIME is None:
-    urlpatterns.append(path('', views.IndexView.as_view(), name='index'))
-else:
-    urlpatterns.append(path('', cache_page(settings.PUBLIC_PAGE_CACHE_TIME)(views.IndexView.as_view()), name='index'))
+# public page (cached until the data of the current tournament changes, see tournament/cache.py)
+urlpatterns.append(path('', conditional_public_page(cache_public_page(views.IndexView.as_view())), name='index'))
+urlpatterns.append(path('rounds/<int:pk>/', conditional_public_page(views.RoundFragmentView.as_view()), name='round'))
+
+# JSON API of the public page, for display screens and apps (cached in the same way)
+urlpatterns += [
+    path('api/teams/', conditional_public_page(cache_public_page(views.TeamScoreboardApiView.as_view())), name='api-teams'),
+    path('api/players/', conditional_public_page(cache_public_page(views.PlayerScoreboardApiView.as_view())), name='api-players'),
+    path('api/rounds/', conditional_public_page(cache_public_page(views.RoundsApiView.as_view())), name='api-rounds'),
+]
+
+# live feed of the changes, as server-sent events (see tournament/live.py)
+urlpatterns.append(path('live/', views.LiveFeedView.as_view(), name='live'))
 
 # debug toolbar
 if settings.DEBUG:
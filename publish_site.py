@@ -0,0 +1,22 @@
+import os
+import sys
+import django
+import argparse
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a static snapshot of the public site (see tournament/static_site.py).')
+    parser.add_argument('root', nargs='?', help='path of the snapshot, a symbolic link (default: STATIC_SITE_ROOT)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mtt.settings')
+    django.setup()
+
+    from django.conf import settings
+    from tournament import static_site
+
+    if args.root is None and not settings.STATIC_SITE_ROOT:
+        sys.exit('STATIC_SITE_ROOT is not set.')
+
+    directory = static_site.publish(args.root)
+    print("Snapshot written to", directory)
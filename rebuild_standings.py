@@ -0,0 +1,23 @@
+import os
+import sys
+import django
+import argparse
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute standings, round snapshots and team histories from all matches (e.g., to repair them).')
+    parser.add_argument('tournaments', type=int, nargs='*', help='ids of the tournaments (default: all tournaments)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mtt.settings')
+    django.setup()
+
+    from tournament.models import *
+
+    tournaments = Tournament.objects.filter(pk__in=args.tournaments) if args.tournaments else Tournament.objects.all()
+    for tournament in tournaments:
+        print("Tournament:", tournament)
+        TeamStanding.rebuild(tournament)
+        PlayerStanding.rebuild(tournament)
+        TeamHistory.rebuild(tournament)
+        RoundSnapshot.rebuild(tournament)
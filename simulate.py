@@ -1,33 +1,179 @@
 import os
 import sys
+import json
+import time
 import django
 import argparse
 import random
+import itertools
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 TEAM_NAMES = ['Alpha', 'Beta', 'Gamma', 'Delta', 'Epsilon', 'Zeta', 'Eta', 'Theta', 'Iota', 'Kappa', 'Lambda', 'Mu', 'Nu', 'Xi', 'Omicron', 'Pi', 'Rho', 'Sigma', 'Tau', 'Upsilon', 'Phi', 'Chi', 'Psi', 'Omega']
 
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='Simulate many tournaments.')
+def team_names(num_teams):
+    if num_teams <= len(TEAM_NAMES):
+        return TEAM_NAMES[:num_teams]
+    return ['Team {}'.format(i) for i in range(1, num_teams+1)]
 
-    parser.add_argument('-t', '--num_teams', type=int, nargs='?', default=16, help='number of teams')
-    parser.add_argument('-s', '--num_simulations', type=int, nargs='?', default=100, help='number of simulations')
-    parser.add_argument('-r', '--num_rounds', type=int, nargs='?', default=4, help='number of rounds per simulation')
-    parser.add_argument('--num_tables', type=int, nargs='?', default=20, help='number of tables')
-    parser.add_argument('alpha', type=float, nargs='?', default=0.4, help='probability that the stronger team wins')
-    parser.add_argument('beta', type=float, nargs='?', default=0.4, help='probability that the weaker team wins')
-    parser.add_argument('--research', action='store_true')
 
-    args = parser.parse_args()
+def print_research(team_tables, tables):
+    # gather description of these rounds (for each team, I remember which tables it saw)
+    tables_to_id = {table: i for (i, table) in enumerate(tables)}
+    for team, seen_tables in team_tables.items():
+        for table in seen_tables:
+            print(tables_to_id[table], end=' ')
+        print()
+    sys.stdout.flush()
 
-    print('Probability of victory of stronger team: {0:.2f}'.format(args.alpha), file=sys.stderr)
-    print('Probability of victory of weaker team: {0:.2f}'.format(args.beta), file=sys.stderr)
 
+def simulate_in_memory(args):
+    """
+    Run the simulations in memory (see tournament.simulation).
+    """
+    import numpy as np
+    from tournament.simulation import SimulatedTournament
+
+    rng = np.random.default_rng(args.seed)
+    teams = list(range(1, args.num_teams+1))
+    names = dict(zip(teams, team_names(args.num_teams)))
+    tables = [(j, 100) for j in range(1, args.num_tables+1)]
+
+    # generate team strengths
+    strengths = rng.permutation(len(teams))
+    print('Teams sorted by decreasing strength: {}'.format(' '.join(names[team] for team in sorted(teams, key=lambda team: -strengths[team-1]))), file=sys.stderr)
+
+    stats = Counter()
+    start = time.perf_counter()
+
+    try:
+        for i in range(args.num_simulations):
+            tournament = SimulatedTournament(teams, tables, strengths, args.alpha, args.beta, rng)
+            for j in range(args.num_rounds):
+                tournament.play_round(*tournament.create_round())
+
+            stats[len(tournament.used_tables())] += 1
+
+            if args.research:
+                print_research(tournament.team_tables, [table for (table, priority) in tables])
+
+    except KeyboardInterrupt:
+        pass
+
+    elapsed = time.perf_counter() - start
+    print('{} simulations in {:.2f} s ({:.0f} per minute)'.format(sum(stats.values()), elapsed, 60 * sum(stats.values()) / elapsed), file=sys.stderr)
+    return stats
+
+
+def parse_range(value):
+    """
+    Parse a range of values for the sweep mode: either a single number, or START:STOP:STEP (STOP included).
+    """
+    if ':' not in value:
+        return [float(value)]
+    start, stop, step = (float(x) for x in value.split(':'))
+    n = int(round((stop - start) / step))
+    return [round(start + k * step, 10) for k in range(n + 1)]
+
+
+def setup_worker():
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mtt.settings')
     django.setup()
 
-    from tournament.models import *
+
+def sweep_chunk(alpha, beta, num_teams, num_tables, num_rounds, num_simulations, seed):
+    """
+    Run some simulations in memory, with the given seed (a numpy.random.SeedSequence).
+    Return the stats Counter (number of used tables -> number of simulations),
+    and the table usage of each team: a list, with teams sorted by decreasing strength,
+    of lists with the number of matches played at each table.
+    """
+    import numpy as np
+    from tournament.simulation import SimulatedTournament
+
+    rng = np.random.default_rng(seed)
+    random.seed(int(seed.generate_state(1)[0]))   # the first round is paired with the random module
+
+    teams = list(range(1, num_teams+1))
+    tables = [(j, 100) for j in range(1, num_tables+1)]
+
+    stats = Counter()
+    team_tables = [[0] * num_tables for team in teams]
+
+    for i in range(num_simulations):
+        strengths = rng.permutation(num_teams)
+        tournament = SimulatedTournament(teams, tables, strengths, alpha, beta, rng)
+        for j in range(num_rounds):
+            tournament.play_round(*tournament.create_round())
+
+        stats[len(tournament.used_tables())] += 1
+        for team in teams:
+            rank = num_teams - 1 - strengths[team-1]
+            for table in tournament.team_tables[team]:
+                team_tables[rank][table-1] += 1
+
+    return stats, team_tables
+
+
+def sweep(args):
+    """
+    Run simulations for all combinations of the given parameters, spread over a pool of processes,
+    and write the aggregated results to a JSON file.
+    """
+    import numpy as np
+
+    settings = list(itertools.product(args.alpha_range, args.beta_range, args.teams_range, args.tables_range))
+    seeds = iter(np.random.SeedSequence(args.seed).spawn(len(settings) * -(-args.num_simulations // args.chunk_size)))
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=setup_worker) as executor:
+        for (alpha, beta, num_teams, num_tables) in settings:
+            num_teams = int(num_teams)
+            num_tables = int(num_tables)
+            chunks = [min(args.chunk_size, args.num_simulations - k) for k in range(0, args.num_simulations, args.chunk_size)]
+            futures = [executor.submit(sweep_chunk, alpha, beta, num_teams, num_tables, args.num_rounds, n, next(seeds)) for n in chunks]
+            results.append(((alpha, beta, num_teams, num_tables), futures))
+
+        output = []
+        for ((alpha, beta, num_teams, num_tables), futures) in results:
+            stats = Counter()
+            team_tables = [[0] * num_tables for team in range(num_teams)]
+            for future in futures:
+                chunk_stats, chunk_team_tables = future.result()
+                stats += chunk_stats
+                for (total, counts) in zip(team_tables, chunk_team_tables):
+                    for (j, count) in enumerate(counts):
+                        total[j] += count
+
+            print('alpha={} beta={} teams={} tables={}: {}'.format(alpha, beta, num_teams, num_tables, stats), file=sys.stderr)
+            output.append({
+                'alpha': alpha,
+                'beta': beta,
+                'num_teams': num_teams,
+                'num_tables': num_tables,
+                'num_rounds': args.num_rounds,
+                'num_simulations': sum(stats.values()),
+                'used_tables': {str(k): v for (k, v) in sorted(stats.items())},
+                'team_tables': team_tables,
+            })
+
+    with open(args.sweep, 'w') as f:
+        json.dump({'seed': args.seed, 'results': output}, f, indent=1)
+
+    elapsed = time.perf_counter() - start
+    print('{} simulations in {:.2f} s, results written to {}'.format(len(settings) * args.num_simulations, elapsed, args.sweep), file=sys.stderr)
+
+
+def simulate_orm(args, cross_check=False):
+    """
+    Run the simulations through the database, creating rounds with Tournament.create_round.
+    With cross_check, every round is also computed in memory, and pairs, tables and scores are compared.
+    """
+    import numpy as np
+    from tournament.models import Tournament, Team, Table, Round, NORMAL
+    from tournament.simulation import SimulatedTournament
 
     # clear database
     Tournament.objects.all().delete()
@@ -37,9 +183,9 @@ if __name__ == '__main__':
     # create tournament, teams, and tables
     tournament = Tournament.objects.create(name='Simulated tournament')
 
-    teams = [Team(name=name) for name in TEAM_NAMES[:args.num_teams]]
+    teams = [Team(name=name) for name in team_names(args.num_teams)]
     Team.objects.bulk_create(teams)
-    teams = Team.objects.all()
+    teams = Team.objects.all().order_by('pk')
 
     # tables = [Table(name='T{0:02d}'.format(i), priority=100-i) for i in range(1, args.num_tables+1)]
     tables = [Table(name='T{0:02d}'.format(i), priority=100) for i in range(1, args.num_tables+1)]
@@ -55,9 +201,8 @@ if __name__ == '__main__':
 
     # run simulations
     stats = Counter()
-
-    if args.research:
-        print(args.num_simulations)
+    mismatches = 0
+    rng = np.random.default_rng(args.seed)
 
     try:
         for i in range(args.num_simulations):
@@ -70,13 +215,31 @@ if __name__ == '__main__':
             used_tables = set()
             team_tables = {team: [] for team in teams}
 
+            if cross_check:
+                simulated = SimulatedTournament([team.pk for team in teams], [(table.pk, table.priority) for table in tables], [strengths[team] for team in teams], args.alpha, args.beta, rng, bye_score=tournament.bye_score)
+
             for j in range(args.num_rounds):
+                if cross_check:
+                    # the first round is random: both paths use the same random state
+                    state = random.getstate()
+                    pairs, pairs_to_tables = simulated.create_round()
+                    random.setstate(state)
+                    results = simulated.play_round(pairs, pairs_to_tables)
+
                 round, _ = tournament.create_round()
 
                 if j == 0:
                     print('-- Round', end=' ', file=sys.stderr)
                 print(round.number, end=' ', flush=True, file=sys.stderr)
 
+                if cross_check:
+                    expected = set((frozenset(pair), pairs_to_tables.get(pair)) for pair in pairs)
+                    found = set((frozenset(team.pk for team in match.teams.all()), match.table_id) for match in round.match_set.all())
+                    if expected != found:
+                        mismatches += 1
+                        print('\nRound {}: pairs and tables differ from the in-memory simulation'.format(round.number), file=sys.stderr)
+                    scores_by_pair = {frozenset(pair): dict(zip(pair, scores)) for (pair, scores) in results.items()}
+
                 for match in round.match_set.all():
                     if match.type == NORMAL:
                         # record used table
@@ -93,44 +256,103 @@ if __name__ == '__main__':
 
                         # generate outcome
                         scores = {}
-                        x = random.random()
 
-                        if x < args.alpha:
-                            # stronger team wins
-                            scores[a] = 1
-                            scores[b] = 0
-
-                        elif x < args.alpha + args.beta:
-                            # weaker team wins
-                            scores[a] = 0
-                            scores[b] = 1
+                        if cross_check:
+                            # same outcome as the in-memory simulation (if pairs agree)
+                            scores = scores_by_pair.get(frozenset((a.pk, b.pk)))
+                            scores = {a: scores[a.pk], b: scores[b.pk]} if scores is not None else {a: 1, b: 0}
 
                         else:
-                            # draw
-                            scores[a] = 0.5
-                            scores[b] = 0.5
+                            x = random.random()
+
+                            if x < args.alpha:
+                                # stronger team wins
+                                scores[a] = 1
+                                scores[b] = 0
+
+                            elif x < args.alpha + args.beta:
+                                # weaker team wins
+                                scores[a] = 0
+                                scores[b] = 1
+
+                            else:
+                                # draw
+                                scores[a] = 0.5
+                                scores[b] = 0.5
 
                         # store result
                         for team_result in match.teamresult_set.all():
                             team_result.score = scores[team_result.team]
                             team_result.save()
 
+            if cross_check:
+                scoreboard = tournament.team_scoreboard()
+                if any(scoreboard[team].to_int() != simulated.scores[k] for (k, team) in enumerate(teams)):
+                    mismatches += 1
+                    print('\nScores differ from the in-memory simulation', file=sys.stderr)
+
             # compute used tables
             stats[len(used_tables)] += 1
             print('-- Used {} tables'.format(len(used_tables)), file=sys.stderr)
 
             if args.research:
-                # gather description of these rounds (for each team, I remember which tables it saw)
-                tables_to_id = {table: i for (i, table) in enumerate(tables)}
-                # print(tables_to_id)
-                # print(teams)
-                for team, seen_tables in team_tables.items():
-                    for table in seen_tables:
-                        print(tables_to_id[table], end=' ')
-                    print()
-                sys.stdout.flush()
+                print_research(team_tables, tables)
 
     except KeyboardInterrupt:
         pass
 
+    if cross_check:
+        print('Cross-check: {} mismatches'.format(mismatches), file=sys.stderr)
+
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate many tournaments.')
+
+    parser.add_argument('-t', '--num_teams', type=int, nargs='?', default=16, help='number of teams')
+    parser.add_argument('-s', '--num_simulations', type=int, nargs='?', default=100, help='number of simulations')
+    parser.add_argument('-r', '--num_rounds', type=int, nargs='?', default=4, help='number of rounds per simulation')
+    parser.add_argument('--num_tables', type=int, nargs='?', default=20, help='number of tables')
+    parser.add_argument('alpha', type=float, nargs='?', default=0.4, help='probability that the stronger team wins')
+    parser.add_argument('beta', type=float, nargs='?', default=0.4, help='probability that the weaker team wins')
+    parser.add_argument('--research', action='store_true')
+    parser.add_argument('--orm', action='store_true', help='run the simulations through the database (slow), instead of in memory')
+    parser.add_argument('--cross_check', action='store_true', help='run the simulations through the database, and check that the in-memory simulation agrees')
+    parser.add_argument('--seed', type=int, nargs='?', default=None, help='random seed for the outcomes')
+
+    sweep_group = parser.add_argument_group('sweep', 'Run simulations for all combinations of the given parameters, in parallel. Ranges are given as single values or START:STOP:STEP.')
+    sweep_group.add_argument('--sweep', metavar='OUTPUT', help='write the results of a sweep to this JSON file')
+    sweep_group.add_argument('--alpha_range', type=parse_range, nargs='+', help='values of alpha (default: alpha)')
+    sweep_group.add_argument('--beta_range', type=parse_range, nargs='+', help='values of beta (default: beta)')
+    sweep_group.add_argument('--teams_range', type=parse_range, nargs='+', help='numbers of teams (default: --num_teams)')
+    sweep_group.add_argument('--tables_range', type=parse_range, nargs='+', help='numbers of tables (default: --num_tables)')
+    sweep_group.add_argument('-w', '--workers', type=int, nargs='?', default=None, help='number of processes (default: number of cores)')
+    sweep_group.add_argument('--chunk_size', type=int, nargs='?', default=25, help='number of simulations run by a process at a time')
+
+    args = parser.parse_args()
+
+    if args.sweep:
+        # flatten ranges (every argument can be a single value or a range)
+        args.alpha_range = sorted(set(sum(args.alpha_range, []))) if args.alpha_range else [args.alpha]
+        args.beta_range = sorted(set(sum(args.beta_range, []))) if args.beta_range else [args.beta]
+        args.teams_range = sorted(set(sum(args.teams_range, []))) if args.teams_range else [args.num_teams]
+        args.tables_range = sorted(set(sum(args.tables_range, []))) if args.tables_range else [args.num_tables]
+        sweep(args)
+        sys.exit()
+
+    print('Probability of victory of stronger team: {0:.2f}'.format(args.alpha), file=sys.stderr)
+    print('Probability of victory of weaker team: {0:.2f}'.format(args.beta), file=sys.stderr)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mtt.settings')
+    django.setup()
+
+    if args.research:
+        print(args.num_simulations)
+
+    if args.orm or args.cross_check:
+        stats = simulate_orm(args, cross_check=args.cross_check)
+    else:
+        stats = simulate_in_memory(args)
+
     print(stats, file=sys.stderr)
@@ -4,12 +4,15 @@ from django.urls import reverse
 from django.http import HttpResponseRedirect
 from django.contrib.admin import AdminSite
 from django.contrib.auth.models import User, Group
+from django.db.models import Prefetch
 
 # from django.contrib.auth.admin import UserAdmin
 
 from django_object_actions import DjangoObjectActions # https://github.com/crccheck/django-object-actions
 
 from .models import *
+from .views import round_job_message
+from . import jobs, cache
 
 
 class MTTAdminSite(AdminSite):
@@ -18,6 +21,11 @@ class MTTAdminSite(AdminSite):
     index_template = 'admin_index.html'
     # app_index_template = 'admin_app_index.html'
 
+    def index(self, request, extra_context=None):
+        # hits and misses of the cached fragments of the public page (in this process)
+        extra_context = dict(extra_context or {}, fragment_stats=cache.fragment_stats())
+        return super().index(request, extra_context)
+
 admin_site = MTTAdminSite(name='mttadmin')
 
 # admin_site.register(User)
@@ -32,13 +40,13 @@ admin_site = MTTAdminSite(name='mttadmin')
 
 @admin.register(Tournament, site=admin_site)
 class TournamentAdmin(DjangoObjectActions, admin.ModelAdmin):
-    list_display = ('name', 'creation_time', 'bye_score', 'shown_players', 'is_registration_open', 'max_teams', 'max_players_per_team', 'num_rounds')
+    list_display = ('name', 'creation_time', 'is_current', 'bye_score', 'shown_players', 'is_registration_open', 'max_teams', 'max_players_per_team', 'num_rounds')
     # list_display = ('name', 'creation_time', 'bye_score', 'shown_players', 'num_rounds', 'team_scores', 'player_scores')
     search_fields = ('name',)
 
     fieldsets = (
         (None, {
-            'fields': ('name', 'short_name', 'bye_score')
+            'fields': ('name', 'short_name', 'is_current', 'bye_score', 'tiebreakers')
         }),
         ('Public page', {
             'fields': ('description', 'default_round_visibility', 'shown_players', 'player_scoreboard_description'),
@@ -49,24 +57,19 @@ class TournamentAdmin(DjangoObjectActions, admin.ModelAdmin):
     )
 
     def create_round(self, request, obj):
-        round, success = obj.create_round()
-        if not success:
-            self.message_user(
-                request,
-                format_html('<a href="%s">Round %d</a> created, but not all teams could be paired.' % (reverse('admin:tournament_round_change', args=(round.id,)), round.number)),
-                level=messages.WARNING
-            )
-        else:
-            self.message_user(
-                request,
-                format_html('<a href="%s">Round %d</a> created.' % (reverse('admin:tournament_round_change', args=(round.id,)), round.number)),
-                level=messages.SUCCESS
-            )
+        job = jobs.submit_round_job(obj)
+        round_job_message(request, job)
 
     create_round.label = "Generate round"
     create_round.short_description = "Generate a new round with matches"
 
-    change_actions = ('create_round',)
+    def preview_round(self, request, obj):
+        return HttpResponseRedirect(reverse('previewround', args=(obj.pk,)))
+
+    preview_round.label = "Preview round"
+    preview_round.short_description = "Compute a new round without saving it"
+
+    change_actions = ('create_round', 'preview_round')
 
     def team_scores(self, obj):
         return score_counter_to_str(obj.team_scoreboard())
@@ -133,6 +136,9 @@ class MatchAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'show_round', 'type', 'valid', 'table', 'result')
     list_filter = ('round__tournament', 'round', 'table', 'type')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('round', 'table').prefetch_related(Prefetch('teamresult_set', queryset=TeamResult.objects.select_related('team')))
+
     def show_round(self, obj):
         return format_html("<a href='{url}'>{round}</a>", url=reverse('admin:tournament_round_change', args=(obj.round.id,)), round=obj.round)
     show_round.short_description = "round"
@@ -159,6 +165,9 @@ class RoundAdmin(DjangoObjectActions, admin.ModelAdmin):
     list_filter = ('tournament',)
     inlines = (MatchInline,)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('tournament').with_matches()
+
     def view_matches(self, request, obj):
         return HttpResponseRedirect(reverse('admin:tournament_match_changelist') + '?round__id__exact=%d' % obj.id)
 
@@ -169,3 +178,13 @@ class RoundAdmin(DjangoObjectActions, admin.ModelAdmin):
 
     def team_scores(self, obj):
         return score_counter_to_str(obj.team_scoreboard())
+
+
+@admin.register(RoundJob, site=admin_site)
+class RoundJobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'tournament', 'status', 'creation_time', 'start_time', 'end_time', 'round', 'success')
+    list_filter = ('tournament', 'status')
+    readonly_fields = ('tournament', 'status', 'creation_time', 'start_time', 'end_time', 'round', 'success', 'error')
+
+    def has_add_permission(self, request):
+        return False
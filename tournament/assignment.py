@@ -0,0 +1,106 @@
+"""
+Rectangular assignment problem: given a dense matrix of integer weights, find a matching between rows and columns
+of maximum cardinality (i.e., of size min(rows, columns)) and, among those, of maximum total weight.
+
+scipy.optimize.linear_sum_assignment is used if scipy is installed; otherwise, a pure Python implementation
+of the shortest augmenting path algorithm is used.
+"""
+
+try:
+    from scipy.optimize import linear_sum_assignment as scipy_linear_sum_assignment
+except ImportError:
+    scipy_linear_sum_assignment = None
+
+
+def max_weight_assignment(weights, use_scipy=True):
+    """
+    Solve the assignment problem on the given matrix (a list of rows, all of the same length).
+    Return the list of the assigned pairs (row, column), sorted by row.
+    """
+    if len(weights) == 0 or len(weights[0]) == 0:
+        return []
+
+    if use_scipy and scipy_linear_sum_assignment is not None:
+        # minimize the negated weights (the maximize argument needs scipy 1.4)
+        rows, columns = scipy_linear_sum_assignment([[-w for w in row] for row in weights])
+        return [(int(i), int(j)) for (i, j) in zip(rows, columns)]
+
+    if len(weights) <= len(weights[0]):
+        column_of = shortest_augmenting_path([[-w for w in row] for row in weights])
+        return list(enumerate(column_of))
+    else:
+        # transpose, so that there are at least as many columns as rows
+        column_of = shortest_augmenting_path([[-row[j] for row in weights] for j in range(len(weights[0]))])
+        return sorted((i, j) for (j, i) in enumerate(column_of))
+
+
+def shortest_augmenting_path(cost):
+    """
+    Minimum cost assignment of all rows, for a matrix with at least as many columns as rows.
+    Return the list of the columns assigned to each row.
+
+    Rows are assigned one at a time, augmenting along a shortest path of reduced costs (found with Dijkstra's
+    algorithm); the dual variables are then updated so that all reduced costs stay non-negative.
+    """
+    n = len(cost)
+    m = len(cost[0])
+    u = [0] * n             # row duals
+    v = [0] * m             # column duals
+    row_of = [-1] * m       # row assigned to each column
+    column_of = [-1] * n    # column assigned to each row
+
+    for start in range(n):
+        shortest = [None] * m   # length of the shortest path found so far to each column
+        path = [-1] * m         # row preceding each column in the shortest path
+        remaining = list(range(m))  # columns not scanned yet
+        scanned_rows = []
+        scanned_columns = []
+        min_value = 0
+        row = start
+        sink = -1
+
+        while sink == -1:
+            scanned_rows.append(row)
+            row_cost = cost[row]
+            offset = min_value - u[row]
+            lowest = None
+            index = -1
+            for (k, j) in enumerate(remaining):
+                r = offset + row_cost[j] - v[j]
+                s = shortest[j]
+                if s is None or r < s:
+                    path[j] = row
+                    shortest[j] = s = r
+                # prefer free columns among those at the same distance
+                if lowest is None or s < lowest or (s == lowest and row_of[j] == -1):
+                    lowest = s
+                    index = k
+
+            min_value = lowest
+            j = remaining[index]
+            remaining[index] = remaining[-1]
+            remaining.pop()
+            scanned_columns.append(j)
+
+            if row_of[j] == -1:
+                sink = j
+            else:
+                row = row_of[j]
+
+        # update the dual variables
+        u[start] += min_value
+        for i in scanned_rows[1:]:
+            u[i] += min_value - shortest[column_of[i]]
+        for j in scanned_columns:
+            v[j] -= min_value - shortest[j]
+
+        # augment
+        j = sink
+        while True:
+            i = path[j]
+            row_of[j] = i
+            column_of[i], j = j, column_of[i]
+            if i == start:
+                break
+
+    return column_of
@@ -0,0 +1,167 @@
+"""
+Caching of the public pages and of the data they show.
+
+Cached values are keyed by the version of the tournament, which is incremented by every write to
+results, matches, rounds, teams, players, tables and tournament settings (see bump_versions in models.py
+and signals.py). Hence cached values never become stale: after a write, the next request uses new keys,
+and values of old versions are simply not used anymore (they expire after PUBLIC_PAGE_CACHE_TIMEOUT seconds).
+
+Sections of the public page are also cached as fragments (see the cachefragment template tag), keyed by their inputs:
+rounds by their own version, so that unchanged rounds are not rendered again when a result of another round changes.
+"""
+
+import hashlib
+import threading
+import uuid
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+# changed at every change of any tournament, to invalidate the cached current tournament (see CurrentTournamentMiddleware)
+GENERATION_KEY = 'tournament-generation'
+
+
+def tournament_generation():
+    """
+    Token which identifies the current data of the tournaments (in a shared cache, it is the same for all processes).
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = bump_tournament_generation()
+    return generation
+
+
+def bump_tournament_generation():
+    generation = uuid.uuid4().hex
+    cache.set(GENERATION_KEY, generation, None)
+    return generation
+
+
+def version_key(tournament, name):
+    return 'tournament-%d-%d-%s' % (tournament.pk, tournament.version, name)
+
+
+def get_or_compute(tournament, name, compute):
+    """
+    Return the value with the given name for the current version of the tournament,
+    computing it with compute() if it is not in the cache.
+    """
+    key = version_key(tournament, name)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, getattr(settings, 'PUBLIC_PAGE_CACHE_TIMEOUT', None))
+    return value
+
+
+def cache_public_page(view):
+    """
+    Decorator for views of the public pages, which caches the whole response for the current version
+    of the current tournament (see CurrentTournamentMiddleware).
+    The cache is disabled if PUBLIC_PAGE_CACHE is False.
+    """
+    @wraps(view)
+    def wrapped_view(request, *args, **kwargs):
+        tournament = request.current_tournament
+        if not tournament or request.method not in ('GET', 'HEAD') or not getattr(settings, 'PUBLIC_PAGE_CACHE', True):
+            return view(request, *args, **kwargs)
+
+        key = version_key(tournament, 'page-%s' % request.get_full_path())
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, 'render'):
+                # template responses are rendered lazily
+                response.render()
+            cache.set(key, (response.content, response['Content-Type']), getattr(settings, 'PUBLIC_PAGE_CACHE_TIMEOUT', None))
+        return response
+
+    return wrapped_view
+
+
+def public_etag(request, *args, **kwargs):
+    tournament = request.current_tournament
+    return '%d-%d' % (tournament.pk, tournament.version) if tournament else None
+
+
+def public_last_modified(request, *args, **kwargs):
+    tournament = request.current_tournament
+    return tournament.last_modified() if tournament else None
+
+
+def conditional_public_page(view):
+    """
+    Decorator for views of the public pages, which answers conditional requests (If-None-Match and If-Modified-Since)
+    with 304 Not Modified if the data of the current tournament did not change, without calling the view.
+    Validators are derived from the version of the tournament, which is already loaded by CurrentTournamentMiddleware.
+    Browsers are asked to revalidate the page every time.
+    """
+    conditional_view = condition(etag_func=public_etag, last_modified_func=public_last_modified)(view)
+
+    @wraps(view)
+    def wrapped_view(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    return wrapped_view
+
+
+# number of cache hits and misses of each fragment, in this process
+fragment_hits = Counter()
+fragment_misses = Counter()
+fragment_lock = threading.Lock()
+
+
+def digest(*values):
+    """
+    Short digest of the given values (through their representation), to be used in cache keys.
+    """
+    return hashlib.md5(repr(values).encode()).hexdigest()
+
+
+def fragment_key(name, *vary_on):
+    return 'fragment-%s-%s' % (name, digest(*vary_on))
+
+
+def get_fragment(name, *vary_on):
+    """
+    Return the cached fragment with the given name and inputs, or None; the hit or miss is counted.
+    """
+    content = cache.get(fragment_key(name, *vary_on))
+    with fragment_lock:
+        if content is None:
+            fragment_misses[name] += 1
+        else:
+            fragment_hits[name] += 1
+    return content
+
+
+def set_fragment(content, name, *vary_on, permanent=False):
+    cache.set(fragment_key(name, *vary_on), content, None if permanent else getattr(settings, 'PUBLIC_PAGE_CACHE_TIMEOUT', None))
+
+
+def cached_fragments(name, vary_on_list):
+    """
+    Return the set of the inputs (from the given list) whose fragment is in the cache, without counting hits and misses.
+    """
+    keys = {fragment_key(name, *vary_on): vary_on for vary_on in vary_on_list}
+    return set(keys[key] for key in cache.get_many(keys.keys()))
+
+
+def fragment_stats():
+    """
+    Return a list of (fragment name, hits, misses).
+    """
+    with fragment_lock:
+        return [(name, fragment_hits[name], fragment_misses[name]) for name in sorted(set(fragment_hits) | set(fragment_misses))]
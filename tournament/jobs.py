@@ -0,0 +1,96 @@
+"""
+Creation of rounds in the background, so that pairings are not computed inside HTTP requests.
+
+Jobs are stored in the database (see RoundJob), which acts as a queue: they are run by a pool of
+worker threads of the web server process, and every worker claims a queued job with an atomic update,
+so that each job is run exactly once.
+"""
+
+import datetime
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import *
+
+
+executor = None
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=getattr(settings, 'ROUND_JOB_WORKERS', 1), thread_name_prefix='round-job')
+    return executor
+
+
+def submit_round_job(tournament):
+    """
+    Queue the creation of a new round for the given tournament, and return the job.
+    If a job for this tournament is already queued or running, no new job is queued and that job is returned,
+    so that a round is not created twice.
+    """
+    # jobs older than this are considered lost (e.g., if the server was restarted while running them)
+    timeout = datetime.timedelta(seconds=getattr(settings, 'ROUND_JOB_TIMEOUT', 600))
+
+    with transaction.atomic():
+        # concurrent requests cannot both queue a job
+        tournament.lock()
+
+        job = RoundJob.objects.filter(tournament=tournament, status__in=(QUEUED, RUNNING), creation_time__gte=timezone.now() - timeout).first()
+        if job is not None:
+            return job
+
+        RoundJob.objects.filter(tournament=tournament, status__in=(QUEUED, RUNNING)).update(status=FAILED, error='Timed out.', end_time=timezone.now())
+        job = RoundJob.objects.create(tournament=tournament)
+
+    if getattr(settings, 'ROUND_JOB_WORKERS', 1) == 0:
+        # run the job synchronously
+        process_queue(close_connection=False)
+    else:
+        get_executor().submit(process_queue)
+
+    job.refresh_from_db()
+    return job
+
+
+def process_queue(close_connection=True):
+    """
+    Run queued jobs, until the queue is empty.
+    """
+    try:
+        while True:
+            job = RoundJob.objects.filter(status=QUEUED).order_by('pk').first()
+            if job is None:
+                break
+
+            # claim the job (another worker may have claimed it in the meantime)
+            if RoundJob.objects.filter(pk=job.pk, status=QUEUED).update(status=RUNNING, start_time=timezone.now()) == 1:
+                run_job(job)
+
+    finally:
+        if close_connection:
+            # worker threads have their own database connection
+            connection.close()
+
+
+def run_job(job):
+    try:
+        round, success = job.tournament.create_round()
+        if round is None:
+            job.status = FAILED
+            job.error = 'Another round was created in the meantime.'
+        else:
+            job.status = DONE
+            job.round = round
+            job.success = success
+
+    except Exception:
+        job.status = FAILED
+        job.error = traceback.format_exc()
+
+    job.end_time = timezone.now()
+    job.save(update_fields=['status', 'round', 'success', 'error', 'end_time'])
@@ -0,0 +1,246 @@
+"""
+Live feed of the changes of the public data, streamed to the clients as server-sent events (see LiveFeedView).
+
+Changes are collected by the signal handlers (see signals.py) and published once per transaction, after it is committed,
+as events of three types:
+- round: a round was created or deleted, or its visibility, number or scheduled time changed;
+- result: the result of a match of a public round changed;
+- standings: the rows of the public team scoreboard which changed (as in TeamScoreboardApiView).
+
+Events are kept in the Django cache, so with a shared cache backend (see sqlite_cache.py) a client receives the events
+published by all the worker processes. Clients waiting for events do not run any database query: threads of the process
+which publishes an event are woken up at once, and the others notice it by reading the id of the latest event from the cache
+every LIVE_FEED_POLL_INTERVAL seconds.
+Every open stream keeps a thread of the web server busy for up to LIVE_FEED_MAX_DURATION seconds.
+"""
+
+import json
+import time
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import *
+
+
+# number of events kept for clients which reconnect, and seconds after which they expire from the cache
+BUFFER_SIZE = 1000
+EVENT_TIMEOUT = 3600
+
+
+class Feed:
+    """
+    Publish/subscribe channel with the latest events, kept in the cache under keys starting with the given name.
+    Event ids are consecutive; when the feed is (re)created in the cache, they start from the current time in microseconds,
+    so that ids are not reused if the cache loses the feed.
+    """
+    def __init__(self, name='live-feed', size=BUFFER_SIZE):
+        self.name = name
+        self.size = size
+        # woken up by the events published by this process
+        self.condition = threading.Condition()
+
+    def last_id_key(self):
+        return '%s-last-id' % self.name
+
+    def event_key(self, event_id):
+        return '%s-event-%d' % (self.name, event_id)
+
+    def create(self):
+        """
+        Create the feed in the cache, if it is not there (e.g., because it was evicted).
+        """
+        cache.add(self.last_id_key(), int(time.time() * 10**6), None)
+
+    @property
+    def last_id(self):
+        """
+        Id of the latest event.
+        """
+        last_id = cache.get(self.last_id_key())
+        if last_id is None:
+            self.create()
+            last_id = cache.get(self.last_id_key(), 0)
+        return last_id
+
+    def publish(self, event_type, data):
+        try:
+            event_id = cache.incr(self.last_id_key())
+        except ValueError:
+            self.create()
+            event_id = cache.incr(self.last_id_key())
+        cache.set(self.event_key(event_id), (event_type, data), EVENT_TIMEOUT)
+        with self.condition:
+            self.condition.notify_all()
+        return event_id
+
+    def read(self, last_id):
+        """
+        Return the id of the latest event, and the events published after the event with the given id
+        which are available, up to the first missing one (it may be still being written by another process).
+        Return None if last_id is not valid, or too old.
+        """
+        current_id = self.last_id
+        if last_id > current_id or current_id - last_id > self.size:
+            return None
+        event_ids = range(last_id + 1, current_id + 1)
+        values = cache.get_many([self.event_key(event_id) for event_id in event_ids])
+        events = []
+        for event_id in event_ids:
+            value = values.get(self.event_key(event_id))
+            if value is None:
+                break
+            events.append((event_id,) + tuple(value))
+        return current_id, events
+
+    def wait(self, last_id, timeout):
+        """
+        Return the events published after the event with the given id, waiting at most timeout seconds for new events.
+        Return None if some of those events are not available anymore (or last_id is not valid),
+        in which case the client should reload all the data.
+        """
+        poll_interval = getattr(settings, 'LIVE_FEED_POLL_INTERVAL', 1)
+        end_time = time.monotonic() + timeout
+        missing = False
+        while True:
+            result = self.read(last_id)
+            if result is None:
+                return None
+            current_id, events = result
+            if events:
+                return events
+
+            if current_id > last_id:
+                # the next event is being written by another process, or it was lost
+                if missing:
+                    return None
+                missing = True
+                delay = poll_interval
+            else:
+                delay = end_time - time.monotonic()
+                if delay <= 0:
+                    return []
+                delay = min(delay, poll_interval)
+
+            with self.condition:
+                self.condition.wait(delay)
+
+
+feed = Feed()
+
+
+# changes of the current transaction (see add_changes)
+_pending = threading.local()
+
+
+class Changes:
+    """
+    Ids of the rounds, matches and tournaments changed by a transaction, and of the deleted rounds (with their tournament).
+    """
+    def __init__(self):
+        self.rounds = set()
+        self.matches = set()
+        self.tournaments = set()
+        self.deleted_rounds = {}
+        self.published = False
+
+    def update(self, rounds=(), matches=(), tournaments=(), deleted_rounds=()):
+        self.rounds.update(rounds)
+        self.matches.update(matches)
+        self.tournaments.update(tournaments)
+        self.deleted_rounds.update(deleted_rounds)
+
+    def publish(self):
+        """
+        Publish the events of the changes (only once, see add_changes).
+        """
+        if self.published:
+            return
+        self.published = True
+        tournaments = set(self.tournaments)
+
+        # rounds whose deletion was rolled back still exist
+        existing_rounds = set(Round.objects.filter(pk__in=self.deleted_rounds).values_list('pk', flat=True))
+        for (round_id, tournament_id) in self.deleted_rounds.items():
+            if round_id in existing_rounds:
+                continue
+            tournaments.add(tournament_id)
+            feed.publish('round', {'tournament': tournament_id, 'id': round_id, 'deleted': True})
+
+        for round in Round.objects.filter(pk__in=self.rounds):
+            tournaments.add(round.tournament_id)
+            feed.publish('round', {
+                'tournament': round.tournament_id,
+                'id': round.pk,
+                'number': round.number,
+                'visibility': round.visibility,
+                'version': round.version,
+            })
+
+        results = {}
+        for team_result in TeamResult.objects.filter(match__in=self.matches).select_related('match__round').order_by('team__name'):
+            results.setdefault(team_result.match, []).append(team_result)
+        for (match, team_results) in results.items():
+            round = match.round
+            tournaments.add(round.tournament_id)
+            if not round.show_results():
+                continue
+            scores = [team_result.score for team_result in team_results]
+            feed.publish('result', {
+                'tournament': round.tournament_id,
+                'round': round.pk,
+                'match': match.pk,
+                'teams': [team_result.team_id for team_result in team_results],
+                'scores': [float(score) for score in scores] if match.type == NORMAL and len(scores) == 2 and None not in scores else None,
+            })
+
+        for tournament in Tournament.objects.filter(pk__in=tournaments):
+            publish_standings(tournament)
+
+
+def add_changes(**changes):
+    """
+    Collect the ids of changed rounds, matches and tournaments (see Changes), to publish them once when the current transaction is committed
+    (immediately, outside transactions).
+    The changes are published by the first commit after they were collected: publish is registered again at every call,
+    so that the changes are not lost if a savepoint with the only registration is rolled back, and it does nothing
+    after the first time. Changes left by a rolled back transaction are published with those of the next one.
+    """
+    pending = getattr(_pending, 'changes', None)
+    if pending is None or pending.published:
+        pending = Changes()
+        _pending.changes = pending
+    pending.update(**changes)
+    transaction.on_commit(pending.publish)
+
+
+def publish_standings(tournament):
+    """
+    Publish the rows of the public team scoreboard which changed since they were last published.
+    """
+    from .views import public_team_scoreboard, team_scoreboard_row
+
+    rows = {team.pk: team_scoreboard_row(team, score, rank) for (team, score, rank) in public_team_scoreboard(tournament)}
+    # the rows last published by any process (concurrent publishers may send some unchanged rows again)
+    key = 'live-standings-%d' % tournament.pk
+    previous = cache.get(key, {})
+    cache.set(key, rows, None)
+
+    changed = [row for (team_id, row) in rows.items() if previous.get(team_id) != row]
+    removed = [team_id for team_id in previous if team_id not in rows]
+    if changed or removed:
+        feed.publish('standings', {
+            'tournament': tournament.pk,
+            'version': tournament.version,
+            'rows': changed,
+            'removed': removed,
+        })
+
+
+def format_event(event_id, event_type, data):
+    """
+    Text of a server-sent event.
+    """
+    return 'id: %d\nevent: %s\ndata: %s\n\n' % (event_id, event_type, json.dumps(data, separators=(',', ':')))
@@ -0,0 +1,498 @@
+"""
+Maximum-weight matching on graphs given as integer edge lists.
+
+This is an implementation of Edmonds' blossom algorithm with primal-dual updates,
+following the structure of the classic O(n^3) algorithm by Galil (also used by networkx).
+Vertices are the integers 0..n-1, and edges are (i, j, weight) triples.
+All the bookkeeping is done with plain lists indexed by integers, and if all weights
+are integers then all the computations are done on integers
+(dual variables are stored multiplied by 2).
+"""
+
+
+def max_weight_matching(num_vertices, edges, maxcardinality=False):
+    """
+    Compute a maximum-weight matching of the graph with vertices 0..num_vertices-1
+    and the given list of edges (i, j, weight).
+    If maxcardinality is True, compute a maximum-weight matching among those
+    of maximum cardinality.
+    Return a list mate, where mate[v] is the vertex matched to v (or -1).
+    """
+    nvertex = num_vertices
+    nedge = len(edges)
+    mate = nvertex * [-1]
+
+    if nedge == 0:
+        return mate
+
+    # edge endpoints and (doubled) weights, as flat lists
+    endpoint = [0] * (2 * nedge)
+    weight2 = [0] * nedge
+    neighbend = [[] for v in range(nvertex)]
+    for k, (i, j, w) in enumerate(edges):
+        endpoint[2*k] = i
+        endpoint[2*k+1] = j
+        weight2[k] = 2 * w
+        neighbend[i].append(2*k+1)
+        neighbend[j].append(2*k)
+
+    maxweight = max(0, max(w for (i, j, w) in edges))
+
+    # label[b] is 0 (free), 1 (S-vertex/blossom) or 2 (T-vertex/blossom)
+    label = (2 * nvertex) * [0]
+    # labelend[b] is the remote endpoint of the edge through which b obtained its label
+    labelend = (2 * nvertex) * [-1]
+    # inblossom[v] is the top-level blossom containing vertex v
+    inblossom = list(range(nvertex))
+    blossomparent = (2 * nvertex) * [-1]
+    blossomchilds = (2 * nvertex) * [None]
+    blossombase = list(range(nvertex)) + nvertex * [-1]
+    blossomendps = (2 * nvertex) * [None]
+    # bestedge[b] is the least-slack edge to a different S-blossom
+    bestedge = (2 * nvertex) * [-1]
+    blossombestedges = (2 * nvertex) * [None]
+    unusedblossoms = list(range(nvertex, 2 * nvertex))
+    # dual variables; vertex duals are multiplied by 2, so that slack() is an integer
+    dualvar = nvertex * [maxweight] + nvertex * [0]
+    allowedge = nedge * [False]
+    allowed = []  # edges with allowedge[k] set, to be reset at the end of each stage
+    queue = []
+
+    def slack(k):
+        return dualvar[endpoint[2*k]] + dualvar[endpoint[2*k+1]] - weight2[k]
+
+    def blossom_leaves(b):
+        # list of the vertices contained in blossom b
+        # (iterative, because blossoms can be deeply nested)
+        if b < nvertex:
+            return [b]
+        leaves = []
+        stack = [b]
+        while stack:
+            t = stack.pop()
+            if t < nvertex:
+                leaves.append(t)
+            else:
+                stack.extend(blossomchilds[t])
+        return leaves
+
+    def assign_label(w, t, p):
+        # assign label t to the top-level blossom containing vertex w,
+        # coming through the edge with remote endpoint p
+        b = inblossom[w]
+        label[w] = label[b] = t
+        labelend[w] = labelend[b] = p
+        bestedge[w] = bestedge[b] = -1
+        if t == 1:
+            # b became an S-blossom: add its vertices to the queue
+            queue.extend(blossom_leaves(b))
+        else:
+            # b became a T-blossom: label its mate as an S-blossom
+            base = blossombase[b]
+            assign_label(endpoint[mate[base]], 1, mate[base] ^ 1)
+
+    def scan_blossom(v, w):
+        # trace back from v and w to find either a new blossom or an augmenting path;
+        # return the base vertex of the new blossom, or -1
+        path = []
+        base = -1
+        while v != -1 or w != -1:
+            b = inblossom[v]
+            if label[b] & 4:
+                base = blossombase[b]
+                break
+            path.append(b)
+            label[b] = 5
+            if labelend[b] == -1:
+                # the base of blossom b is single: stop tracing this path
+                v = -1
+            else:
+                v = endpoint[labelend[b]]
+                b = inblossom[v]
+                v = endpoint[labelend[b]]
+            if w != -1:
+                v, w = w, v
+        for b in path:
+            label[b] = 1
+        return base
+
+    def add_blossom(base, k):
+        # construct a new blossom with the given base, containing edge k
+        v = endpoint[2*k]
+        w = endpoint[2*k+1]
+        bb = inblossom[base]
+        bv = inblossom[v]
+        bw = inblossom[w]
+
+        b = unusedblossoms.pop()
+        blossombase[b] = base
+        blossomparent[b] = -1
+        blossomparent[bb] = b
+        blossomchilds[b] = path = []
+        blossomendps[b] = endps = []
+
+        # trace back from v to base
+        while bv != bb:
+            blossomparent[bv] = b
+            path.append(bv)
+            endps.append(labelend[bv])
+            v = endpoint[labelend[bv]]
+            bv = inblossom[v]
+        path.append(bb)
+        path.reverse()
+        endps.reverse()
+        endps.append(2*k)
+
+        # trace back from w to base
+        while bw != bb:
+            blossomparent[bw] = b
+            path.append(bw)
+            endps.append(labelend[bw] ^ 1)
+            w = endpoint[labelend[bw]]
+            bw = inblossom[w]
+
+        label[b] = 1
+        labelend[b] = labelend[bb]
+        dualvar[b] = 0
+
+        # relabel vertices
+        for v in blossom_leaves(b):
+            if label[inblossom[v]] == 2:
+                # former T-vertices become S-vertices and must be scanned
+                queue.append(v)
+            inblossom[v] = b
+
+        # compute blossombestedges[b]
+        bestedgeto = (2 * nvertex) * [-1]
+        for bv in path:
+            if blossombestedges[bv] is None:
+                nblists = [[p // 2 for p in neighbend[v]] for v in blossom_leaves(bv)]
+            else:
+                nblists = [blossombestedges[bv]]
+            for nblist in nblists:
+                for k in nblist:
+                    i = endpoint[2*k]
+                    j = endpoint[2*k+1]
+                    if inblossom[j] == b:
+                        i, j = j, i
+                    bj = inblossom[j]
+                    if bj != b and label[bj] == 1 and (bestedgeto[bj] == -1 or slack(k) < slack(bestedgeto[bj])):
+                        bestedgeto[bj] = k
+            blossombestedges[bv] = None
+            bestedge[bv] = -1
+
+        blossombestedges[b] = [k for k in bestedgeto if k != -1]
+        bestedge[b] = -1
+        for k in blossombestedges[b]:
+            if bestedge[b] == -1 or slack(k) < slack(bestedge[b]):
+                bestedge[b] = k
+
+    def run_nested(steps, b, v):
+        # run steps(b, v), a generator which yields the arguments of its recursive calls,
+        # with an explicit stack (iterative, because blossoms can be deeply nested)
+        stack = [steps(b, v)]
+        while stack:
+            for args in stack[-1]:
+                stack.append(steps(*args))
+                break
+            else:
+                stack.pop()
+
+    def expand_blossom(b, endstage):
+        run_nested(expand_blossom_steps, b, endstage)
+
+    def expand_blossom_steps(b, endstage):
+        # expand the given top-level blossom
+        for s in blossomchilds[b]:
+            blossomparent[s] = -1
+            if s < nvertex:
+                inblossom[s] = s
+            elif endstage and dualvar[s] == 0:
+                yield (s, endstage)
+            else:
+                for v in blossom_leaves(s):
+                    inblossom[v] = s
+
+        if not endstage and label[b] == 2:
+            # relabel the sub-blossoms along the even path through the blossom
+            entrychild = inblossom[endpoint[labelend[b] ^ 1]]
+            j = blossomchilds[b].index(entrychild)
+            if j & 1:
+                j -= len(blossomchilds[b])
+                jstep = 1
+                endptrick = 0
+            else:
+                jstep = -1
+                endptrick = 1
+
+            p = labelend[b]
+            while j != 0:
+                label[endpoint[p ^ 1]] = 0
+                label[endpoint[blossomendps[b][j-endptrick] ^ endptrick ^ 1]] = 0
+                assign_label(endpoint[p ^ 1], 2, p)
+                allowedge[blossomendps[b][j-endptrick] // 2] = True
+                allowed.append(blossomendps[b][j-endptrick] // 2)
+                j += jstep
+                p = blossomendps[b][j-endptrick] ^ endptrick
+                allowedge[p // 2] = True
+                allowed.append(p // 2)
+                j += jstep
+
+            bv = blossomchilds[b][j]
+            label[endpoint[p ^ 1]] = label[bv] = 2
+            labelend[endpoint[p ^ 1]] = labelend[bv] = p
+            bestedge[bv] = -1
+
+            j += jstep
+            while blossomchilds[b][j] != entrychild:
+                # examine the vertices of the sub-blossoms on the odd path
+                bv = blossomchilds[b][j]
+                if label[bv] == 1:
+                    j += jstep
+                    continue
+                for v in blossom_leaves(bv):
+                    if label[v] != 0:
+                        break
+                if label[v] != 0:
+                    label[v] = 0
+                    label[endpoint[mate[blossombase[bv]]]] = 0
+                    assign_label(v, 2, labelend[v])
+                j += jstep
+
+        # recycle the blossom number
+        label[b] = labelend[b] = -1
+        blossomchilds[b] = blossomendps[b] = None
+        blossombase[b] = -1
+        blossombestedges[b] = None
+        bestedge[b] = -1
+        unusedblossoms.append(b)
+
+    def augment_blossom(b, v):
+        run_nested(augment_blossom_steps, b, v)
+
+    def augment_blossom_steps(b, v):
+        # swap matched/unmatched edges over an alternating path through blossom b
+        # between vertex v and the base vertex
+        t = v
+        while blossomparent[t] != b:
+            t = blossomparent[t]
+        if t >= nvertex:
+            yield (t, v)
+
+        i = j = blossomchilds[b].index(t)
+        if i & 1:
+            j -= len(blossomchilds[b])
+            jstep = 1
+            endptrick = 0
+        else:
+            jstep = -1
+            endptrick = 1
+
+        while j != 0:
+            j += jstep
+            t = blossomchilds[b][j]
+            p = blossomendps[b][j-endptrick] ^ endptrick
+            if t >= nvertex:
+                yield (t, endpoint[p])
+            j += jstep
+            t = blossomchilds[b][j]
+            if t >= nvertex:
+                yield (t, endpoint[p ^ 1])
+            mate[endpoint[p]] = p ^ 1
+            mate[endpoint[p ^ 1]] = p
+
+        # rotate the list of sub-blossoms so that the new base is at the front
+        blossomchilds[b] = blossomchilds[b][i:] + blossomchilds[b][:i]
+        blossomendps[b] = blossomendps[b][i:] + blossomendps[b][:i]
+        blossombase[b] = blossombase[blossomchilds[b][0]]
+
+    def augment_matching(k):
+        # swap matched/unmatched edges over the augmenting path through edge k
+        v = endpoint[2*k]
+        w = endpoint[2*k+1]
+        for (s, p) in ((v, 2*k+1), (w, 2*k)):
+            while True:
+                bs = inblossom[s]
+                if bs >= nvertex:
+                    augment_blossom(bs, s)
+                mate[s] = p
+                if labelend[bs] == -1:
+                    # reached a single vertex
+                    break
+                t = endpoint[labelend[bs]]
+                bt = inblossom[t]
+                s = endpoint[labelend[bt]]
+                j = endpoint[labelend[bt] ^ 1]
+                if bt >= nvertex:
+                    augment_blossom(bt, j)
+                mate[j] = labelend[bt]
+                p = labelend[bt] ^ 1
+
+    # initial greedy matching on edges of maximum weight: these edges have zero slack,
+    # so the duals stay feasible and a lot of stages are saved
+    for k in range(nedge):
+        if weight2[k] == 2 * maxweight:
+            i = endpoint[2*k]
+            j = endpoint[2*k+1]
+            if mate[i] == -1 and mate[j] == -1:
+                mate[i] = 2*k+1
+                mate[j] = 2*k
+
+    # main loop: each stage augments the matching by one edge
+    for stage in range(nvertex):
+        label[:] = (2 * nvertex) * [0]
+        bestedge[:] = (2 * nvertex) * [-1]
+        blossombestedges[nvertex:] = nvertex * [None]
+        for k in allowed:
+            allowedge[k] = False
+        allowed.clear()
+        queue[:] = []
+
+        # label single blossoms/vertices with S and put them in the queue
+        for v in range(nvertex):
+            if mate[v] == -1 and label[inblossom[v]] == 0:
+                assign_label(v, 1, -1)
+
+        augmented = False
+        while True:
+            # substage: grow the alternating forest until an augmenting path is found
+            while queue and not augmented:
+                v = queue.pop()
+                bv = inblossom[v]
+                dv = dualvar[v]
+
+                for p in neighbend[v]:
+                    k = p // 2
+                    w = endpoint[p]
+                    bw = inblossom[w]
+                    if bv == bw:
+                        # this edge is internal to a blossom
+                        continue
+
+                    if not allowedge[k]:
+                        kslack = dv + dualvar[w] - weight2[k]
+                        if kslack <= 0:
+                            allowedge[k] = True
+                            allowed.append(k)
+
+                    if allowedge[k]:
+                        if label[bw] == 0:
+                            # w is a free vertex: label it with T, and its mate with S
+                            assign_label(w, 2, p ^ 1)
+                        elif label[bw] == 1:
+                            # w is an S-vertex: either a new blossom or an augmenting path
+                            base = scan_blossom(v, w)
+                            if base >= 0:
+                                add_blossom(base, k)
+                                bv = inblossom[v]
+                            else:
+                                augment_matching(k)
+                                augmented = True
+                                break
+                        elif label[w] == 0:
+                            # w is inside a T-blossom, but w itself is not reachable yet
+                            label[w] = 2
+                            labelend[w] = p ^ 1
+
+                    elif label[bw] == 1:
+                        # keep track of the least-slack edge to a different S-blossom
+                        if bestedge[bv] == -1 or kslack < slack(bestedge[bv]):
+                            bestedge[bv] = k
+
+                    elif label[w] == 0:
+                        # keep track of the least-slack edge to a free vertex
+                        if bestedge[w] == -1 or kslack < slack(bestedge[w]):
+                            bestedge[w] = k
+
+            if augmented:
+                break
+
+            # no augmenting path found with the current duals: compute the delta update
+            deltatype = -1
+            delta = deltaedge = deltablossom = None
+
+            if not maxcardinality:
+                # delta1: minimum value of any vertex dual
+                deltatype = 1
+                delta = min(dualvar[:nvertex])
+
+            for v in range(nvertex):
+                # delta2: minimum slack on any edge between an S-vertex and a free vertex
+                if label[inblossom[v]] == 0 and bestedge[v] != -1:
+                    d = slack(bestedge[v])
+                    if deltatype == -1 or d < delta:
+                        delta = d
+                        deltatype = 2
+                        deltaedge = bestedge[v]
+
+            for b in range(2 * nvertex):
+                # delta3: half the minimum slack on any edge between a pair of S-blossoms
+                if blossomparent[b] == -1 and label[b] == 1 and bestedge[b] != -1:
+                    d = slack(bestedge[b]) // 2
+                    if deltatype == -1 or d < delta:
+                        delta = d
+                        deltatype = 3
+                        deltaedge = bestedge[b]
+
+            for b in range(nvertex, 2 * nvertex):
+                # delta4: minimum z variable of any T-blossom
+                if blossombase[b] >= 0 and blossomparent[b] == -1 and label[b] == 2 and (deltatype == -1 or dualvar[b] < delta):
+                    delta = dualvar[b]
+                    deltatype = 4
+                    deltablossom = b
+
+            if deltatype == -1:
+                # no further improvement possible (max-cardinality optimum reached)
+                deltatype = 1
+                delta = max(0, min(dualvar[:nvertex]))
+
+            # update dual variables
+            for v in range(nvertex):
+                lab = label[inblossom[v]]
+                if lab == 1:
+                    dualvar[v] -= delta
+                elif lab == 2:
+                    dualvar[v] += delta
+            for b in range(nvertex, 2 * nvertex):
+                if blossombase[b] >= 0 and blossomparent[b] == -1:
+                    if label[b] == 1:
+                        dualvar[b] += delta
+                    elif label[b] == 2:
+                        dualvar[b] -= delta
+
+            if deltatype == 1:
+                # no further improvement possible
+                break
+            elif deltatype == 2:
+                # use the least-slack edge to continue the search
+                allowedge[deltaedge] = True
+                allowed.append(deltaedge)
+                i = endpoint[2*deltaedge]
+                j = endpoint[2*deltaedge+1]
+                if label[inblossom[i]] == 0:
+                    i, j = j, i
+                queue.append(i)
+            elif deltatype == 3:
+                # use the least-slack edge to continue the search
+                allowedge[deltaedge] = True
+                allowed.append(deltaedge)
+                queue.append(endpoint[2*deltaedge])
+            else:
+                # expand the least-z blossom
+                expand_blossom(deltablossom, False)
+
+        if not augmented:
+            # the matching is optimal
+            break
+
+        # end of stage: expand all S-blossoms with zero dual
+        for b in range(nvertex, 2 * nvertex):
+            if blossomparent[b] == -1 and blossombase[b] >= 0 and label[b] == 1 and dualvar[b] == 0:
+                expand_blossom(b, True)
+
+    # transform mate[] from endpoints to vertices
+    for v in range(nvertex):
+        if mate[v] >= 0:
+            mate[v] = endpoint[mate[v]]
+
+    return mate
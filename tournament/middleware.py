@@ -1,4 +1,59 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches, DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.functional import SimpleLazyObject
+
 from .models import *
+from .cache import tournament_generation
+
+
+# current tournament, as (generation, database alias, field names, values) of the loaded instance
+_current = None
+_current_lock = threading.Lock()
+
+
+def cache_current_tournament():
+    """
+    Whether the current tournament is cached by every process (see CURRENT_TOURNAMENT_CACHE).
+    By default it is, unless the cache backend belongs to a single process: in that case, the changes made
+    by other processes would not invalidate it.
+    """
+    value = getattr(settings, 'CURRENT_TOURNAMENT_CACHE', None)
+    if value is None:
+        return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+    return value
+
+
+def current_tournament():
+    """
+    Return the current tournament (see Tournament.current), cached in this process until any tournament changes
+    (see bump_tournament_generation, whose token is shared by all processes through the cache).
+    Every request gets its own instance, built as if it was loaded from the database.
+    """
+    global _current
+    if not cache_current_tournament():
+        return Tournament.current()
+
+    generation = tournament_generation()
+    with _current_lock:
+        cached = _current
+    if cached is not None and cached[0] == generation:
+        if cached[1] is None:
+            return None
+        return Tournament.from_db(*cached[1:])
+
+    tournament = Tournament.current()
+    if tournament is None:
+        cached = (generation, None)
+    else:
+        fields = tournament._meta.concrete_fields
+        cached = (generation, tournament._state.db, [field.attname for field in fields], [getattr(tournament, field.attname) for field in fields])
+    with _current_lock:
+        _current = cached
+    return tournament
 
 
 class CurrentTournamentMiddleware:
@@ -9,14 +64,10 @@ class CurrentTournamentMiddleware:
     def __call__(self, request):
         # Code to be executed for each request before
         # the view (and later middleware) are called.
-        
-        try:
-            current_tournament = Tournament.objects.latest()
-        
-        except Tournament.DoesNotExist:
-            current_tournament = None
-        
-        request.current_tournament = current_tournament
+
+        # the current tournament is only resolved if it is used (check it with "if request.current_tournament",
+        # since it is never None)
+        request.current_tournament = SimpleLazyObject(current_tournament)
 
         response = self.get_response(request)
 
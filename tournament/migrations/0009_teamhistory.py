@@ -0,0 +1,52 @@
+# Generated by Django 2.2.3 on 2026-10-18 11:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_histories(apps, schema_editor):
+    TeamResult = apps.get_model('tournament', 'TeamResult')
+    TeamHistory = apps.get_model('tournament', 'TeamHistory')
+
+    matches = {}
+    for (tournament_id, match_id, match_type, table_id, team_id) in TeamResult.objects.values_list('match__round__tournament', 'match', 'match__type', 'match__table', 'team').order_by('match', 'team'):
+        matches.setdefault(match_id, (tournament_id, match_type, table_id, []))[3].append(team_id)
+
+    histories = {}
+    for (tournament_id, match_type, table_id, teams) in matches.values():
+        for team_id in teams:
+            history = histories.setdefault((tournament_id, team_id), TeamHistory(tournament_id=tournament_id, team_id=team_id, opponents='', byes=0, tables=''))
+            if match_type == 'N':
+                history.opponents = ','.join(x for x in history.opponents.split(',') + [str(x) for x in teams if x != team_id] if x)
+            elif match_type == 'B':
+                history.byes += 1
+            if table_id is not None:
+                history.tables = ','.join(x for x in history.tables.split(',') + [str(table_id)] if x)
+
+    TeamHistory.objects.bulk_create(histories.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0008_player_phantom_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamHistory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opponents', models.TextField(blank=True, default='', help_text='Comma-separated ids of the opponents.')),
+                ('byes', models.PositiveIntegerField(default=0)),
+                ('tables', models.TextField(blank=True, default='', help_text='Comma-separated ids of the tables.')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tournament.Team')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tournament.Tournament')),
+            ],
+            options={
+                'verbose_name_plural': 'team histories',
+                'unique_together': {('tournament', 'team')},
+            },
+        ),
+        migrations.RunPython(build_histories, migrations.RunPython.noop),
+    ]
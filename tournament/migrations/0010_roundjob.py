@@ -0,0 +1,32 @@
+# Generated by Django 2.2.3 on 2026-10-18 11:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0009_teamhistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoundJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('Q', 'Queued'), ('R', 'Running'), ('D', 'Done'), ('F', 'Failed')], default='Q', max_length=1)),
+                ('creation_time', models.DateTimeField(auto_now_add=True)),
+                ('start_time', models.DateTimeField(blank=True, default=None, null=True)),
+                ('end_time', models.DateTimeField(blank=True, default=None, null=True)),
+                ('success', models.BooleanField(default=False, help_text='Whether all teams could be paired.')),
+                ('error', models.TextField(blank=True, default='')),
+                ('round', models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='tournament.Round')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tournament.Tournament')),
+            ],
+            options={
+                'ordering': ['creation_time'],
+                'get_latest_by': 'creation_time',
+            },
+        ),
+    ]
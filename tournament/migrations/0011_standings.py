@@ -0,0 +1,97 @@
+# Generated by Django 2.2.3 on 2026-10-18 11:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+from decimal import Decimal
+
+
+def build_standings(apps, schema_editor):
+    """
+    Compute the standings from all matches (as Match.team_scoreboard and Match.player_scoreboard).
+    """
+    TeamResult = apps.get_model('tournament', 'TeamResult')
+    PlayerResult = apps.get_model('tournament', 'PlayerResult')
+    TeamStanding = apps.get_model('tournament', 'TeamStanding')
+    PlayerStanding = apps.get_model('tournament', 'PlayerStanding')
+
+    def add(standings, key, primary, secondary=Decimal('0.0')):
+        old = standings.get(key, (Decimal('0.0'), Decimal('0.0'), 0))
+        standings[key] = (old[0] + primary, old[1] + secondary, old[2] + 1)
+
+    matches = {}
+    for (tournament_id, bye_score, visibility, match_id, match_type, team_id, score) in TeamResult.objects.values_list(
+            'match__round__tournament', 'match__round__tournament__bye_score', 'match__round__visibility', 'match', 'match__type', 'team', 'score'):
+        matches.setdefault(match_id, (tournament_id, bye_score, visibility, match_type, []))[4].append((team_id, score))
+
+    team_standings = {}
+    for (tournament_id, bye_score, visibility, match_type, results) in matches.values():
+        for public in (False, True):
+            if public and visibility != 'S':
+                continue
+            if match_type == 'B':
+                for (team_id, score) in results:
+                    add(team_standings, (tournament_id, team_id, public), Decimal('1.0'), bye_score)
+            elif len(results) == 2 and all(score is not None for (team_id, score) in results):
+                scores = set(score for (team_id, score) in results)
+                for (team_id, score) in results:
+                    primary = Decimal('0.5') if len(scores) == 1 else Decimal('1.0') if score == max(scores) else Decimal('0.0')
+                    add(team_standings, (tournament_id, team_id, public), primary, score)
+
+    TeamStanding.objects.bulk_create([
+        TeamStanding(tournament_id=tournament_id, team_id=team_id, public=public, primary=primary, secondary=secondary, num_matches=num_matches)
+        for ((tournament_id, team_id, public), (primary, secondary, num_matches)) in team_standings.items()
+    ])
+
+    player_standings = {}
+    for (tournament_id, visibility, match_type, player_id, score) in PlayerResult.objects.values_list(
+            'match__round__tournament', 'match__round__visibility', 'match__type', 'player', 'score'):
+        for public in (False, True):
+            if public and visibility != 'S':
+                continue
+            primary = Decimal('1.0') if match_type == 'B' else score if score is not None else Decimal('0.0')
+            add(player_standings, (tournament_id, player_id, public), primary)
+
+    PlayerStanding.objects.bulk_create([
+        PlayerStanding(tournament_id=tournament_id, player_id=player_id, public=public, primary=primary, num_matches=num_matches)
+        for ((tournament_id, player_id, public), (primary, secondary, num_matches)) in player_standings.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0010_roundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamStanding',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public', models.BooleanField()),
+                ('primary', models.DecimalField(decimal_places=1, default=0, max_digits=6)),
+                ('secondary', models.DecimalField(decimal_places=1, default=0, max_digits=6)),
+                ('num_matches', models.PositiveIntegerField(default=0)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tournament.Team')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tournament.Tournament')),
+            ],
+            options={
+                'unique_together': {('tournament', 'team', 'public')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerStanding',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public', models.BooleanField()),
+                ('primary', models.DecimalField(decimal_places=1, default=0, max_digits=6)),
+                ('num_matches', models.PositiveIntegerField(default=0)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tournament.Player')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tournament.Tournament')),
+            ],
+            options={
+                'unique_together': {('tournament', 'player', 'public')},
+            },
+        ),
+        migrations.RunPython(build_standings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 2.2.3 on 2026-10-18 11:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_snapshots(apps, schema_editor):
+    """
+    Compute the snapshots of the complete rounds (as RoundSnapshot.refresh), with scores in tenths.
+    """
+    Round = apps.get_model('tournament', 'Round')
+    TeamResult = apps.get_model('tournament', 'TeamResult')
+    RoundSnapshot = apps.get_model('tournament', 'RoundSnapshot')
+
+    def tenths(value):
+        return int(value * 10)
+
+    matches = {}
+    for (round_id, bye_score, match_id, match_type, team_id, score) in TeamResult.objects.values_list(
+            'match__round', 'match__round__tournament__bye_score', 'match', 'match__type', 'team', 'score'):
+        matches.setdefault(round_id, {}).setdefault(match_id, (bye_score, match_type, []))[2].append((team_id, score))
+
+    snapshots = []
+    scores = {}
+    for round in Round.objects.order_by('tournament', 'number'):
+        if round.tournament_id not in scores:
+            scores[round.tournament_id] = {False: {}, True: {}}
+        elif scores[round.tournament_id] is None:
+            # a previous round is not complete
+            continue
+        round_matches = matches.get(round.pk, {}).values()
+        if any(match_type == 'N' and any(score is None for (team_id, score) in results) for (bye_score, match_type, results) in round_matches):
+            scores[round.tournament_id] = None
+            continue
+
+        round_scores = {}
+        for (bye_score, match_type, results) in round_matches:
+            for (i, (team_id, score)) in enumerate(results):
+                if match_type == 'B':
+                    item = (10, tenths(bye_score))
+                elif len(results) == 2:
+                    other = results[1 - i][1]
+                    item = (10 if score > other else 5 if score == other else 0, tenths(score))
+                else:
+                    continue
+                old = round_scores.get(team_id, (0, 0, 0))
+                round_scores[team_id] = (old[0] + item[0], old[1] + item[1], old[2] + 1)
+
+        for public in (False, True):
+            if not public or round.visibility == 'S':
+                totals = dict(scores[round.tournament_id][public])
+                for (team_id, item) in round_scores.items():
+                    old = totals.get(team_id, (0, 0, 0))
+                    totals[team_id] = (old[0] + item[0], old[1] + item[1], old[2] + item[2])
+                scores[round.tournament_id][public] = totals
+
+            totals = scores[round.tournament_id][public]
+            ranked = sorted(totals.items(), key=lambda x: (-x[1][0], -x[1][1], x[0]))
+            items = []
+            for (k, (team_id, (primary, secondary, num_matches))) in enumerate(ranked):
+                if k == 0 or (primary, secondary) != ranked[k-1][1][:2]:
+                    rank = k + 1
+                items.append('%d:%d:%d:%d:%d' % (team_id, rank, primary, secondary, num_matches))
+            snapshots.append(RoundSnapshot(round=round, public=public, standings=','.join(items)))
+
+    RoundSnapshot.objects.bulk_create(snapshots)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0011_standings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoundSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public', models.BooleanField()),
+                ('standings', models.TextField(blank=True, default='', help_text='Comma-separated items team:rank:primary:secondary:num_matches (scores in tenths).')),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tournament.Round')),
+            ],
+            options={
+                'ordering': ['round', 'public'],
+                'unique_together': {('round', 'public')},
+            },
+        ),
+        migrations.RunPython(build_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.3 on 2026-10-18 11:29
+
+from django.db import migrations, models
+import tournament.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0012_roundsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='tiebreakers',
+            field=models.CharField(blank=True, default='', help_text='Comma-separated tiebreakers, used (in this order) for teams with the same scores: buchholz, median-buchholz, sonneborn-berger, head-to-head.', max_length=255, validators=[tournament.models.validate_tiebreakers]),
+        ),
+    ]
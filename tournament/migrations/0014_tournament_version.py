@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0013_tournament_tiebreakers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0014_tournament_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='round',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
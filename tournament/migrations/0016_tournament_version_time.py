@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0015_round_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='version_time',
+            field=models.DateTimeField(default=None, editable=False, help_text='Time of the latest version.', null=True),
+        ),
+    ]
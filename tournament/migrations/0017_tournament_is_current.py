@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0016_tournament_version_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='is_current',
+            field=models.BooleanField(default=False, help_text='The current tournament is shown in the public pages. If no tournament is current, the latest one is shown.'),
+        ),
+    ]
@@ -1,17 +1,25 @@
-import networkx as nx
-import itertools
-import random
+import time
+import uuid
 from collections import Counter
 from decimal import Decimal
 
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import F, Q, Prefetch, Case, When, Value, Count, Sum, Subquery, OuterRef, DecimalField, FilteredRelation
+from django.db.models.functions import Coalesce, Greatest
 
 from django.core.validators import RegexValidator
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.core.exceptions import ValidationError
 
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from . import pairing
+from .cache import bump_tournament_generation
+from .tiebreakers import TIEBREAKERS, parse_tiebreakers, compute_tiebreakers
+
 
 # match types
 NORMAL = 'N'
@@ -28,6 +36,22 @@ VISIBILITY_CHOICES = (
 )
 
 
+def to_tenths(value):
+    """
+    Convert a score (a Decimal with at most one decimal place, or an integer) to an integer number of tenths.
+    """
+    if isinstance(value, int):
+        return 10 * value
+    return int((Decimal(value) * 10).to_integral_value())
+
+
+def from_tenths(value):
+    """
+    Convert an integer number of tenths to a Decimal with one decimal place, for display.
+    """
+    return Decimal(value).scaleb(-1)
+
+
 class Score:
     """
     A score of a team or a player.
@@ -35,53 +59,103 @@ class Score:
     and a phantom score (used to break ties by hand, e.g. if a tie break is played).
     It also keeps track of the number of matches and (in the case of one match)
     of the type of match (normal/bye).
+    Scores are stored as integer numbers of tenths (as the score fields have one decimal place),
+    and converted to Decimal only when they are read.
+    Total scores of teams may also have computed tiebreakers (see tiebreakers.py),
+    which come after the secondary score in the ordering; they are not kept by sums.
     """
+    __slots__ = ('tenths_primary', 'tenths_secondary', 'tenths_phantom', 'tiebreakers', 'num_matches', 'match_type')
+
     def __init__(self, primary=Decimal('0.0'), secondary=Decimal('0.0'), phantom=Decimal('0.0'), num_matches=0, match_type=None):
-        self.primary = primary
-        self.secondary = secondary
-        self.phantom = phantom
+        self.tenths_primary = to_tenths(primary)
+        self.tenths_secondary = to_tenths(secondary)
+        self.tenths_phantom = to_tenths(phantom)
+        self.tiebreakers = ()
         self.num_matches = num_matches
         self.match_type = match_type
 
+    @classmethod
+    def from_tenths(cls, primary=0, secondary=0, phantom=0, num_matches=0, match_type=None, tiebreakers=()):
+        score = cls.__new__(cls)
+        score.tenths_primary = primary
+        score.tenths_secondary = secondary
+        score.tenths_phantom = phantom
+        score.tiebreakers = tiebreakers
+        score.num_matches = num_matches
+        score.match_type = match_type
+        return score
+
+
+    @property
+    def primary(self):
+        return from_tenths(self.tenths_primary)
+
+    @property
+    def secondary(self):
+        return from_tenths(self.tenths_secondary)
+
+    @property
+    def phantom(self):
+        return from_tenths(self.tenths_phantom)
+
+    @property
+    def tiebreaker_scores(self):
+        return [from_tenths(value) for value in self.tiebreakers]
 
     def raw(self):
         return (self.primary, self.secondary, self.phantom)
 
+    def tenths(self):
+        """
+        Same as raw, in tenths (with the tiebreakers before the phantom score).
+        """
+        return (self.tenths_primary, self.tenths_secondary) + self.tiebreakers + (self.tenths_phantom,)
+
 
     def __repr__(self):
         return self.raw().__repr__()
 
 
     def __eq__(self, other):
-        return self.primary == other.primary and self.secondary == other.secondary and self.phantom == other.phantom and self.num_matches == other.num_matches
+        return self.tenths_primary == other.tenths_primary and self.tenths_secondary == other.tenths_secondary and self.tiebreakers == other.tiebreakers and self.tenths_phantom == other.tenths_phantom and self.num_matches == other.num_matches
 
     def __le__(self, other):
-        if self.raw() != other.raw():
-            return self.raw() < other.raw()
+        if self.tenths_primary != other.tenths_primary:
+            return self.tenths_primary < other.tenths_primary
+        if self.tenths_secondary != other.tenths_secondary:
+            return self.tenths_secondary < other.tenths_secondary
+        if self.tiebreakers != other.tiebreakers:
+            return self.tiebreakers < other.tiebreakers
+        if self.tenths_phantom != other.tenths_phantom:
+            return self.tenths_phantom < other.tenths_phantom
         return self.num_matches >= other.num_matches
 
+    def __lt__(self, other):
+        return not other <= self
+
     def __gt__(self, other):
-        if other is 0:
-            return self != Score()
+        if isinstance(other, int):
+            # used by Counter to discard empty scores
+            return self.tenths_primary != 0 or self.tenths_secondary != 0 or self.tenths_phantom != 0 or self.num_matches != 0
         else:
             return not self <= other
 
     def __hash__(self):
-        return hash((self.primary, self.secondary))
+        return hash((self.tenths_primary, self.tenths_secondary))
 
     def __add__(self, other):
-        if other is 0:
+        if isinstance(other, int):
             return self
         else:
-            return Score(
-                primary=self.primary+other.primary,
-                secondary=self.secondary+other.secondary,
-                phantom=self.phantom+other.phantom,
+            return Score.from_tenths(
+                primary=self.tenths_primary+other.tenths_primary,
+                secondary=self.tenths_secondary+other.tenths_secondary,
+                phantom=self.tenths_phantom+other.tenths_phantom,
                 num_matches=self.num_matches+other.num_matches
             )
 
     def __radd__(self, other):
-        if other is 0:
+        if isinstance(other, int):
             return self
         else:
             return self + other
@@ -90,8 +164,16 @@ class Score:
         """
         Integer representation of the score, used in round creation.
         The primary score weights much more than the secondary score.
+        Tiebreakers (if any) are appended as lower digits, each with TIEBREAKER_SCALE possible values.
         """
-        return int(10*(100 * self.primary + self.secondary))
+        res = 100 * self.tenths_primary + self.tenths_secondary
+        for value in self.tiebreakers:
+            res = res * TIEBREAKER_SCALE + min(max(value, 0), TIEBREAKER_SCALE - 1)
+        return res
+
+
+# tiebreakers are between 0 and 999.9
+TIEBREAKER_SCALE = 10000
 
 
 
@@ -107,12 +189,21 @@ def score_counter_to_str(counter, hide_secondary=False):
 
 
 
+def validate_tiebreakers(value):
+    try:
+        parse_tiebreakers(value)
+    except ValueError as e:
+        raise ValidationError(str(e))
+
+
 class Tournament(models.Model):
     name = models.CharField(max_length=255)
     short_name = models.CharField(max_length=255, null=True, blank=True, default=None, help_text='Name to show on mobile devices.')
 
     creation_time = models.DateTimeField(auto_now_add=True)
+    is_current = models.BooleanField(default=False, help_text='The current tournament is shown in the public pages. If no tournament is current, the latest one is shown.')
     bye_score = models.DecimalField(max_digits=4, decimal_places=1, default=3, help_text='Score to assign for a bye.')
+    tiebreakers = models.CharField(max_length=255, blank=True, default='', validators=[validate_tiebreakers], help_text='Comma-separated tiebreakers, used (in this order) for teams with the same scores: %s.' % ', '.join(TIEBREAKERS))
 
     description = models.TextField(null=True, blank=True, default=None, help_text='This appears at the beginning of the public page. You can use HTML tags.')
     default_round_visibility = models.CharField(max_length=2, choices=VISIBILITY_CHOICES, default=SHOW, help_text='Default visibility of newly generated rounds.')
@@ -124,13 +215,66 @@ class Tournament(models.Model):
     max_teams = models.PositiveIntegerField(null=True, blank=True, default=None, help_text='Maximum number of allowed teams during registration. If no value is given, the number is unlimited.')
     max_players_per_team = models.PositiveIntegerField(null=True, blank=True, default=0, help_text='Maximum number of allowed players per team during registration. If no value is given, the number is unlimited (probably unsupported!). If 0 is given, player registration is disabled.')    # TODO
 
+    # incremented by every write to the data shown in the public page (see bump_versions and cache.py)
+    version = models.PositiveIntegerField(default=0, editable=False)
+    version_time = models.DateTimeField(null=True, default=None, editable=False, help_text='Time of the latest version.')
+
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember loaded values, to detect changes when saving (see signals.py)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and 'update_fields' not in kwargs:
+            # the version is only changed by bump_versions (the loaded value may be outdated)
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields if not field.primary_key and field.name not in ('version', 'version_time')]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.is_current:
+                # only one tournament is current
+                for tournament in Tournament.objects.filter(is_current=True).exclude(pk=self.pk):
+                    tournament.is_current = False
+                    tournament.save(update_fields=['is_current'])
+
+    @classmethod
+    def current(cls):
+        """
+        Return the current tournament (the one selected as current, or the latest one), or None if there are no tournaments.
+        See also CurrentTournamentMiddleware, which caches it.
+        """
+        return cls.objects.order_by('-is_current', '-creation_time').first()
+
     def num_rounds(self):
         return Round.objects.filter(tournament=self).count()
 
+    def lock(self):
+        """
+        Lock this tournament until the end of the current transaction.
+        This is done with an update which does not change anything, since select_for_update is not supported by SQLite.
+        """
+        Tournament.objects.filter(pk=self.pk).update(name=models.F('name'))
+
+    def last_modified(self):
+        """
+        Time of the latest change of the data of this tournament (see bump_versions).
+        """
+        return self.version_time or self.creation_time
+
+    def current_round(self):
+        """
+        Return the latest round, with its matches (see RoundQuerySet.with_matches), or None.
+        """
+        return self.round_set.with_matches().order_by('-number').first()
+
+    def latest_round_job(self):
+        return RoundJob.objects.filter(tournament=self).order_by('-pk').first()
+
     def can_register(self):
         return self.is_registration_open and (self.max_teams is None or Team.objects.count() < self.max_teams)
 
@@ -139,6 +283,88 @@ class Tournament(models.Model):
 
 
     def team_scoreboard(self, public=False, fill_results=False):
+        """
+        Return a Counter with the score of every team.
+        Scores are read from the standings (see TeamStanding), except when pending results are filled.
+        The tiebreakers of the tournament (if any) are added to the scores.
+        """
+        if fill_results:
+            res = self.aggregated_team_scoreboard(public=public, fill_results=True)
+
+        else:
+            teams = Team.objects.annotate(
+                standing=FilteredRelation('teamstanding', condition=Q(teamstanding__tournament=self, teamstanding__public=public))
+            ).filter(Q(active=True) | Q(standing__isnull=False)).annotate(
+                standing_primary=F('standing__primary'), standing_secondary=F('standing__secondary'), standing_num_matches=F('standing__num_matches')
+            )
+
+            res = Counter()
+            for team in teams:
+                res[team] = Score(primary=team.standing_primary, secondary=team.standing_secondary, num_matches=team.standing_num_matches) if team.standing_num_matches is not None else Score()
+
+        if self.tiebreakers:
+            self.add_tiebreakers(res, public=public, fill_results=fill_results)
+        return res
+
+    def opponent_index(self, public=False, fill_results=False):
+        """
+        Return a dictionary team id -> list of (opponent id, result) for all the normal matches of this tournament,
+        where the result is the primary score (in tenths) obtained against the opponent.
+        Pending results are skipped, or considered as victories for both teams if fill_results is True (see Match.team_scoreboard).
+        """
+        results = TeamResult.objects.filter(match__round__tournament=self, match__type=NORMAL).order_by()
+        if public:
+            results = results.filter(match__round__visibility=SHOW)
+
+        matches = {}
+        for (match_id, team_id, score) in results.values_list('match', 'team', 'score'):
+            matches.setdefault(match_id, []).append((team_id, score))
+
+        index = {}
+        for match_results in matches.values():
+            if len(match_results) != 2:
+                # invalid match
+                continue
+            (a, score_a), (b, score_b) = match_results
+            if score_a is None or score_b is None:
+                if not fill_results:
+                    continue
+                result_a = result_b = 10
+            else:
+                result_a = 10 if score_a > score_b else 5 if score_a == score_b else 0
+                result_b = 10 - result_a
+            index.setdefault(a, []).append((b, result_a))
+            index.setdefault(b, []).append((a, result_b))
+        return index
+
+    def add_tiebreakers(self, scoreboard, public=False, fill_results=False):
+        """
+        Compute the tiebreakers of this tournament for the scores of the given team scoreboard (see tiebreakers.py).
+        """
+        scores = {team.pk: (score.tenths_primary, score.tenths_secondary) for (team, score) in scoreboard.items()}
+        values = compute_tiebreakers(parse_tiebreakers(self.tiebreakers), scores, self.opponent_index(public=public, fill_results=fill_results))
+        for (team, score) in scoreboard.items():
+            score.tiebreakers = values[team.pk]
+
+    def aggregated_team_scoreboard(self, public=False, fill_results=False):
+        """
+        Same as team_scoreboard, but summed by the database from all team results (see TeamResult.aggregate_scores).
+        """
+        results = TeamResult.objects.filter(match__round__tournament=self)
+        if public:
+            results = results.filter(match__round__visibility=SHOW)
+        rows = TeamResult.aggregate_scores(results, fill_results=fill_results)
+
+        teams = Team.objects.filter(Q(active=True) | Q(pk__in=[row['team'] for row in rows])).in_bulk()
+        res = Counter({team: Score() for team in teams.values() if team.active})
+        for row in rows:
+            res[teams[row['team']]] = Score(primary=row['primary'], secondary=row['secondary'], num_matches=row['num_matches'])
+        return res
+
+    def computed_team_scoreboard(self, public=False, fill_results=False):
+        """
+        Same as team_scoreboard, but computed from all matches.
+        """
         res = sum((match.team_scoreboard(public=public, fill_results=fill_results) for match in Match.objects.filter(round__tournament=self).prefetch_related('round', 'teamresult_set__team__player_set', 'teams')), Counter())
         for team in Team.objects.filter(active=True):
             if team not in res:
@@ -146,6 +372,48 @@ class Tournament(models.Model):
         return res
 
     def player_scoreboard(self, public=False):
+        """
+        Return a Counter with the score of every player, read from the standings (see PlayerStanding).
+        """
+        players = Player.objects.annotate(
+            standing=FilteredRelation('playerstanding', condition=Q(playerstanding__tournament=self, playerstanding__public=public))
+        ).filter(Q(team__active=True) | Q(standing__isnull=False)).select_related('team').annotate(
+            standing_primary=F('standing__primary'), standing_num_matches=F('standing__num_matches')
+        )
+
+        res = Counter()
+        for player in players:
+            score = Score(primary=player.standing_primary, num_matches=player.standing_num_matches) if player.standing_num_matches is not None else Score()
+            # add phantom score if present
+            if player.phantom_score is not None and player.active:
+                score += Score(phantom=player.phantom_score)
+            res[player] = score
+        return res
+
+    def aggregated_player_scoreboard(self, public=False):
+        """
+        Same as player_scoreboard, but summed by the database from all player results (see PlayerResult.aggregate_scores).
+        """
+        results = PlayerResult.objects.filter(match__round__tournament=self)
+        if public:
+            results = results.filter(match__round__visibility=SHOW)
+        rows = PlayerResult.aggregate_scores(results)
+
+        players = Player.objects.filter(Q(team__active=True) | Q(pk__in=[row['player'] for row in rows])).select_related('team').in_bulk()
+        res = Counter({player: Score() for player in players.values() if player.team.active})
+        for row in rows:
+            res[players[row['player']]] = Score(primary=row['primary'], num_matches=row['num_matches'])
+
+        for player in res:
+            # add phantom score if present
+            if player.phantom_score is not None and player.active:
+                res[player] += Score(phantom=player.phantom_score)
+        return res
+
+    def computed_player_scoreboard(self, public=False):
+        """
+        Same as player_scoreboard, but computed from all matches.
+        """
         res = sum((match.player_scoreboard(public=public) for match in Match.objects.filter(round__tournament=self).prefetch_related('round', 'playerresult_set__player__team')), Counter())
         for player in Player.objects.filter(team__active=True):
             # add player if not present
@@ -158,142 +426,205 @@ class Tournament(models.Model):
         return res
 
 
-    def create_round(self):
+    def snapshot_standings(self, number, public=False):
+        """
+        Return a dictionary team id -> (score, rank) with the standings after the given round,
+        read from its snapshot (see RoundSnapshot), or None if the round is not complete.
+        """
+        snapshot = RoundSnapshot.objects.filter(round__tournament=self, round__number=number, public=public).first()
+        return snapshot.decode() if snapshot is not None else None
+
+    def team_progression(self, public=False):
+        """
+        Return the numbers of the rounds with a snapshot, and a dictionary team id -> list with the
+        (score, rank) of the team after each of these rounds (None if the team did not play yet).
+        """
+        snapshots = list(RoundSnapshot.objects.filter(round__tournament=self, public=public).order_by('round__number').values_list('round__number', 'standings'))
+        progression = {}
+        for (k, (number, standings)) in enumerate(snapshots):
+            for (team_id, item) in decode_snapshot(standings).items():
+                if team_id not in progression:
+                    progression[team_id] = [None] * len(snapshots)
+                progression[team_id][k] = item
+        return [number for (number, standings) in snapshots], progression
+
+
+    def plan_round(self, engine=None):
         """
-        Create a new round for this tournament.
+        Compute the pairs and the table assignment of a new round for this tournament, without writing to the database.
+        The matchings are computed by the given pairing engine (see pairing.get_pairing_engine).
+        Return a dictionary with the pairs of team ids (byes are 1-tuples), a dictionary pair -> table id,
+        and the running time (in seconds) of each phase.
         """
+        if engine is None:
+            engine = pairing.get_pairing_engine()
+
+        timings = {'scoreboard': 0.0, 'graph': 0.0, 'pairing': 0.0, 'tables': 0.0}
+        start = time.perf_counter()
+
         teams = Team.objects.filter(active=True).order_by('pk')
         tables = Table.objects.all()
-        matches = Match.objects.filter(round__tournament=self)
+        team_ids = [team.pk for team in teams]
+        num_rounds = self.num_rounds()
 
-        previous_pairs = set(match.team_pair() for match in matches)
-        previous_byes = set(match.team_bye() for match in matches)
-
-        previous_tables = {table: set() for table in tables}
-        for match in matches:
-            if match.table is not None:
-                for team in match.teams.all():
-                    previous_tables[match.table].add(team)
+        previous_pairs, previous_byes, previous_tables = TeamHistory.load(self)
 
         ### pair teams ###
-        if self.num_rounds() == 0:
+        if num_rounds == 0:
             # random pairings
-            team_queue = list(teams)
-            random.shuffle(team_queue)
-            pairs = []
-            while len(team_queue) > 1:
-                pairs.append((team_queue.pop(), team_queue.pop()))
-            if len(team_queue) == 1:
-                pairs.append((team_queue.pop(),))
+            timings['scoreboard'] = time.perf_counter() - start
+            pairs = pairing.random_pairs(team_ids)
 
         else:
-            G = nx.Graph()
-            G.add_nodes_from(teams)
-
             # analyze scoreboard
             scoreboard = self.team_scoreboard(public=False, fill_results=True) # pending results are considered as full victories for all teams
-            # print("Scoreboard")
-            # print(scoreboard)
+            scores = {team.pk: scoreboard[team].to_int() for team in teams} # integer scores
+            timings['scoreboard'] = time.perf_counter() - start
 
-            clusters = {} # clusters of teams with the same score
-            for team in teams:
-                score = scoreboard[team].to_int() # this is an integer score
-                if score not in clusters:
-                    clusters[score] = []
-                clusters[score].append(team)
+            pairs = pairing.pair_teams(team_ids, scores, previous_pairs, previous_byes, engine=engine, window=getattr(settings, 'PAIRING_WINDOW', None), timings=timings)
 
-            # print(clusters)
+        ### assign tables ###
+        start = time.perf_counter()
+        pairs_to_tables = pairing.assign_tables(pairs, [(table.pk, table.priority) for table in tables], previous_tables)
+        timings['tables'] = time.perf_counter() - start
 
-            M = len(teams) * (max(clusters) - min(clusters)) + 1 # some big constant
-            # print("M = %d" % M)
+        return {
+            'num_rounds': num_rounds,
+            'teams': team_ids,
+            'pairs': pairs,
+            'tables': pairs_to_tables,
+            'timings': timings,
+        }
 
-            score_to_pos = {}
-            pos = 0
-            for score in sorted(clusters):
-                score_to_pos[score] = pos
-                pos += 1
 
-            # print(score_to_pos)
+    def create_round(self, engine=None):
+        """
+        Create a new round for this tournament (see plan_round).
+        If another round was created while computing the pairs, no round is created and None is returned as round.
+        """
+        plan = self.plan_round(engine)
+        round = self.write_round(plan['pairs'], plan['tables'], num_rounds=plan['num_rounds'])
+        if round is None:
+            return None, False
 
-            for pair in itertools.combinations(teams, 2):
-                if pair not in previous_pairs:
-                    # create edge between teams
-                    scores = tuple(scoreboard[team].to_int() for team in pair)
-                    weight = - (max(scores) - min(scores)) * M ** score_to_pos[max(scores)]
-                    G.add_edge(*pair, weight=weight)
+        # return round and success/warning
+        return round, sum(len(pair) for pair in plan['pairs']) == len(plan['teams'])
 
-            if len(teams) % 2 == 1:
-                # add bye
-                G.add_node(BYE)
 
-                for team in teams:
-                    if team not in previous_byes:
-                        # create bye edge
-                        score = scoreboard[team].to_int()
-                        weight = - score * M ** pos
-                        G.add_edge(team, BYE, weight=weight)
+    def preview_key(self):
+        return 'round-preview-%d' % self.pk
 
-            # compute matching
-            matching = nx.max_weight_matching(G, maxcardinality=True)
-            pairs = list((a, b) if a != BYE and b != BYE else (a,) if b == BYE else (b,) for (a, b) in matching)
+    def preview_round(self, engine=None):
+        """
+        Compute a new round (see plan_round) and keep it in the cache, so that it can be committed later.
+        The returned dictionary also contains a token which identifies the preview,
+        and the version of the tournament (see bump_versions) on which the preview was computed.
+        """
+        version = Tournament.objects.filter(pk=self.pk).values_list('version', flat=True).get()
+        plan = self.plan_round(engine)
+        plan['version'] = version
+        plan['token'] = '%d-%s' % (version, uuid.uuid4().hex)
+        cache.set(self.preview_key(), plan, getattr(settings, 'ROUND_PREVIEW_TIMEOUT', 3600))
+        return plan
+
+    def commit_round_preview(self, token):
+        """
+        Create the round computed by preview_round, if the preview with the given token is still valid
+        (i.e., the data of the tournament, including results, teams and rounds, did not change in the meantime).
+        Return the round and success/warning as create_round, or None if the preview is not valid.
+        """
+        plan = cache.get(self.preview_key())
+        if plan is None or plan['token'] != token:
+            return None
 
-        # print(pairs)
+        round = self.write_round(plan['pairs'], plan['tables'], num_rounds=plan['num_rounds'], version=plan['version'])
+        if round is None:
+            return None
+        cache.delete(self.preview_key())
+        return round, sum(len(pair) for pair in plan['pairs']) == len(plan['teams'])
 
-        ### assign tables ###
-        G = nx.Graph()
-        G.add_nodes_from([pair for pair in pairs if len(pair) == 2])
-        G.add_nodes_from(tables)
 
-        for table in tables:
-            for pair in pairs:
-                if len(pair) == 2:
-                    weight = table.priority # an integer between 0 and 100
+    def write_round(self, pairs, pairs_to_tables, num_rounds=None, version=None):
+        """
+        Create a new round with the given pairs of team ids (byes are 1-tuples), and their matches, team results
+        and player results, with a constant number of queries inside one transaction.
+        pairs_to_tables is a dictionary pair -> table id.
+        If num_rounds is given and the tournament does not have exactly num_rounds rounds
+        (e.g., because another round was created concurrently), nothing is written and None is returned.
+        The same happens if version is given and the tournament has a different version (see bump_versions).
+        """
+        with transaction.atomic():
+            # concurrent writers cannot create rounds with the same number
+            self.lock()
+
+            current_rounds = self.num_rounds()
+            if num_rounds is not None and current_rounds != num_rounds:
+                return None
+            if version is not None and Tournament.objects.filter(pk=self.pk).values_list('version', flat=True).get() != version:
+                return None
+
+            if current_rounds > 0:
+                round_number = Round.objects.filter(tournament=self).latest().number + 1
+            else:
+                round_number = 1
 
-                    if any(team in previous_tables[table] for team in pair):
-                        # penalize this table
-                        weight -= 1000
+            round = Round.objects.create(number=round_number, tournament=self, visibility=self.default_round_visibility)
 
-                    # create edge
-                    G.add_edge(pair, table, weight=weight)
+            matches = Match.objects.bulk_create([
+                Match(round=round, type=(NORMAL if len(pair)==2 else BYE), table_id=pairs_to_tables.get(pair))
+                for pair in pairs
+            ])
+            if any(match.pk is None for match in matches):
+                # the database backend does not return the ids of the new objects
+                matches = list(round.match_set.order_by('pk'))
 
-        # compute matching
-        matching = nx.max_weight_matching(G, maxcardinality=True)
+            # bulk_create does not call TeamResult.save, so PlayerResult objects are created here
+            team_ids = [team for pair in pairs for team in pair]
+            players = {}
+            for player in Player.objects.filter(team__in=team_ids):
+                players.setdefault(player.team_id, []).append(player)
 
-        pairs_to_tables = {}
-        for edge in matching:
-            # print(edge)
-            if isinstance(edge[0], Table):
-                edge = reversed(edge)
+            TeamResult.objects.bulk_create([TeamResult(match=match, team_id=team) for (match, pair) in zip(matches, pairs) for team in pair])
+            PlayerResult.objects.bulk_create([
+                PlayerResult(match=match, player=player) for (match, pair) in zip(matches, pairs) for team in pair for player in players.get(team, [])
+            ])
 
-            pair, table = edge
-            pairs_to_tables[pair] = table
+            # bulk_create does not send signals; the new matches have no scores, so only byes and match counts change
+            TeamHistory.add_round(self.pk, pairs, pairs_to_tables)
+            TeamStanding.add_round(round, [pair[0] for pair in pairs if len(pair) == 1])
+            PlayerStanding.add_round(round)
+            # the snapshot written when the round was saved (without matches) is replaced;
+            # it is computed from the snapshot of the previous round, without reading previous results
+            RoundSnapshot.refresh(self.pk, round.number)
 
-        ### create new round ###
-        if self.num_rounds() > 0:
-            round_number = Round.objects.latest().number + 1
-        else:
-            round_number = 1
+        return round
 
-        round = Round.objects.create(number=round_number, tournament=self, visibility=self.default_round_visibility)
 
-        for pair in pairs:
-            match = Match.objects.create(
-                round=round,
-                type=(NORMAL if len(pair)==2 else BYE),
-                table=(pairs_to_tables[pair] if pair in pairs_to_tables else None)
-            )
+    class Meta:
+        ordering = ['creation_time']
+        get_latest_by = 'creation_time'
 
-            for team in pair:
-                # this also creates PlayerResult objects, so we cannot use bulk_create
-                TeamResult.objects.create(match=match, team=team)
 
-        # return round and success/warning
-        return round, sum(len(pair) for pair in pairs) == len(teams)
 
+def bump_versions(**filters):
+    """
+    Increment the version of the tournaments matching the given filters (all tournaments if no filter is given).
+    This is done with an update, so that concurrent increments are not lost.
+    """
+    Tournament.objects.filter(**filters).update(version=F('version') + 1, version_time=timezone.now())
+    # the cached current tournament is outdated (see CurrentTournamentMiddleware); this is done again after the commit,
+    # in case the tournament is loaded again before it
+    bump_tournament_generation()
+    transaction.on_commit(bump_tournament_generation)
 
-    class Meta:
-        ordering = ['creation_time']
-        get_latest_by = 'creation_time'
+def bump_round_versions(**filters):
+    """
+    Increment the version of the rounds matching the given filters (all rounds if no filter is given), see bump_versions.
+    The version of a round is also raised to the version of its tournament (which is bumped first),
+    so that the rounds changed after a given version of the tournament can be found (see RoundsApiView).
+    """
+    tournament_version = Subquery(Tournament.objects.filter(pk=OuterRef('tournament')).values('version')[:1])
+    Round.objects.filter(**filters).update(version=Greatest(F('version') + 1, tournament_version))
 
 
 
@@ -360,20 +691,61 @@ class Table(models.Model):
 
 
 
+def matches_prefetch():
+    """
+    Prefetch of the matches of rounds, with their tables and team results (and teams), see RoundQuerySet.with_matches.
+    It can also be used with prefetch_related_objects.
+    """
+    return Prefetch(
+        'match_set',
+        queryset=Match.objects.select_related('table').prefetch_related(Prefetch('teamresult_set', queryset=TeamResult.objects.select_related('team')))
+    )
+
+
+class RoundQuerySet(models.QuerySet):
+    def with_matches(self):
+        """
+        Prefetch the matches of the rounds, with their tables and team results (and teams),
+        so that the rounds and their matches can be shown without further queries (4 queries in total).
+        """
+        return self.prefetch_related(matches_prefetch())
+
+
 class Round(models.Model):
     number = models.IntegerField(validators=[MinValueValidator(1)])
     tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE)
     visibility = models.CharField(max_length=2, choices=VISIBILITY_CHOICES, default=SHOW)
     scheduled_time = models.DateTimeField(blank=True, null=True, default=None, help_text="Used only for displaying purposes.")
 
+    # incremented by every write to the data shown for this round (see bump_round_versions)
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = RoundQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember loaded values, to detect changes when saving (see signals.py)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return 'Round %d' % self.number
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and 'update_fields' not in kwargs:
+            # the version is only changed by bump_versions (see Tournament.save)
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != 'version']
+        super().save(*args, **kwargs)
+
     def num_matches(self):
         return self.match_set.all().count()
 
     def completed_matches(self):
-        return sum(1 for match in self.match_set.all() if match.type == BYE or all(team_result.score is not None for team_result in match.teamresult_set.all()))
+        return sum(1 for match in self.match_set.all() if match.completed())
+
+    def is_complete(self):
+        return self.completed_matches() == self.num_matches()
 
     def team_scoreboard(self, public=False, fill_results=False):
         res = sum((match.team_scoreboard(public=public, fill_results=fill_results) for match in Match.objects.filter(round=self)), Counter())
@@ -406,24 +778,43 @@ class Match(models.Model):
     teams = models.ManyToManyField(Team, through='TeamResult')
     players = models.ManyToManyField(Player, through='PlayerResult')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember loaded values, to detect changes when saving (see signals.py)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
-        num_teams = self.teams.count()
-        if num_teams == 0:
+        team_results = self.team_results()
+        if len(team_results) == 0:
             return 'Empty match'
-        elif num_teams == 1 and self.type == BYE:
-            return '%s (Bye)' % self.teams.get().name
+        elif len(team_results) == 1 and self.type == BYE:
+            return '%s (Bye)' % team_results[0].team.name
         else:
-            return ' - '.join(team.name for team in self.teams.all())
+            return ' - '.join(team_result.team.name for team_result in team_results)
 
 
+    def team_results(self):
+        """
+        Team results of this match, ordered by team name.
+        They are read from the prefetched team results, if present (see RoundQuerySet.with_matches).
+        """
+        if 'teamresult_set' in getattr(self, '_prefetched_objects_cache', {}):
+            return list(self.teamresult_set.all())
+        return list(self.teamresult_set.select_related('team'))
+
     def valid(self):
         """
         Check that there are exactly two teams, or one team in the case of a bye.
         """
-        num_teams = self.teams.count()
+        num_teams = len(self.team_results())
         return num_teams == 1 and self.type == BYE or num_teams == 2 and self.type == NORMAL
     valid.boolean = True
 
+    def completed(self):
+        return self.type == BYE or all(team_result.score is not None for team_result in self.team_results())
+
     def team_pair(self):
         """
         Return the pair of playing teams, ordered by primary key.
@@ -443,10 +834,11 @@ class Match(models.Model):
 
 
     def result(self):
-        if self.teams.count() < 2 or any(team_result.score is None for team_result in self.teamresult_set.all()):
+        team_results = self.team_results()
+        if len(team_results) < 2 or any(team_result.score is None for team_result in team_results):
             return None
         else:
-            return ' - '.join(str(team_result.score) for team_result in self.teamresult_set.all())
+            return ' - '.join(str(team_result.score) for team_result in team_results)
 
     def team_scoreboard(self, public=False, fill_results=False):
         """
@@ -517,12 +909,21 @@ class TeamResult(models.Model):
     team = models.ForeignKey(Team, on_delete=models.CASCADE)
     score = models.DecimalField(max_digits=4, decimal_places=1, blank=True, null=True, default=None)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember loaded values, to detect changes when saving (see signals.py)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)  # call the "real" save() method.
 
         # create PlayerResult objects if they do not exist
         if PlayerResult.objects.filter(match=self.match, player__team=self.team).count() == 0:
-            PlayerResult.objects.bulk_create([PlayerResult(match=self.match, player=player) for player in self.team.player_set.all()])
+            players = list(self.team.player_set.all())
+            PlayerResult.objects.bulk_create([PlayerResult(match=self.match, player=player) for player in players])
+            PlayerStanding.refresh(player.pk for player in players)
             # for player in self.team.player_set.all():
             #     PlayerResult.objects.create(match=self.match, player=player)
 
@@ -532,6 +933,52 @@ class TeamResult(models.Model):
         # delete PlayerResult objects
         PlayerResult.objects.filter(match=self.match, player__team=self.team).delete()
 
+    @classmethod
+    def aggregate_scores(cls, results, fill_results=False):
+        """
+        Sum the scores of the given team results in the database, as Match.team_scoreboard does.
+        Return a list of dictionaries with tournament, team, primary, secondary and num_matches,
+        one for each (tournament, team) with at least one counted match.
+        """
+        # default orderings would end up in the GROUP BY clauses
+        match_results = cls.objects.filter(match=OuterRef('match')).order_by()
+        results = results.order_by().annotate(
+            num_teams=Subquery(match_results.values('match').annotate(count=Count('pk')).values('count')),
+            opponent_score=Subquery(match_results.exclude(pk=OuterRef('pk')).values('score')[:1]),
+        )
+
+        bye = Q(match__type=BYE)
+        complete = Q(match__type=NORMAL, num_teams=2, score__isnull=False, opponent_score__isnull=False)
+        bye_score = F('match__round__tournament__bye_score')
+        decimal = DecimalField(max_digits=6, decimal_places=1)
+
+        # incomplete or invalid matches are not counted, or treated as victories if fill_results is True
+        primary = Case(
+            When(bye, then=Value(Decimal('1.0'))),
+            When(complete & Q(score__gt=F('opponent_score')), then=Value(Decimal('1.0'))),
+            When(complete & Q(score=F('opponent_score')), then=Value(Decimal('0.5'))),
+            When(complete, then=Value(Decimal('0.0'))),
+            default=Value(Decimal('1.0') if fill_results else Decimal('0.0')),
+            output_field=decimal,
+        )
+        secondary = Case(
+            When(bye, then=bye_score),
+            When(complete, then=F('score')),
+            default=bye_score if fill_results else Value(Decimal('0.0')),
+            output_field=decimal,
+        )
+        counted = Case(
+            When(bye | complete, then=Value(1)),
+            default=Value(1 if fill_results else 0),
+            output_field=models.IntegerField(),
+        )
+
+        return [
+            row for row in results.annotate(tournament=F('match__round__tournament')).values('tournament', 'team').annotate(
+                primary=Sum(primary), secondary=Sum(secondary), num_matches=Sum(counted)
+            ) if row['num_matches'] > 0
+        ]
+
     class Meta:
         ordering = ['match', 'team']
 
@@ -541,5 +988,438 @@ class PlayerResult(models.Model):
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
     score = models.DecimalField(max_digits=4, decimal_places=1, blank=True, null=True, default=None)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember loaded values, to detect changes when saving (see signals.py)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @classmethod
+    def aggregate_scores(cls, results):
+        """
+        Sum the scores of the given player results in the database, as Match.player_scoreboard does.
+        Return a list of dictionaries with tournament, player, primary and num_matches.
+        """
+        primary = Case(
+            When(match__type=BYE, then=Value(Decimal('1.0'))),
+            default=Coalesce('score', Value(Decimal('0.0'))),
+            output_field=DecimalField(max_digits=6, decimal_places=1),
+        )
+        return list(results.order_by().annotate(tournament=F('match__round__tournament')).values('tournament', 'player').annotate(
+            primary=Sum(primary), num_matches=Count('pk')
+        ))
+
     class Meta:
         ordering = ['match', 'player']
+
+
+
+def encode_ids(ids):
+    return ','.join(str(x) for x in ids)
+
+def decode_ids(s):
+    return [int(x) for x in s.split(',')] if s else []
+
+
+class TeamHistory(models.Model):
+    """
+    Compact history of a team in a tournament, used in round creation:
+    the teams it played against, the number of byes it received, and the tables it played at.
+    It is kept up to date when matches and results are written (see signals.py).
+    """
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE)
+    team = models.ForeignKey(Team, on_delete=models.CASCADE)
+    opponents = models.TextField(blank=True, default='', help_text='Comma-separated ids of the opponents.')
+    byes = models.PositiveIntegerField(default=0)
+    tables = models.TextField(blank=True, default='', help_text='Comma-separated ids of the tables.')
+
+    def __str__(self):
+        return '%s (%s)' % (self.team, self.tournament)
+
+    @classmethod
+    def refresh(cls, team_ids):
+        """
+        Recompute the history of the given teams, in all tournaments.
+        """
+        team_ids = set(team_ids)
+        if len(team_ids) == 0:
+            return
+
+        # all results of the matches played by these teams
+        results = TeamResult.objects.filter(match__teamresult__team__in=team_ids).values_list(
+            'match__round__tournament', 'match', 'match__type', 'match__table', 'team'
+        ).distinct().order_by('match', 'team')
+
+        matches = {}
+        for (tournament_id, match_id, match_type, table_id, team_id) in results:
+            if match_id not in matches:
+                matches[match_id] = (tournament_id, match_type, table_id, [])
+            matches[match_id][3].append(team_id)
+
+        histories = {}
+        for (tournament_id, match_type, table_id, teams) in matches.values():
+            for team_id in teams:
+                if team_id not in team_ids:
+                    continue
+                if (tournament_id, team_id) not in histories:
+                    histories[tournament_id, team_id] = ([], [0], [])
+                opponents, byes, tables = histories[tournament_id, team_id]
+
+                if match_type == NORMAL:
+                    opponents.extend(x for x in teams if x != team_id)
+                elif match_type == BYE:
+                    byes[0] += 1
+                if table_id is not None:
+                    tables.append(table_id)
+
+        with transaction.atomic():
+            cls.objects.filter(team__in=team_ids).delete()
+            cls.objects.bulk_create([
+                cls(tournament_id=tournament_id, team_id=team_id, opponents=encode_ids(opponents), byes=byes[0], tables=encode_ids(tables))
+                for ((tournament_id, team_id), (opponents, byes, tables)) in histories.items()
+            ])
+
+    @classmethod
+    def add_round(cls, tournament_id, pairs, pairs_to_tables):
+        """
+        Add a new round to the histories of its teams in the given tournament, without reading previous matches.
+        pairs and pairs_to_tables are as in Tournament.write_round.
+        Changes to existing matches are handled by refresh (see signals.py).
+        """
+        team_ids = [team_id for pair in pairs for team_id in pair]
+        histories = {history.team_id: history for history in cls.objects.filter(tournament_id=tournament_id)}
+        for pair in pairs:
+            table_id = pairs_to_tables.get(pair)
+            for team_id in pair:
+                history = histories.get(team_id)
+                if history is None:
+                    history = histories[team_id] = cls(tournament_id=tournament_id, team_id=team_id)
+
+                if len(pair) == 2:
+                    history.opponents = encode_ids(decode_ids(history.opponents) + [x for x in pair if x != team_id])
+                else:
+                    history.byes += 1
+                if table_id is not None:
+                    history.tables = encode_ids(decode_ids(history.tables) + [table_id])
+
+        # the histories of the teams are written again in bulk, as in refresh
+        with transaction.atomic():
+            cls.objects.filter(tournament_id=tournament_id, team__in=team_ids).delete()
+            cls.objects.bulk_create([cls(tournament_id=tournament_id, team_id=team_id, opponents=histories[team_id].opponents, byes=histories[team_id].byes, tables=histories[team_id].tables) for team_id in team_ids])
+
+    @classmethod
+    def rebuild(cls, tournament):
+        """
+        Recompute the history of all teams in the given tournament.
+        """
+        cls.objects.filter(tournament=tournament).delete()
+        cls.refresh(TeamResult.objects.filter(match__round__tournament=tournament).values_list('team', flat=True))
+
+    @classmethod
+    def load(cls, tournament):
+        """
+        Return the previous pairs, byes and tables of the given tournament, in the form used by the pairing module:
+        a set of pairs (a, b) of team ids with a < b, a set of team ids, and a dictionary table id -> set of team ids.
+        """
+        previous_pairs = set()
+        previous_byes = set()
+        previous_tables = {}
+        for (team_id, opponents, byes, tables) in cls.objects.filter(tournament=tournament).values_list('team', 'opponents', 'byes', 'tables'):
+            for opponent in decode_ids(opponents):
+                previous_pairs.add((min(team_id, opponent), max(team_id, opponent)))
+            if byes > 0:
+                previous_byes.add(team_id)
+            for table_id in decode_ids(tables):
+                previous_tables.setdefault(table_id, set()).add(team_id)
+        return previous_pairs, previous_byes, previous_tables
+
+    class Meta:
+        unique_together = ('tournament', 'team')
+        verbose_name_plural = 'team histories'
+
+
+
+class TeamStanding(models.Model):
+    """
+    Total score of a team in a tournament, considering all rounds (public=False) or only the rounds
+    whose results are shown (public=True).
+    It is kept up to date when matches, results and rounds are written (see signals.py).
+    """
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE)
+    team = models.ForeignKey(Team, on_delete=models.CASCADE)
+    public = models.BooleanField()
+    primary = models.DecimalField(max_digits=6, decimal_places=1, default=0)
+    secondary = models.DecimalField(max_digits=6, decimal_places=1, default=0)
+    num_matches = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return '%s (%s)' % (self.team, self.tournament)
+
+    @classmethod
+    def refresh(cls, team_ids):
+        """
+        Recompute the standings of the given teams, in all tournaments.
+        """
+        team_ids = set(team_ids)
+        if len(team_ids) == 0:
+            return
+
+        results = TeamResult.objects.filter(team__in=team_ids)
+        standings = [
+            cls(tournament_id=row['tournament'], team_id=row['team'], public=public, primary=row['primary'], secondary=row['secondary'], num_matches=row['num_matches'])
+            for public in (False, True)
+            for row in TeamResult.aggregate_scores(results.filter(match__round__visibility=SHOW) if public else results)
+        ]
+
+        with transaction.atomic():
+            cls.objects.filter(team__in=team_ids).delete()
+            cls.objects.bulk_create(standings)
+
+    @classmethod
+    def add_round(cls, round, bye_team_ids):
+        """
+        Add the byes of a new round, whose matches do not have scores yet, to the standings of the teams
+        (the other matches are not counted), without reading previous results.
+        """
+        if len(bye_team_ids) == 0:
+            return
+        publics = [False, True] if round.visibility == SHOW else [False]
+        bye_score = Tournament.objects.filter(pk=round.tournament_id).values_list('bye_score', flat=True).get()
+        standings = cls.objects.filter(tournament_id=round.tournament_id, team__in=bye_team_ids, public__in=publics)
+        previous = {(standing.team_id, standing.public): standing for standing in standings}
+
+        new_standings = []
+        for team_id in bye_team_ids:
+            for public in publics:
+                standing = previous.get((team_id, public)) or cls(team_id=team_id, public=public)
+                new_standings.append(cls(
+                    tournament_id=round.tournament_id, team_id=team_id, public=public,
+                    primary=standing.primary + Decimal('1.0'), secondary=standing.secondary + bye_score, num_matches=standing.num_matches + 1
+                ))
+
+        # the standings are written again in bulk, as in refresh
+        standings.delete()
+        cls.objects.bulk_create(new_standings)
+
+    @classmethod
+    def rebuild(cls, tournament):
+        """
+        Recompute the standings of all teams in the given tournament.
+        """
+        cls.objects.filter(tournament=tournament).delete()
+        cls.refresh(TeamResult.objects.filter(match__round__tournament=tournament).values_list('team', flat=True))
+
+    class Meta:
+        unique_together = ('tournament', 'team', 'public')
+
+
+class PlayerStanding(models.Model):
+    """
+    Total score of a player in a tournament (see TeamStanding).
+    Phantom scores are not included.
+    """
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE)
+    player = models.ForeignKey(Player, on_delete=models.CASCADE)
+    public = models.BooleanField()
+    primary = models.DecimalField(max_digits=6, decimal_places=1, default=0)
+    num_matches = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return '%s (%s)' % (self.player, self.tournament)
+
+    @classmethod
+    def refresh(cls, player_ids):
+        """
+        Recompute the standings of the given players, in all tournaments.
+        """
+        player_ids = set(player_ids)
+        if len(player_ids) == 0:
+            return
+
+        results = PlayerResult.objects.filter(player__in=player_ids)
+        standings = [
+            cls(tournament_id=row['tournament'], player_id=row['player'], public=public, primary=row['primary'], num_matches=row['num_matches'])
+            for public in (False, True)
+            for row in PlayerResult.aggregate_scores(results.filter(match__round__visibility=SHOW) if public else results)
+        ]
+
+        with transaction.atomic():
+            cls.objects.filter(player__in=player_ids).delete()
+            cls.objects.bulk_create(standings)
+
+    @classmethod
+    def add_round(cls, round):
+        """
+        Add the results of a new round, which do not have scores yet, to the standings of the players
+        (every result counts as a match, and byes also give a point), without reading previous results.
+        """
+        publics = [False, True] if round.visibility == SHOW else [False]
+        results = list(PlayerResult.objects.filter(match__round=round).values_list('player', 'match__type'))
+        standings = cls.objects.filter(tournament_id=round.tournament_id, player__in=[player_id for (player_id, match_type) in results], public__in=publics)
+        previous = {(standing.player_id, standing.public): standing for standing in standings}
+
+        new_standings = []
+        for (player_id, match_type) in results:
+            for public in publics:
+                standing = previous.get((player_id, public)) or cls(player_id=player_id, public=public)
+                new_standings.append(cls(
+                    tournament_id=round.tournament_id, player_id=player_id, public=public,
+                    primary=standing.primary + (Decimal('1.0') if match_type == BYE else 0), num_matches=standing.num_matches + 1
+                ))
+
+        # the standings are written again in bulk, as in refresh
+        standings.delete()
+        cls.objects.bulk_create(new_standings)
+
+    @classmethod
+    def rebuild(cls, tournament):
+        """
+        Recompute the standings of all players in the given tournament.
+        """
+        cls.objects.filter(tournament=tournament).delete()
+        cls.refresh(PlayerResult.objects.filter(match__round__tournament=tournament).values_list('player', flat=True))
+
+    class Meta:
+        unique_together = ('tournament', 'player', 'public')
+
+
+
+def encode_snapshot(standings):
+    """
+    Encode a dictionary team id -> (score, rank) as a string,
+    with one 'team:rank:primary:secondary:num_matches' item for each team (scores in tenths).
+    """
+    return ','.join('%d:%d:%d:%d:%d' % (team_id, rank, score.tenths_primary, score.tenths_secondary, score.num_matches) for (team_id, (score, rank)) in standings.items())
+
+def decode_snapshot(s):
+    standings = {}
+    for item in s.split(',') if s else []:
+        team_id, rank, primary, secondary, num_matches = (int(x) for x in item.split(':'))
+        standings[team_id] = (Score.from_tenths(primary=primary, secondary=secondary, num_matches=num_matches), rank)
+    return standings
+
+def rank_scores(scores):
+    """
+    Take a dictionary team id -> score, and return a dictionary team id -> (score, rank).
+    Teams with the same primary and secondary score have the same rank (and are sorted by id).
+    """
+    standings = {}
+    rank = 1
+    previous = None
+    for (k, (team_id, score)) in enumerate(sorted(scores.items(), key=lambda x: (-x[1].tenths_primary, -x[1].tenths_secondary, x[0]))):
+        if (score.tenths_primary, score.tenths_secondary) != previous:
+            rank = k + 1
+            previous = (score.tenths_primary, score.tenths_secondary)
+        standings[team_id] = (score, rank)
+    return standings
+
+
+class RoundSnapshot(models.Model):
+    """
+    Standings of the teams after a round, considering the round and all the previous ones
+    (all rounds if public=False, only the rounds whose results are shown if public=True).
+    A snapshot exists only if the round and all the previous rounds are complete,
+    and it is kept up to date if results are changed later (see signals.py).
+    """
+    round = models.ForeignKey(Round, on_delete=models.CASCADE)
+    public = models.BooleanField()
+    standings = models.TextField(blank=True, default='', help_text='Comma-separated items team:rank:primary:secondary:num_matches (scores in tenths).')
+
+    def __str__(self):
+        return str(self.round)
+
+    def decode(self):
+        """
+        Return a dictionary team id -> (score, rank).
+        """
+        return decode_snapshot(self.standings)
+
+    @classmethod
+    def refresh(cls, tournament_id, number=1, exclude_rounds=()):
+        """
+        Recompute the snapshots of the rounds of the given tournament, starting from the given round number.
+        The rounds in exclude_rounds (e.g. because they are being deleted) are ignored.
+        """
+        rounds = list(Round.objects.filter(tournament_id=tournament_id).exclude(pk__in=exclude_rounds).order_by('number'))
+        previous_rounds = [round for round in rounds if round.number < number]
+        rounds = [round for round in rounds if round.number >= number]
+
+        # the snapshots of the following rounds are computed from the one of the previous round
+        scores = {False: {}, True: {}}
+        if len(previous_rounds) > 0:
+            snapshots = cls.objects.filter(round=previous_rounds[-1])
+            if len(snapshots) == 0:
+                # the previous rounds are not complete
+                rounds = []
+            for snapshot in snapshots:
+                scores[snapshot.public] = {team_id: score for (team_id, (score, rank)) in snapshot.decode().items()}
+
+        incomplete = set(Round.objects.filter(
+            pk__in=[round.pk for round in rounds], match__type=NORMAL, match__teamresult__score__isnull=True
+        ).values_list('pk', flat=True))
+
+        snapshots = []
+        for round in rounds:
+            if round.pk in incomplete:
+                break
+            round_scores = {
+                row['team']: Score(primary=row['primary'], secondary=row['secondary'], num_matches=row['num_matches'])
+                for row in TeamResult.aggregate_scores(TeamResult.objects.filter(match__round=round))
+            }
+            for public in (False, True):
+                if public and round.visibility != SHOW:
+                    continue
+                scores[public] = dict(scores[public])
+                for (team_id, score) in round_scores.items():
+                    scores[public][team_id] = scores[public].get(team_id, 0) + score
+            snapshots += [cls(round=round, public=public, standings=encode_snapshot(rank_scores(scores[public]))) for public in (False, True)]
+
+        with transaction.atomic():
+            cls.objects.filter(round__tournament_id=tournament_id, round__number__gte=number).delete()
+            cls.objects.bulk_create(snapshots)
+
+    @classmethod
+    def rebuild(cls, tournament):
+        """
+        Recompute the snapshots of all rounds of the given tournament.
+        """
+        cls.refresh(tournament.pk)
+
+    class Meta:
+        unique_together = ('round', 'public')
+        ordering = ['round', 'public']
+
+
+
+# round job status
+QUEUED = 'Q'
+RUNNING = 'R'
+DONE = 'D'
+FAILED = 'F'
+
+
+class RoundJob(models.Model):
+    """
+    Creation of a new round, run in the background (see jobs.py).
+    """
+    STATUS_CHOICES = ((QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed'))
+
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=QUEUED)
+    creation_time = models.DateTimeField(auto_now_add=True)
+    start_time = models.DateTimeField(blank=True, null=True, default=None)
+    end_time = models.DateTimeField(blank=True, null=True, default=None)
+    round = models.ForeignKey(Round, on_delete=models.SET_NULL, blank=True, null=True, default=None)
+    success = models.BooleanField(default=False, help_text='Whether all teams could be paired.')
+    error = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return 'Round job %d (%s)' % (self.pk, self.get_status_display())
+
+    def pending(self):
+        return self.status in (QUEUED, RUNNING)
+
+    class Meta:
+        ordering = ['creation_time']
+        get_latest_by = 'creation_time'
@@ -0,0 +1,301 @@
+"""
+Pairing of teams and assignment of tables, used to create new rounds.
+
+Everything in this module works on plain integers (team and table primary keys),
+so that it does not depend on the database.
+The maximum-weight matchings are computed by a pairing engine (see get_pairing_engine).
+"""
+
+import time
+import itertools
+import random
+
+import networkx as nx
+from django.conf import settings
+
+from .matching import max_weight_matching
+from .assignment import max_weight_assignment
+
+
+class PairingEngine:
+    """
+    A solver for maximum-weight matching problems.
+    The graph has vertices 0, ..., num_vertices-1 and is given as a list of edges (i, j, weight),
+    where weights are integers.
+    """
+    name = None
+
+    def matching(self, num_vertices, edges, maxcardinality=True):
+        """
+        Return a list of matched pairs (i, j).
+        """
+        raise NotImplementedError
+
+
+class NetworkxEngine(PairingEngine):
+    """
+    Reference engine, based on networkx.max_weight_matching.
+    """
+    name = 'networkx'
+
+    def matching(self, num_vertices, edges, maxcardinality=True):
+        G = nx.Graph()
+        G.add_nodes_from(range(num_vertices))
+        G.add_weighted_edges_from(edges)
+        return [tuple(edge) for edge in nx.max_weight_matching(G, maxcardinality=maxcardinality)]
+
+
+class BlossomEngine(PairingEngine):
+    """
+    Fast engine, based on the integer blossom algorithm of the matching module.
+    """
+    name = 'blossom'
+
+    def matching(self, num_vertices, edges, maxcardinality=True):
+        mate = max_weight_matching(num_vertices, edges, maxcardinality=maxcardinality)
+        return [(i, j) for (i, j) in enumerate(mate) if i < j]
+
+
+PAIRING_ENGINES = {engine.name: engine for engine in (NetworkxEngine, BlossomEngine)}
+
+# weights up to this absolute value fit in machine-size integers (and are represented exactly by floats);
+# larger pairing weights are still exact, as Python integers, but make the matching slower
+MAX_WEIGHT = 2 ** 62
+
+
+def get_pairing_engine(name=None):
+    """
+    Return an instance of the pairing engine with the given name
+    (by default, the one given by settings.PAIRING_ENGINE).
+    """
+    if name is None:
+        name = getattr(settings, 'PAIRING_ENGINE', BlossomEngine.name)
+    return PAIRING_ENGINES[name]()
+
+
+def matching_weight(edges, pairs):
+    """
+    Total weight of the given pairs (i, j) in the graph given by edges.
+    """
+    weights = {}
+    for (i, j, w) in edges:
+        weights[i, j] = weights[j, i] = w
+    return sum(weights[pair] for pair in pairs)
+
+
+def random_pairs(teams):
+    """
+    Random pairing of the given teams (used for the first round).
+    Return a list of pairs (a, b), plus possibly a bye (a,).
+    """
+    team_queue = list(teams)
+    random.shuffle(team_queue)
+    pairs = []
+    while len(team_queue) > 1:
+        pairs.append((team_queue.pop(), team_queue.pop()))
+    if len(team_queue) == 1:
+        pairs.append((team_queue.pop(),))
+    return pairs
+
+
+def score_levels(teams, scores):
+    """
+    Level of each team: the position of its score among the distinct scores, from the lowest.
+    Return a list with the level of each team, and the number of levels.
+    """
+    score_to_level = {score: level for (level, score) in enumerate(sorted(set(scores[team] for team in teams)))}
+    return [score_to_level[scores[team]] for team in teams], len(score_to_level)
+
+
+def pairing_edges(teams, scores, previous_pairs, previous_byes, window=None):
+    """
+    Build the graph used to pair teams, as a list of edges (i, j, level, penalty).
+    Vertex i corresponds to teams[i], and the vertex len(teams) is the bye
+    (if the number of teams is odd).
+    Pairs of teams that already played against each other are not joined by an edge.
+    If window is given, only teams whose levels differ by at most window are joined by an edge
+    (sparse graph); otherwise all pairs of teams are considered (dense graph).
+
+    Teams are grouped by score into levels (see score_levels).
+    An edge between two teams is penalized by the difference of their scores,
+    at the level of the team with the higher score.
+    An edge to the bye is penalized by the score of the team (minus the lowest score),
+    at a level above all the others.
+    Pairings are compared lexicographically by their total penalty at each level,
+    from the highest one, so that mismatches in the top score groups are fixed first.
+
+    teams: list of team ids, sorted by id.
+    scores: dictionary team id -> integer score (see Score.to_int).
+    previous_pairs: set of pairs (a, b) of team ids with a < b.
+    previous_byes: set of team ids.
+    Return the list of edges and the number of levels (including the bye level, if any).
+    """
+    if not teams:
+        return [], 0
+
+    levels, num_levels = score_levels(teams, scores)
+    min_score = min(scores[team] for team in teams)
+
+    if window is None or window >= num_levels - 1:
+        candidates = itertools.combinations(range(len(teams)), 2)
+    else:
+        by_level = [[] for level in range(num_levels)]
+        for (i, level) in enumerate(levels):
+            by_level[level].append(i)
+        candidates = (
+            (min(i, j), max(i, j))
+            for level in range(num_levels)
+            for i in by_level[level]
+            for other in range(level, min(level + window, num_levels - 1) + 1)
+            for j in by_level[other]
+            if other > level or i < j
+        )
+
+    edges = []
+    for (i, j) in candidates:
+        a, b = teams[i], teams[j]
+        if (a, b) not in previous_pairs:
+            edges.append((i, j, max(levels[i], levels[j]), abs(scores[a] - scores[b])))
+
+    if len(teams) % 2 == 1:
+        for (i, team) in enumerate(teams):
+            if team not in previous_byes:
+                edges.append((i, len(teams), num_levels, scores[team] - min_score))
+        num_levels += 1
+
+    return edges, num_levels
+
+
+def level_bounds(edges, num_levels):
+    """
+    Upper bound on the total penalty at each level, for any pairing (see pairing_edges).
+    Every edge at some level has a distinct upper endpoint (the team with the higher score, or the bye),
+    so the total penalty of a level is at most the sum over vertices of their most penalized edge at that level.
+    """
+    worst = {}
+    for (i, j, level, penalty) in edges:
+        upper = (level, max(i, j))
+        if penalty > worst.get(upper, 0):
+            worst[upper] = penalty
+
+    bounds = [0] * num_levels
+    for (level, upper), penalty in worst.items():
+        bounds[level] += penalty
+    return bounds
+
+
+def level_penalties(edges, num_levels, pairs):
+    """
+    Total penalty at each level of the given pairs (i, j), from the highest level.
+    Pairings with a lexicographically smaller result are better.
+    """
+    penalties = {}
+    for (i, j, level, penalty) in edges:
+        penalties[i, j] = penalties[j, i] = (level, penalty)
+
+    res = [0] * num_levels
+    for pair in pairs:
+        level, penalty = penalties[pair]
+        res[level] += penalty
+    return tuple(reversed(res))
+
+
+def pair_teams(teams, scores, previous_pairs, previous_byes, engine=None, window=None, timings=None):
+    """
+    Pair teams based on their scores (see pairing_edges for the arguments).
+    Return a list of pairs (a, b), plus possibly a bye (a,).
+
+    If window is given, the pairing is first computed on the sparse graph
+    with edges between teams whose levels differ by at most window.
+    The window is doubled as long as not all teams can be paired, up to the dense graph.
+    A perfect pairing on the sparse graph is returned as is, even if it is worse than the one on the dense graph.
+
+    If timings is given, the time (in seconds) spent building the graph and computing the matchings
+    is added to timings['graph'] and timings['pairing'].
+    """
+    if engine is None:
+        engine = get_pairing_engine()
+    if timings is None:
+        timings = {}
+    timings.setdefault('graph', 0.0)
+    timings.setdefault('pairing', 0.0)
+
+    num_levels = len(set(scores[team] for team in teams))
+    while True:
+        start = time.perf_counter()
+        graph_time = timings['graph']
+        pairs = pair_teams_on_graph(teams, scores, previous_pairs, previous_byes, engine, window, timings)
+        timings['pairing'] += time.perf_counter() - start - (timings['graph'] - graph_time)
+
+        if window is None or window >= num_levels - 1 or sum(len(pair) for pair in pairs) == len(teams):
+            return pairs
+        window = max(1, 2 * window)
+
+
+def level_multipliers(bounds):
+    """
+    Multiplier of the penalties at each level: the multiplier of each level
+    exceeds the largest total penalty of the lower levels (see level_bounds),
+    so that weights preserve the lexicographic order of pairings.
+    """
+    multipliers = [1] * len(bounds)
+    for level in range(1, len(bounds)):
+        multipliers[level] = multipliers[level-1] * (bounds[level-1] + 1)
+    return multipliers
+
+
+def pair_teams_on_graph(teams, scores, previous_pairs, previous_byes, engine, window, timings):
+    """
+    Pair teams based on their scores, on the graph given by pairing_edges with the given window.
+
+    Edges get weight -penalty * multiplier[level] (see level_multipliers), and a single matching is computed,
+    so that the pairing is lexicographically optimal.
+    The weights usually stay below MAX_WEIGHT; with many score groups they can exceed it,
+    in which case they are still exact (as Python integers), only slower to compare.
+    """
+    start = time.perf_counter()
+    edges, num_levels = pairing_edges(teams, scores, previous_pairs, previous_byes, window)
+    multipliers = level_multipliers(level_bounds(edges, num_levels))
+    # the penalized edges are replaced (not kept), since dense graphs are large
+    edges = [(i, j, -penalty * multipliers[level]) for (i, j, level, penalty) in edges]
+    timings['graph'] += time.perf_counter() - start
+
+    pairs = []
+    for (i, j) in engine.matching(len(teams) + len(teams) % 2, edges, maxcardinality=True):
+        if j == len(teams):
+            pairs.append((teams[i],))
+        elif i == len(teams):
+            pairs.append((teams[j],))
+        else:
+            pairs.append((teams[i], teams[j]))
+    return pairs
+
+
+def table_weights(pairs, tables, previous_tables):
+    """
+    Build the matrix of weights used to assign tables to pairs.
+    Row i corresponds to pairs[i], and column j corresponds to tables[j].
+
+    pairs: list of pairs of team ids.
+    tables: list of pairs (table id, priority).
+    previous_tables: dictionary table id -> set of ids of teams that already played at that table.
+    """
+    weights = [[priority for (table, priority) in tables] for pair in pairs]   # priorities are integers between 0 and 100
+    for (j, (table, priority)) in enumerate(tables):
+        seen = previous_tables.get(table, ())
+        for (i, pair) in enumerate(pairs):
+            if any(team in seen for team in pair):
+                # penalize this table
+                weights[i][j] -= 1000
+    return weights
+
+
+def assign_tables(pairs, tables, previous_tables):
+    """
+    Assign tables to pairs of teams (byes are ignored; see table_weights for the arguments).
+    As many pairs as possible get a table, and the total weight is maximized.
+    Return a dictionary pair -> table id.
+    """
+    pairs = [pair for pair in pairs if len(pair) == 2]
+    weights = table_weights(pairs, tables, previous_tables)
+    return {pairs[i]: tables[j][0] for (i, j) in max_weight_assignment(weights)}
@@ -0,0 +1,263 @@
+"""
+Signal handlers that keep derived data (TeamHistory, TeamStanding, PlayerStanding and RoundSnapshot) up to date
+when tournaments, rounds, matches and results are written, that increment the version of the tournaments
+whose public data changes (see bump_versions), and that publish the changes to the live feed (see live.py)
+and to the static snapshot of the public site (see static_site.py).
+"""
+
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import *
+from . import live, static_site
+from .cache import bump_tournament_generation
+
+
+def has_changed(instance, field):
+    """
+    Check whether the given field changed since the instance was loaded from the database.
+    """
+    loaded_values = getattr(instance, '_loaded_values', None)
+    return loaded_values is None or loaded_values.get(field) != getattr(instance, field)
+
+
+def loaded_value(instance, field):
+    """
+    Value of the given field when the instance was loaded from the database (or its current value, if unknown).
+    """
+    return getattr(instance, '_loaded_values', {}).get(field, getattr(instance, field))
+
+
+def remember_values(instance):
+    instance._loaded_values = {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def match_teams(match_ids):
+    return set(TeamResult.objects.filter(match__in=match_ids).values_list('team', flat=True))
+
+
+def match_players(match_ids):
+    return set(PlayerResult.objects.filter(match__in=match_ids).values_list('player', flat=True))
+
+
+def refresh_snapshots(rounds):
+    """
+    Refresh the snapshots of the given rounds (a queryset) and of the following ones.
+    """
+    exclude_rounds = getattr(_deleting, 'rounds', set())
+    numbers = {}
+    for (tournament_id, number) in rounds.exclude(pk__in=exclude_rounds).values_list('tournament', 'number'):
+        numbers[tournament_id] = min(number, numbers.get(tournament_id, number))
+    for (tournament_id, number) in numbers.items():
+        RoundSnapshot.refresh(tournament_id, number, exclude_rounds=exclude_rounds)
+
+
+# teams, matches, players and rounds being deleted (collected in pre_delete, handled in post_delete)
+_deleting = threading.local()
+
+
+@receiver(post_save, sender=TeamResult)
+def team_result_saved(sender, instance, created, **kwargs):
+    teams = match_teams([instance.match_id])
+    if not created and has_changed(instance, 'team_id'):
+        teams.add(loaded_value(instance, 'team_id'))
+
+    if created or has_changed(instance, 'team_id'):
+        TeamHistory.refresh(teams)
+
+    # the score of a team also affects its opponent
+    TeamStanding.refresh(teams)
+
+    matches = {instance.match_id}
+    if not created:
+        matches.add(loaded_value(instance, 'match_id'))
+    refresh_snapshots(Round.objects.filter(match__in=matches))
+    bump_versions(round__match__in=matches)
+    bump_round_versions(match__in=matches)
+    live.add_changes(matches=matches)
+
+    remember_values(instance)
+
+
+@receiver(post_save, sender=PlayerResult)
+def player_result_saved(sender, instance, created, **kwargs):
+    players = {instance.player_id}
+    if not created and has_changed(instance, 'player_id'):
+        players.add(loaded_value(instance, 'player_id'))
+    PlayerStanding.refresh(players)
+    bump_versions(round__match=instance.match_id)
+
+    remember_values(instance)
+
+
+@receiver(post_save, sender=Match)
+def match_saved(sender, instance, created, **kwargs):
+    if not created and (has_changed(instance, 'type') or has_changed(instance, 'table_id')):
+        TeamHistory.refresh(match_teams([instance.pk]))
+
+    if not created and (has_changed(instance, 'type') or has_changed(instance, 'round_id')):
+        TeamStanding.refresh(match_teams([instance.pk]))
+        PlayerStanding.refresh(match_players([instance.pk]))
+        refresh_snapshots(Round.objects.filter(pk__in=[instance.round_id, loaded_value(instance, 'round_id')]))
+
+    bump_versions(round__in=[instance.round_id, loaded_value(instance, 'round_id')])
+    bump_round_versions(pk__in=[instance.round_id, loaded_value(instance, 'round_id')])
+    if not created:
+        live.add_changes(matches=[instance.pk], rounds=[instance.round_id, loaded_value(instance, 'round_id')])
+    remember_values(instance)
+
+
+@receiver(post_save, sender=Round)
+def round_saved(sender, instance, created, **kwargs):
+    if not created and (has_changed(instance, 'visibility') or has_changed(instance, 'tournament_id')):
+        matches = Match.objects.filter(round=instance)
+        TeamStanding.refresh(match_teams(matches))
+        PlayerStanding.refresh(match_players(matches))
+
+    if created:
+        RoundSnapshot.refresh(instance.tournament_id, instance.number)
+    elif has_changed(instance, 'visibility') or has_changed(instance, 'tournament_id') or has_changed(instance, 'number'):
+        RoundSnapshot.refresh(instance.tournament_id, min(instance.number, loaded_value(instance, 'number')))
+        if has_changed(instance, 'tournament_id'):
+            RoundSnapshot.refresh(loaded_value(instance, 'tournament_id'), loaded_value(instance, 'number'))
+
+    bump_versions(pk__in=[instance.tournament_id, loaded_value(instance, 'tournament_id')])
+    # new rounds also get the version of their tournament, so that they are returned by RoundsApiView
+    # (their matches and results are written in bulk, without signals, see write_round)
+    bump_round_versions(pk=instance.pk)
+    if created or any(has_changed(instance, field) for field in ('visibility', 'number', 'scheduled_time', 'tournament_id')):
+        live.add_changes(rounds=[instance.pk], tournaments=[loaded_value(instance, 'tournament_id')])
+    remember_values(instance)
+
+
+@receiver(post_save, sender=Tournament)
+def tournament_saved(sender, instance, created, **kwargs):
+    if not created and has_changed(instance, 'bye_score'):
+        TeamStanding.rebuild(instance)
+        RoundSnapshot.rebuild(instance)
+
+    bump_versions(pk=instance.pk)
+    if not created and has_changed(instance, 'bye_score'):
+        live.add_changes(tournaments=[instance.pk])
+    remember_values(instance)
+
+
+@receiver(post_delete, sender=Tournament)
+def tournament_deleted(sender, instance, **kwargs):
+    # the current tournament may change
+    bump_tournament_generation()
+    transaction.on_commit(bump_tournament_generation)
+
+
+@receiver(pre_delete, sender=TeamResult)
+def team_result_deleting(sender, instance, **kwargs):
+    if not hasattr(_deleting, 'teams'):
+        _deleting.teams = set()
+        _deleting.matches = set()
+    _deleting.teams.add(instance.team_id)
+    _deleting.matches.add(instance.match_id)
+
+
+@receiver(post_delete, sender=TeamResult)
+def team_result_deleted(sender, instance, **kwargs):
+    # all the results collected for deletion are already deleted at this point,
+    # so histories and standings are refreshed only once (for the first of them)
+    if hasattr(_deleting, 'teams'):
+        teams = _deleting.teams | match_teams(_deleting.matches)
+        matches = _deleting.matches
+        del _deleting.teams, _deleting.matches
+        TeamHistory.refresh(teams)
+        TeamStanding.refresh(teams)
+        refresh_snapshots(Round.objects.filter(match__in=matches))
+        bump_versions(round__match__in=matches)
+        bump_round_versions(match__in=matches)
+        live.add_changes(matches=matches)
+
+
+@receiver(pre_delete, sender=PlayerResult)
+def player_result_deleting(sender, instance, **kwargs):
+    if not hasattr(_deleting, 'players'):
+        _deleting.players = set()
+        _deleting.player_matches = set()
+    _deleting.players.add(instance.player_id)
+    _deleting.player_matches.add(instance.match_id)
+
+
+@receiver(post_delete, sender=PlayerResult)
+def player_result_deleted(sender, instance, **kwargs):
+    if hasattr(_deleting, 'players'):
+        players = _deleting.players
+        matches = _deleting.player_matches
+        del _deleting.players, _deleting.player_matches
+        PlayerStanding.refresh(players)
+        bump_versions(round__match__in=matches)
+
+
+@receiver(post_delete, sender=Match)
+def match_deleted(sender, instance, **kwargs):
+    bump_versions(round=instance.round_id)
+    bump_round_versions(pk=instance.round_id)
+    live.add_changes(rounds=[instance.round_id])
+
+
+@receiver(pre_delete, sender=Round)
+def round_deleting(sender, instance, **kwargs):
+    if not hasattr(_deleting, 'rounds'):
+        _deleting.rounds = set()
+        _deleting.round_numbers = {}
+    _deleting.rounds.add(instance.pk)
+    live.add_changes(deleted_rounds={instance.pk: instance.tournament_id})
+    number = _deleting.round_numbers.get(instance.tournament_id, instance.number)
+    _deleting.round_numbers[instance.tournament_id] = min(number, instance.number)
+
+
+@receiver(post_delete, sender=Round)
+def round_deleted(sender, instance, **kwargs):
+    # the snapshots of the following rounds change
+    if hasattr(_deleting, 'rounds'):
+        round_numbers = _deleting.round_numbers
+        del _deleting.rounds, _deleting.round_numbers
+        for (tournament_id, number) in round_numbers.items():
+            RoundSnapshot.refresh(tournament_id, number)
+        bump_versions(pk__in=list(round_numbers))
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+@receiver(post_save, sender=Table)
+@receiver(post_delete, sender=Table)
+def team_player_table_changed(sender, instance, **kwargs):
+    # teams, players and tables are shared by all tournaments
+    bump_versions()
+    if sender is not Player:
+        # matches show the names of teams and tables
+        bump_round_versions()
+    if sender is Team:
+        # inactive teams do not appear in the scoreboard
+        live.add_changes(tournaments=Tournament.objects.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=TeamResult)
+@receiver(post_delete, sender=TeamResult)
+@receiver(post_save, sender=PlayerResult)
+@receiver(post_delete, sender=PlayerResult)
+@receiver(post_save, sender=Match)
+@receiver(post_delete, sender=Match)
+@receiver(post_save, sender=Round)
+@receiver(post_delete, sender=Round)
+@receiver(post_save, sender=Tournament)
+@receiver(post_delete, sender=Tournament)
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+@receiver(post_save, sender=Table)
+@receiver(post_delete, sender=Table)
+def public_data_changed(sender, instance, **kwargs):
+    # the snapshot is published (at most once for many changes) after the transaction is committed
+    transaction.on_commit(static_site.schedule_publish)
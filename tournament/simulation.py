@@ -0,0 +1,130 @@
+"""
+In-memory simulation of tournaments, used by simulate.py.
+
+Rounds are created with the same pairing and table logic as Tournament.create_round (see the pairing module),
+but teams, scores and histories are kept in memory instead of the database.
+Match outcomes follow the alpha/beta model: the stronger team wins with probability alpha,
+the weaker team wins with probability beta, and otherwise the match is a draw.
+Outcomes of a whole round are drawn at once with NumPy.
+"""
+
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from . import pairing
+from .models import Score
+
+
+# results of a match (team result scores of the stronger and of the weaker team)
+STRONGER_WINS = (1, 0)
+WEAKER_WINS = (0, 1)
+DRAW = (Decimal('0.5'), Decimal('0.5'))
+
+# default value of the window argument of SimulatedTournament (None means the dense graph)
+DEFAULT_WINDOW = object()
+
+
+def match_score(score, other_score):
+    """
+    Integer score (see Score.to_int) of a team in a normal match with the given team result scores.
+    """
+    if score == other_score:
+        return Score(primary=Decimal('0.5'), secondary=Decimal(score)).to_int()
+    else:
+        return Score(primary=Decimal('1.0') if score > other_score else Decimal('0.0'), secondary=Decimal(score)).to_int()
+
+
+class SimulatedTournament:
+    """
+    A tournament whose state is kept in arrays indexed by team position.
+
+    teams: list of team ids, sorted by id.
+    tables: list of pairs (table id, priority).
+    strengths: list with the strength of each team (stronger teams have larger values).
+    rng: a numpy.random.Generator, used to draw the outcomes.
+    window: see pairing.pair_teams (by default, settings.PAIRING_WINDOW, as in Tournament.plan_round).
+    """
+    def __init__(self, teams, tables, strengths, alpha, beta, rng, bye_score=3, engine=None, window=DEFAULT_WINDOW):
+        self.teams = list(teams)
+        self.tables = list(tables)
+        self.strengths = np.asarray(strengths)
+        self.alpha = alpha
+        self.beta = beta
+        self.rng = rng
+        self.engine = engine if engine is not None else pairing.get_pairing_engine()
+        self.window = window if window is not DEFAULT_WINDOW else getattr(settings, 'PAIRING_WINDOW', None)
+
+        self.index = {team: i for (i, team) in enumerate(self.teams)}
+        self.scores = np.zeros(len(self.teams), dtype=np.int64)
+        self.bye_score = Score(primary=Decimal('1.0'), secondary=Decimal(bye_score)).to_int()
+        self.outcome_scores = {outcome: (match_score(*outcome), match_score(*reversed(outcome))) for outcome in (STRONGER_WINS, WEAKER_WINS, DRAW)}
+
+        self.num_rounds = 0
+        self.previous_pairs = set()
+        self.previous_byes = set()
+        self.previous_tables = {}
+        self.team_tables = {team: [] for team in self.teams}   # tables where each team played, in order
+
+    def create_round(self):
+        """
+        Compute the pairs and the table assignment of a new round, as Tournament.plan_round.
+        Return the list of pairs of team ids (byes are 1-tuples) and a dictionary pair -> table id.
+        """
+        if self.num_rounds == 0:
+            pairs = pairing.random_pairs(self.teams)
+        else:
+            scores = dict(zip(self.teams, self.scores.tolist()))
+            pairs = pairing.pair_teams(self.teams, scores, self.previous_pairs, self.previous_byes, engine=self.engine, window=self.window)
+
+        pairs_to_tables = pairing.assign_tables(pairs, self.tables, self.previous_tables)
+        return pairs, pairs_to_tables
+
+    def play_round(self, pairs, pairs_to_tables):
+        """
+        Draw the outcomes of all the matches of a round, and update scores and histories.
+        Return a dictionary pair -> tuple with the team result score of each team of the pair (None for byes).
+        """
+        normal = [pair for pair in pairs if len(pair) == 2]
+        a = np.array([self.index[pair[0]] for pair in normal], dtype=np.int64)
+        b = np.array([self.index[pair[1]] for pair in normal], dtype=np.int64)
+
+        # outcomes of all matches, from the point of view of the stronger team
+        stronger_first = self.strengths[a] > self.strengths[b]
+        x = self.rng.random(len(normal))
+        stronger_wins = x < self.alpha
+        weaker_wins = (x >= self.alpha) & (x < self.alpha + self.beta)
+
+        outcomes = np.where(stronger_wins, 0, np.where(weaker_wins, 1, 2))
+        points = np.array([self.outcome_scores[outcome] for outcome in (STRONGER_WINS, WEAKER_WINS, DRAW)], dtype=np.int64)
+        stronger_scores = points[outcomes, 0]
+        weaker_scores = points[outcomes, 1]
+
+        # every team plays at most once in a round, so indices are distinct
+        self.scores[a] += np.where(stronger_first, stronger_scores, weaker_scores)
+        self.scores[b] += np.where(stronger_first, weaker_scores, stronger_scores)
+
+        results = {}
+        for (k, pair) in enumerate(normal):
+            outcome = (STRONGER_WINS, WEAKER_WINS, DRAW)[outcomes[k]]
+            results[pair] = outcome if stronger_first[k] else tuple(reversed(outcome))
+            self.previous_pairs.add((min(pair), max(pair)))
+
+        for pair in pairs:
+            if len(pair) == 1:
+                self.scores[self.index[pair[0]]] += self.bye_score
+                self.previous_byes.add(pair[0])
+                results[pair] = (None,)
+
+            if pair in pairs_to_tables:
+                table = pairs_to_tables[pair]
+                for team in pair:
+                    self.previous_tables.setdefault(table, set()).add(team)
+                    self.team_tables[team].append(table)
+
+        self.num_rounds += 1
+        return results
+
+    def used_tables(self):
+        return set(self.previous_tables)
@@ -0,0 +1,227 @@
+"""
+Cache backend stored in a SQLite file, shared by all the processes (e.g., gunicorn workers) of the same machine,
+without an external service. To use it:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'tournament.sqlite_cache.SQLiteCache',
+            'LOCATION': '/path/to/cache.sqlite3',
+            'TIMEOUT': None,
+            'OPTIONS': {'MAX_ENTRIES': 1000},
+        }
+    }
+
+Every write is a SQLite transaction, so it is atomic and visible to all processes once committed.
+The database is in WAL mode, so reads are not blocked by writes.
+When there are more than MAX_ENTRIES values, the least recently used ones are evicted (a fraction 1 / CULL_FREQUENCY
+of them, as in the other Django backends). The time of the last use of a value is updated at most once every
+ACCESS_RESOLUTION seconds (an option), so that most hits do not write to the database.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        options = params.get('OPTIONS', {})
+        self.access_resolution = options.get('ACCESS_RESOLUTION', 10)
+        self.busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self.local = threading.local()
+
+    def connection(self):
+        """
+        Connection of this thread (a new one after a fork, since connections cannot be shared among processes).
+        """
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # autocommit mode: transactions are started explicitly
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def write(self, function):
+        """
+        Call function(connection) inside a transaction, which takes the write lock immediately.
+        """
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = function(connection)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    def read(self, keys):
+        """
+        Return a dictionary key -> value with the values of the given (full) keys which are in the cache and not expired.
+        """
+        now = time.time()
+        rows = []
+        # SQLite limits the number of parameters of a query
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i+500]
+            rows += self.connection().execute(
+                'SELECT key, value, expires, accessed FROM cache WHERE key IN (%s)' % ', '.join('?' * len(chunk)), chunk
+            ).fetchall()
+
+        values = {}
+        expired = []
+        touched = []
+        for (key, value, expires, accessed) in rows:
+            if expires is not None and expires <= now:
+                expired.append(key)
+            else:
+                values[key] = pickle.loads(value)
+                if now - accessed >= self.access_resolution:
+                    touched.append(key)
+
+        if expired or touched:
+            def update(connection):
+                connection.executemany('DELETE FROM cache WHERE key = ? AND expires <= ?', [(key, now) for key in expired])
+                connection.executemany('UPDATE cache SET accessed = ? WHERE key = ?', [(now, key) for key in touched])
+            self.write(update)
+        return values
+
+    def store(self, connection, key, value, timeout, mode='set'):
+        """
+        Store a value, within a transaction (see write). Return False if mode is 'add' and the key is already in the cache.
+        """
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        if expires is not None and expires <= now:
+            # as in the other backends, a timeout of 0 (or less) deletes the value
+            connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return mode != 'add'
+
+        if mode == 'add':
+            connection.execute('DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now))
+            cursor = connection.execute('INSERT OR IGNORE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)', (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, now))
+            if cursor.rowcount == 0:
+                return False
+        else:
+            connection.execute('INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)', (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, now))
+        return True
+
+    def cull(self, connection):
+        """
+        If there are too many values, delete the expired ones and then the least recently used ones.
+        """
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            num_deleted = count // self._cull_frequency if self._cull_frequency > 0 else count
+            connection.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)', (num_deleted,))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self.read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        full_keys = {}
+        for key in keys:
+            full_key = self.make_key(key, version=version)
+            self.validate_key(full_key)
+            full_keys[full_key] = key
+        values = self.read(list(full_keys))
+        return {full_keys[full_key]: value for (full_key, value) in values.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def set_value(connection):
+            self.store(connection, key, value, timeout)
+            self.cull(connection)
+        self.write(set_value)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = []
+        for (key, value) in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            items.append((key, value))
+
+        def set_values(connection):
+            for (key, value) in items:
+                self.store(connection, key, value, timeout)
+            self.cull(connection)
+        self.write(set_values)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def add_value(connection):
+            added = self.store(connection, key, value, timeout, mode='add')
+            self.cull(connection)
+            return added
+        return self.write(add_value)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def increment(connection):
+            row = connection.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] is not None and row[1] <= time.time():
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute('UPDATE cache SET value = ? WHERE key = ?', (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key))
+            return value
+        return self.write(increment)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        return self.write(lambda connection: connection.execute(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)', (self.get_backend_timeout(timeout), now, key, now)
+        ).rowcount == 1)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self.connection().execute('SELECT expires FROM cache WHERE key = ?', (key,)).fetchone()
+        return row is not None and (row[0] is None or row[0] > time.time())
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.write(lambda connection: connection.execute('DELETE FROM cache WHERE key = ?', (key,)))
+
+    def delete_many(self, keys, version=None):
+        full_keys = []
+        for key in keys:
+            full_key = self.make_key(key, version=version)
+            self.validate_key(full_key)
+            full_keys.append(full_key)
+        self.write(lambda connection: connection.executemany('DELETE FROM cache WHERE key = ?', [(key,) for key in full_keys]))
+
+    def clear(self):
+        self.write(lambda connection: connection.execute('DELETE FROM cache'))
+
+    def close(self, **kwargs):
+        # connections are kept open (one per thread), since opening them is much slower than a hit
+        pass
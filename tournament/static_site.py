@@ -0,0 +1,242 @@
+"""
+Static snapshot of the public site, which can be served by the web server (e.g., nginx) without reaching Django.
+
+The public pages and the JSON API (see PAGES) are rendered with the same views (and caches) as the dynamic site,
+and written to STATIC_SITE_ROOT, together with precompressed .gz variants (and .br variants, if brotli is installed).
+Every snapshot is written to a new directory, and STATIC_SITE_ROOT is a symbolic link which is then replaced
+atomically, so that the web server never serves a partial snapshot.
+Snapshots are published under a file lock, so that concurrent processes do not overlap, and a snapshot never replaces
+one of a newer version of the same tournament (see SNAPSHOT_INFO).
+
+If STATIC_SITE_ROOT is set, a new snapshot is published after every change of the public data (see signals.py),
+at most once every STATIC_SITE_DELAY seconds (see Debouncer).
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpRequest
+from django.urls import resolve
+
+from .models import *
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows: snapshots of concurrent processes are not serialized
+    fcntl = None
+
+
+# paths of the public pages, and files where they are written
+PAGES = (
+    ('/', 'index.html'),
+    ('/tables/', 'tables/index.html'),
+    ('/progression/', 'progression/index.html'),
+    ('/api/teams/', 'api/teams/index.json'),
+    ('/api/players/', 'api/players/index.json'),
+    ('/api/rounds/', 'api/rounds/index.json'),
+)
+
+# file of every snapshot with the tournament and the version it was rendered from
+SNAPSHOT_INFO = 'snapshot.json'
+
+
+def page_request(path, tournament):
+    """
+    GET request for the given path, as seen by the views after CurrentTournamentMiddleware.
+    """
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META = {'SERVER_NAME': 'localhost', 'SERVER_PORT': '80'}
+    request.current_tournament = tournament
+    return request
+
+
+def render_pages(tournament):
+    """
+    Render the public pages for the given tournament (the current one), and return a list of (file name, content).
+    """
+    # rounds loaded on demand by the public page
+    pages = list(PAGES)
+    if tournament:
+        pages += [('/rounds/%d/' % pk, 'rounds/%d/index.html' % pk) for pk in tournament.round_set.exclude(visibility=HIDE).values_list('pk', flat=True)]
+
+    files = []
+    for (path, filename) in pages:
+        request = page_request(path, tournament)
+        match = resolve(path)
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code == 200:
+            files.append((filename, response.content))
+    return files
+
+
+def write_file(directory, filename, content):
+    path = os.path.join(directory, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+    # precompressed variants, with a fixed time so that equal contents give equal files
+    with open(path + '.gz', 'wb') as f:
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9, mtime=0) as compressed:
+            compressed.write(content)
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content))
+
+
+def snapshot_info(directory):
+    """
+    Return the tournament id and version of the snapshot in the given directory, or None if unknown.
+    """
+    try:
+        with open(os.path.join(directory, SNAPSHOT_INFO)) as f:
+            info = json.load(f)
+        return info['tournament'], info['version']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+class PublishLock:
+    """
+    Exclusive lock on the given file, shared by all the processes of the machine.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        # closing the file releases the lock
+        self.file.close()
+        self.file = None
+
+
+def publish(root=None):
+    """
+    Write a new snapshot of the public site, and make root (by default, STATIC_SITE_ROOT) point to it.
+    Return the directory of the new snapshot, or of the published one if it is of a newer version of the same tournament.
+    """
+    root = os.path.abspath(root or settings.STATIC_SITE_ROOT)
+    if os.path.exists(root) and not os.path.islink(root):
+        raise ValueError('%s must be a symbolic link (or not exist), as it is replaced at every snapshot.' % root)
+
+    parent = os.path.dirname(root)
+    prefix = os.path.basename(root) + '-'
+    os.makedirs(parent, exist_ok=True)
+
+    with PublishLock(root + '.lock'):
+        tournament = Tournament.current()
+        info = (tournament.pk, tournament.version) if tournament else None
+        previous = os.path.realpath(root) if os.path.islink(root) else None
+        if previous is not None:
+            previous_info = snapshot_info(previous)
+            if info is not None and previous_info is not None and previous_info[0] == info[0] and previous_info[1] > info[1]:
+                # the data read by this process is older than the published snapshot
+                return previous
+
+        directory = tempfile.mkdtemp(prefix=prefix, dir=parent)
+        try:
+            for (filename, content) in render_pages(tournament):
+                write_file(directory, filename, content)
+            if info is not None:
+                with open(os.path.join(directory, SNAPSHOT_INFO), 'w') as f:
+                    json.dump({'tournament': info[0], 'version': info[1]}, f)
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        # the web server must be able to read the snapshot
+        os.chmod(directory, 0o755)
+
+        # replace the link atomically
+        link = directory + '.link'
+        os.symlink(directory, link)
+        os.replace(link, root)
+
+        # remove the previous snapshot, and those left by interrupted snapshots (named as by mkdtemp)
+        pattern = re.compile(re.escape(prefix) + r'[a-z0-9_]{8}(\.link)?$')
+        for name in os.listdir(parent):
+            path = os.path.join(parent, name)
+            if pattern.match(name) and path != directory:
+                if os.path.islink(path):
+                    os.remove(path)
+                elif os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+    return directory
+
+
+class Debouncer:
+    """
+    Call a function in a background thread, delay seconds after the last call of schedule(),
+    but at most max_delay seconds after the first one (so that continuous changes do not postpone it forever).
+    Calls of the function never overlap: changes scheduled while it is running cause another call.
+    """
+    def __init__(self, function, delay, max_delay):
+        self.function = function
+        self.delay = delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.run_lock = threading.Lock()
+        self.timer = None
+        self.first_time = None
+
+    def schedule(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.timer is not None:
+                self.timer.cancel()
+            else:
+                self.first_time = now
+            self.timer = threading.Timer(max(0, min(self.delay, self.first_time + self.max_delay - now)), self.run)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def run(self):
+        with self.lock:
+            if self.timer is not threading.current_thread():
+                # rescheduled in the meantime
+                return
+            self.timer = None
+        with self.run_lock:
+            self.function()
+
+
+def publish_in_background():
+    try:
+        publish()
+    finally:
+        # timer threads have their own database connection
+        connection.close()
+
+
+debouncer = Debouncer(publish_in_background, getattr(settings, 'STATIC_SITE_DELAY', 2), getattr(settings, 'STATIC_SITE_MAX_DELAY', 10))
+
+
+def schedule_publish():
+    """
+    Publish a new snapshot soon, if STATIC_SITE_ROOT is set.
+    """
+    if getattr(settings, 'STATIC_SITE_ROOT', None):
+        debouncer.schedule()
@@ -0,0 +1,51 @@
+from django import template
+from django.template.base import token_kwargs
+
+from tournament import cache
+
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on, kwargs):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+        self.kwargs = kwargs
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        vary_on = [value.resolve(context) for value in self.vary_on]
+
+        content = cache.get_fragment(name, *vary_on)
+        if content is None:
+            content = self.nodelist.render(context)
+            permanent = self.kwargs['permanent'].resolve(context) if 'permanent' in self.kwargs else False
+            cache.set_fragment(content, name, *vary_on, permanent=permanent)
+        return content
+
+
+@register.tag('cachefragment')
+def do_cachefragment(parser, token):
+    """
+    Cache the enclosed fragment of a template, keyed by its name and by the given inputs
+    (see cache.get_fragment). Fragments are kept for PUBLIC_PAGE_CACHE_TIMEOUT seconds, or forever if permanent is true.
+
+    Usage::
+
+        {% cachefragment 'round' round.pk round.version permanent=round.is_complete %}
+            ...
+        {% endcachefragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError("'%s' tag requires at least one argument." % bits[0])
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+
+    args = [bit for bit in bits[1:] if '=' not in bit]
+    kwargs = token_kwargs([bit for bit in bits[1:] if '=' in bit], parser)
+    if set(kwargs) - {'permanent'}:
+        raise template.TemplateSyntaxError("'%s' tag only accepts the 'permanent' keyword argument." % bits[0])
+    return FragmentNode(nodelist, parser.compile_filter(args[0]), [parser.compile_filter(bit) for bit in args[1:]], kwargs)
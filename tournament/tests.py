@@ -1,3 +1,1306 @@
-from django.test import TestCase
+import os
+import sys
+import gzip
+import inspect
+import random
+import datetime
+import time
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+import numpy
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import *
+from . import pairing, jobs, tiebreakers, views, live, static_site, middleware
+from . import cache as public_cache
+from .matching import max_weight_matching
+from .assignment import max_weight_assignment
+from .simulation import SimulatedTournament
+from .sqlite_cache import SQLiteCache
+
+from benchmark_pairing import random_swiss_instance, legacy_pairing
+
+
+def pairing_penalties(instance, pairs):
+    """
+    Total penalty at each level of the given pairs of teams (see pairing.level_penalties).
+    """
+    teams = instance[0]
+    edges, num_levels = pairing.pairing_edges(*instance)
+    index = {team: i for (i, team) in enumerate(teams)}
+    bye = len(teams)
+    return pairing.level_penalties(edges, num_levels, [(index[pair[0]], index[pair[1]] if len(pair) == 2 else bye) for pair in pairs])
+
+
+class ScoreTest(SimpleTestCase):
+    def test_score(self):
+        score = Score(primary=Decimal('1.5'), secondary=Decimal('7.5'), num_matches=2) + Score(primary=1, secondary=Decimal('2.5'), num_matches=1)
+        self.assertEqual(score.raw(), (Decimal('2.5'), Decimal('10.0'), Decimal('0.0')))
+        self.assertEqual(str(score.primary), '2.5')
+        self.assertEqual(str(score.secondary), '10.0')
+        self.assertEqual(score.to_int(), int(10*(100 * Decimal('2.5') + Decimal('10.0'))))
+
+        # equal scores have equal hashes; ties are broken by the phantom score and then by the number of matches
+        same = Score(primary=Decimal('2.5'), secondary=10, num_matches=3)
+        self.assertEqual(score, same)
+        self.assertEqual(hash(score), hash(same))
+        self.assertLess(Score(primary=2, secondary=20), score)
+        self.assertLess(score, score + Score(phantom=Decimal('0.5')))
+        self.assertLess(Score(primary=Decimal('2.5'), secondary=10, num_matches=4), score)
+
+        # empty scores are discarded by Counter sums
+        self.assertEqual(Counter({'a': Score(), 'b': score}) + Counter(), Counter({'b': score}))
+        self.assertEqual(sum([score, same]), Score(primary=5, secondary=20, num_matches=6))
+
+
+class MatchingTest(SimpleTestCase):
+    def test_random_graphs(self):
+        """
+        The blossom engine finds matchings of the same weight and cardinality as networkx.
+        """
+        rng = random.Random(0)
+        reference = pairing.NetworkxEngine()
+        engine = pairing.BlossomEngine()
+
+        for trial in range(300):
+            n = rng.randint(1, 16)
+            p = rng.random()
+            edges = [(i, j, rng.randint(-30, 30)) for i in range(n) for j in range(i+1, n) if rng.random() < p]
+
+            for maxcardinality in (False, True):
+                expected = reference.matching(n, edges, maxcardinality=maxcardinality)
+                pairs = engine.matching(n, edges, maxcardinality=maxcardinality)
+                self.assertEqual(pairing.matching_weight(edges, pairs), pairing.matching_weight(edges, expected))
+                if maxcardinality:
+                    self.assertEqual(len(pairs), len(expected))
+
+    def test_mate_is_symmetric(self):
+        mate = max_weight_matching(4, [(0, 1, 5), (1, 2, 11), (2, 3, 5)])
+        self.assertEqual(mate, [-1, 2, 1, -1])
+        mate = max_weight_matching(4, [(0, 1, 5), (1, 2, 11), (2, 3, 5)], maxcardinality=True)
+        self.assertEqual(mate, [1, 0, 3, 2])
+
+    def test_nested_blossoms(self):
+        """
+        Deeply nested blossoms do not hit the recursion limit.
+        """
+        rng = random.Random(0)
+        n = 1001
+        edges = [(i, j, 1) for i in range(n) for j in range(i+1, n) if rng.random() < 0.005]
+        expected = pairing.NetworkxEngine().matching(n, edges, maxcardinality=True)
+
+        # blossoms on this graph are nested more than 100 levels deep
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(len(inspect.stack(0)) + 100)
+        try:
+            mate = max_weight_matching(n, edges, maxcardinality=True)
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+        self.assertEqual(sum(v >= 0 for v in mate), 2 * len(expected))
+
+    def test_swiss_pairings(self):
+        """
+        On Swiss-like instances, both engines give pairings of the same optimal weight.
+        """
+        for seed in range(10):
+            instance = random_swiss_instance(21 + 2*seed, 1 + seed % 4, random.Random(seed))
+            expected = pairing.pair_teams(*instance, engine=pairing.NetworkxEngine())
+            pairs = pairing.pair_teams(*instance, engine=pairing.BlossomEngine())
+            self.assertEqual(len(pairs), len(expected))
+            self.assertEqual(pairing_penalties(instance, pairs), pairing_penalties(instance, expected))
+
+    def test_table_assignment(self):
+        """
+        The assignment solver gives table assignments of the same weight as a maximum cardinality matching.
+        """
+        rng = random.Random(1)
+        for seed in range(20):
+            pairs = [(2*i, 2*i+1) for i in range(rng.randint(1, 12))]
+            tables = [(j, rng.randint(0, 100)) for j in range(rng.randint(1, 12))]
+            previous_tables = {j: set(rng.sample(range(2*len(pairs)), min(4, 2*len(pairs)))) for j in range(len(tables))}
+            weights = pairing.table_weights(pairs, tables, previous_tables)
+            edges = [(i, len(pairs) + j, weights[i][j]) for i in range(len(pairs)) for j in range(len(tables))]
+            expected = pairing.NetworkxEngine().matching(len(pairs) + len(tables), edges)
+
+            for use_scipy in (False, True):
+                assignment = max_weight_assignment(weights, use_scipy=use_scipy)
+                self.assertEqual(len(assignment), min(len(pairs), len(tables)))
+                self.assertEqual(len(set(j for (i, j) in assignment)), len(assignment))
+                self.assertEqual(sum(weights[i][j] for (i, j) in assignment), pairing.matching_weight(edges, expected))
+
+            pairs_to_tables = pairing.assign_tables(pairs, tables, previous_tables)
+            self.assertEqual(len(pairs_to_tables), min(len(pairs), len(tables)))
+
+
+class PairingWeightsTest(SimpleTestCase):
+    def exact_penalties(self, instance):
+        """
+        Total penalty at each level of an optimal pairing, computed by the reference engine with the old weights M ** level.
+        """
+        pairs, bits = legacy_pairing(pairing, pairing.NetworkxEngine(), *instance)
+        edges, num_levels = pairing.pairing_edges(*instance)
+        return pairing.level_penalties(edges, num_levels, pairs)
+
+    def test_bounded_weights(self):
+        """
+        Pairings with bounded weights are as good as those with the old weights, at every level.
+        """
+        for seed in range(10):
+            instance = random_swiss_instance(30 + seed, 2 + seed % 4, random.Random(seed))
+            pairs = pairing.pair_teams(*instance)
+            self.assertEqual(pairing_penalties(instance, pairs), self.exact_penalties(instance))
+
+    def test_many_levels(self):
+        """
+        Pairings remain optimal at every level when the weights do not fit in machine-size integers.
+        """
+        # with these seeds, pairing in tiers with weights below MAX_WEIGHT gave worse pairings
+        for seed in (36, 39, 74):
+            instance = random_swiss_instance(29, 6, random.Random(seed))
+            teams, scores, previous_pairs, previous_byes = instance
+            edges, num_levels = pairing.pairing_edges(*instance)
+            multipliers = pairing.level_multipliers(pairing.level_bounds(edges, num_levels))
+            self.assertGreater(max(penalty * multipliers[level] for (i, j, level, penalty) in edges), pairing.MAX_WEIGHT)
+
+            pairs = pairing.pair_teams(*instance)
+            self.assertEqual(sorted(team for pair in pairs for team in pair), sorted(teams))
+            for pair in pairs:
+                if len(pair) == 2:
+                    self.assertNotIn((min(pair), max(pair)), previous_pairs)
+            self.assertEqual(pairing_penalties(instance, pairs), self.exact_penalties(instance))
+
+
+class SparsePairingTest(SimpleTestCase):
+    def test_sparse_graph(self):
+        """
+        The sparse graph is a subgraph of the dense one, and on these instances it gives pairings as good as the dense graph.
+        """
+        for seed in range(10):
+            instance = random_swiss_instance(40 + seed, 3 + seed % 4, random.Random(seed))
+            dense_edges, num_levels = pairing.pairing_edges(*instance)
+            sparse_edges, _ = pairing.pairing_edges(*instance, window=2)
+            self.assertLess(len(sparse_edges), len(dense_edges))
+            self.assertTrue(set(sparse_edges) <= set(dense_edges))
+
+            expected = pairing.pair_teams(*instance)
+            pairs = pairing.pair_teams(*instance, window=2)
+            self.assertEqual(pairing_penalties(instance, pairs), pairing_penalties(instance, expected))
+
+    def test_widen_window(self):
+        """
+        The window is widened if not all teams can be paired.
+        """
+        teams = [1, 2, 3, 4]
+        scores = {1: 0, 2: 10, 3: 20, 4: 30}
+        previous_pairs = {(1, 2), (2, 3), (3, 4)}
+        edges, num_levels = pairing.pairing_edges(teams, scores, previous_pairs, set(), window=1)
+        self.assertEqual(edges, [])
+
+        pairs = pairing.pair_teams(teams, scores, previous_pairs, set(), window=1)
+        self.assertEqual(set(tuple(sorted(pair)) for pair in pairs), {(1, 3), (2, 4)})
+
+
+class CreateRoundTest(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name='Test tournament')
+        for i in range(9):
+            team = Team.objects.create(name='Team %d' % i)
+            Player.objects.create(name='Player %d' % i, team=team)
+        for i in range(6):
+            Table.objects.create(name='Table %d' % i, priority=10*i)
+
+    def play_round(self, round):
+        for match in round.match_set.filter(type=NORMAL):
+            for i, team_result in enumerate(match.teamresult_set.all()):
+                team_result.score = 2 if i == 0 else 1
+                team_result.save()
+
+    def test_create_rounds(self):
+        for engine in (pairing.NetworkxEngine(), pairing.BlossomEngine()):
+            Round.objects.all().delete()
+            pairs = set()
+            for number in range(1, 5):
+                round, success = self.tournament.create_round(engine=engine)
+                self.assertTrue(success)
+                self.assertEqual(round.number, number)
+                self.assertEqual(round.match_set.filter(type=BYE).count(), 1)
+                self.assertEqual(round.match_set.filter(type=NORMAL).count(), 4)
+                self.assertEqual(PlayerResult.objects.filter(match__round=round).count(), 9)
+
+                for match in round.match_set.filter(type=NORMAL):
+                    self.assertIsNotNone(match.table)
+                    pair = match.team_pair()
+                    self.assertNotIn(pair, pairs)
+                    pairs.add(pair)
+
+                self.play_round(round)
+
+    def test_write_round(self):
+        """
+        Rounds are written with a number of queries which does not depend on the number of matches.
+        """
+        teams = list(Team.objects.values_list('pk', flat=True))
+        table = Table.objects.first()
+        num_queries = []
+        for num_pairs in (1, 1, 4):
+            pairs = [(teams[2*i], teams[2*i+1]) for i in range(num_pairs)] + [(teams[-1],)]
+            with CaptureQueriesContext(connection) as context:
+                round = self.tournament.write_round(pairs, {pairs[0]: table.pk})
+            num_queries.append(len(context))
+
+            self.assertEqual(round.match_set.count(), num_pairs + 1)
+            self.assertEqual(round.match_set.get(table=table).team_pair(), tuple(Team.objects.get(pk=pk) for pk in pairs[0]))
+            self.assertEqual(PlayerResult.objects.filter(match__round=round).count(), 2*num_pairs + 1)
+            self.assertEqual(TeamHistory.load(self.tournament)[1], {teams[-1]})
+
+        self.assertEqual(num_queries[1], num_queries[2])
+
+    def test_preview(self):
+        self.play_round(self.tournament.create_round()[0])
+        preview = self.tournament.preview_round()
+        self.assertEqual(Round.objects.count(), 1)
+        self.assertEqual(set(preview['timings']), {'scoreboard', 'graph', 'pairing', 'tables'})
+
+        self.assertIsNone(self.tournament.commit_round_preview('wrong token'))
+        round, success = self.tournament.commit_round_preview(preview['token'])
+        self.assertTrue(success)
+        self.assertEqual(round.number, 2)
+        for match in round.match_set.all():
+            pair = tuple(sorted(team.pk for team in match.teams.all()))
+            self.assertIn(pair, [tuple(sorted(p)) for p in preview['pairs']])
+            self.assertEqual(match.table_id, preview['tables'].get(next(p for p in preview['pairs'] if tuple(sorted(p)) == pair)))
+
+        # a preview cannot be committed twice, nor after another round was created
+        self.assertIsNone(self.tournament.commit_round_preview(preview['token']))
+        preview = self.tournament.preview_round()
+        self.tournament.create_round()
+        self.assertIsNone(self.tournament.commit_round_preview(preview['token']))
+        self.assertEqual(Round.objects.count(), 3)
+
+        # nor after a result was changed
+        preview = self.tournament.preview_round()
+        team_result = TeamResult.objects.filter(match__round__number=3, match__type=NORMAL).first()
+        team_result.score = 3
+        team_result.save()
+        self.assertIsNone(self.tournament.commit_round_preview(preview['token']))
+        self.assertEqual(Round.objects.count(), 3)
+
+    def test_preview_views(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+
+        response = self.client.get(reverse('previewround', args=(self.tournament.pk,)))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('previewround', args=(self.tournament.pk,)), {'format': 'json'})
+        data = response.json()
+        self.assertEqual(data['round'], 1)
+        self.assertEqual(sum(len(match['teams']) for match in data['matches']), 9)
+        self.assertEqual(Round.objects.count(), 0)
+
+        response = self.client.post(reverse('commitround', args=(self.tournament.pk,)), {'token': data['token']})
+        self.assertRedirects(response, reverse('admin:index'))
+        self.assertEqual(Round.objects.count(), 1)
+
+    def test_stale_write(self):
+        """
+        A round computed before another round was created is not written.
+        """
+        plan = self.tournament.plan_round()
+        self.tournament.create_round()
+        self.assertIsNone(self.tournament.write_round(plan['pairs'], plan['tables'], num_rounds=plan['num_rounds']))
+        self.assertEqual(list(Round.objects.values_list('number', flat=True)), [1])
+
+
+@override_settings(ROUND_JOB_WORKERS=0)
+class RoundJobTest(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name='Test tournament')
+        for i in range(6):
+            Team.objects.create(name='Team %d' % i)
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+
+    def test_jobs(self):
+        job = jobs.submit_round_job(self.tournament)
+        self.assertEqual(job.status, DONE)
+        self.assertTrue(job.success)
+        self.assertEqual(job.round.number, 1)
+
+        # a pending job is not duplicated
+        running = RoundJob.objects.create(tournament=self.tournament, status=RUNNING)
+        self.assertEqual(jobs.submit_round_job(self.tournament), running)
+        self.assertEqual(Round.objects.count(), 1)
+
+        # unless it is lost
+        RoundJob.objects.filter(pk=running.pk).update(creation_time=running.creation_time - datetime.timedelta(hours=1))
+        job = jobs.submit_round_job(self.tournament)
+        self.assertEqual(job.round.number, 2)
+        running.refresh_from_db()
+        self.assertEqual(running.status, FAILED)
+
+    def test_views(self):
+        response = self.client.get(reverse('createround', args=(self.tournament.pk,)))
+        self.assertRedirects(response, reverse('admin:index'))
+        job = RoundJob.objects.get()
+
+        data = self.client.get(reverse('roundjob', args=(job.pk,))).json()
+        self.assertEqual(data['status'], 'done')
+        self.assertFalse(data['pending'])
+        self.assertEqual(data['round'], 1)
+
+        # unknown jobs are not found
+        response = self.client.get(reverse('roundjob', args=(job.pk + 1,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class SimulationTest(TestCase):
+    def test_cross_check(self):
+        """
+        The in-memory simulation creates the same rounds and scores as the database.
+        """
+        tournament = Tournament.objects.create(name='Test tournament')
+        teams = [Team.objects.create(name='Team %d' % i) for i in range(7)]
+        tables = [Table.objects.create(name='Table %d' % i, priority=10*i) for i in range(4)]
+        simulated = SimulatedTournament([team.pk for team in teams], [(table.pk, table.priority) for table in tables], list(range(7)), 0.5, 0.3, numpy.random.default_rng(0))
+
+        for number in range(4):
+            state = random.getstate()
+            pairs, pairs_to_tables = simulated.create_round()
+            random.setstate(state)
+            results = simulated.play_round(pairs, pairs_to_tables)
+
+            round, success = tournament.create_round()
+            self.assertEqual(
+                set((frozenset(team.pk for team in match.teams.all()), match.table_id) for match in round.match_set.all()),
+                set((frozenset(pair), pairs_to_tables.get(pair)) for pair in pairs)
+            )
+            for match in round.match_set.filter(type=NORMAL):
+                pair = next(pair for pair in pairs if set(pair) == set(team.pk for team in match.teams.all()))
+                for team_result in match.teamresult_set.all():
+                    team_result.score = results[pair][pair.index(team_result.team_id)]
+                    team_result.save()
+
+            scoreboard = tournament.team_scoreboard()
+            self.assertEqual([scoreboard[team].to_int() for team in teams], simulated.scores.tolist())
+
+    @override_settings(PAIRING_WINDOW=1)
+    def test_window(self):
+        """
+        The in-memory simulation pairs teams with the same window as Tournament.plan_round.
+        """
+        simulated = SimulatedTournament([1, 2], [], [0, 1], 0.5, 0.3, numpy.random.default_rng(0))
+        self.assertEqual(simulated.window, 1)
+        simulated = SimulatedTournament([1, 2], [], [0, 1], 0.5, 0.3, numpy.random.default_rng(0), window=None)
+        self.assertIsNone(simulated.window)
+
+    def test_sweep_seeds(self):
+        """
+        The chunks of a parameter sweep (see simulate.py) are reproducible from their seeds.
+        """
+        import simulate
+        seeds = numpy.random.SeedSequence(0).spawn(2)
+        stats, team_tables = simulate.sweep_chunk(0.5, 0.3, 8, 6, 3, 4, seeds[0])
+        self.assertEqual(sum(stats.values()), 4)
+        self.assertEqual(simulate.sweep_chunk(0.5, 0.3, 8, 6, 3, 4, seeds[0]), (stats, team_tables))
+
+
+class StandingsTest(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name='Test tournament')
+        for i in range(7):
+            team = Team.objects.create(name='Team %d' % i)
+            for j in range(2):
+                Player.objects.create(name='Player %d %d' % (i, j), team=team)
+        for i in range(4):
+            Table.objects.create(name='Table %d' % i)
+
+    def play_round(self, round, seed):
+        rng = random.Random(seed)
+        for match in round.match_set.filter(type=NORMAL):
+            for team_result in match.teamresult_set.all():
+                team_result.score = rng.randint(0, 4)
+                team_result.save()
+            for player_result in match.playerresult_set.all():
+                player_result.score = rng.randint(0, 2)
+                player_result.save()
+
+    def assertStandings(self):
+        for public in (False, True):
+            self.assertEqual(self.tournament.team_scoreboard(public=public), self.tournament.computed_team_scoreboard(public=public))
+            self.assertEqual(self.tournament.player_scoreboard(public=public), self.tournament.computed_player_scoreboard(public=public))
+
+    def create_round(self):
+        # new rounds are added to the standings without reading previous results
+        with mock.patch.object(TeamStanding, 'refresh', side_effect=AssertionError), mock.patch.object(PlayerStanding, 'refresh', side_effect=AssertionError):
+            round, success = self.tournament.create_round()
+        return round
+
+    def test_standings(self):
+        for i in range(4):
+            round = self.create_round()
+            self.assertStandings()
+            self.play_round(round, i)
+            self.assertStandings()
+
+        with self.assertNumQueries(1):
+            self.tournament.team_scoreboard(public=True)
+        with self.assertNumQueries(1):
+            self.tournament.player_scoreboard(public=True)
+
+        # hide a round, and change the bye score
+        round = Round.objects.get(number=2)
+        round.visibility = HIDE_RESULTS
+        round.save()
+        self.assertStandings()
+        self.tournament.bye_score = 2
+        self.tournament.save()
+        self.assertStandings()
+
+        # new rounds with hidden results, after the change of the bye score
+        self.tournament.default_round_visibility = HIDE_RESULTS
+        self.tournament.save()
+        self.create_round()
+        self.assertStandings()
+
+        # change the type of a match, change a player, and delete a result and a match
+        match = round.match_set.filter(type=NORMAL).first()
+        match.type = BYE
+        match.save()
+        self.assertStandings()
+        player_result = match.playerresult_set.first()
+        player_result.player = Player.objects.exclude(team__in=match.teams.all()).first()
+        player_result.save()
+        self.assertStandings()
+        match.teamresult_set.first().delete()
+        self.assertStandings()
+        Match.objects.filter(type=NORMAL).first().delete()
+        self.assertStandings()
+
+        # deactivate a team, add a phantom score, and delete a round
+        Team.objects.filter(pk=Team.objects.first().pk).update(active=False)
+        Player.objects.filter(pk=Player.objects.last().pk).update(phantom_score=1)
+        self.assertStandings()
+        Round.objects.get(number=3).delete()
+        self.assertStandings()
+
+        TeamStanding.objects.all().delete()
+        PlayerStanding.objects.all().delete()
+        TeamStanding.rebuild(self.tournament)
+        PlayerStanding.rebuild(self.tournament)
+        self.assertStandings()
+
+
+class AggregatedScoreboardTest(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name='Test tournament', bye_score=Decimal('2.5'))
+        for i in range(9):
+            team = Team.objects.create(name='Team %d' % i)
+            for j in range(2):
+                Player.objects.create(name='Player %d %d' % (i, j), team=team)
+        for i in range(5):
+            Table.objects.create(name='Table %d' % i)
+
+    def assertScoreboards(self):
+        for public in (False, True):
+            for fill_results in (False, True):
+                self.assertEqual(
+                    self.tournament.aggregated_team_scoreboard(public=public, fill_results=fill_results),
+                    self.tournament.computed_team_scoreboard(public=public, fill_results=fill_results)
+                )
+            self.assertEqual(self.tournament.aggregated_player_scoreboard(public=public), self.tournament.computed_player_scoreboard(public=public))
+
+    def test_random_tournaments(self):
+        for seed in range(3):
+            rng = random.Random(seed)
+            for i in range(4):
+                round, success = self.tournament.create_round()
+                round.visibility = rng.choice([SHOW, SHOW, HIDE, HIDE_RESULTS])
+                round.save()
+
+                # random results, with draws and pending results
+                for team_result in TeamResult.objects.filter(match__round=round, match__type=NORMAL):
+                    team_result.score = rng.choice([None, 0, 1, 1, 2, Decimal('1.5')])
+                    team_result.save()
+                for player_result in PlayerResult.objects.filter(match__round=round):
+                    player_result.score = rng.choice([None, 0, 1, Decimal('0.5')])
+                    player_result.save()
+                self.assertScoreboards()
+
+            # invalid matches: a normal match with one team, and one with three teams
+            matches = list(Match.objects.filter(round__tournament=self.tournament, type=NORMAL))
+            rng.choice(matches).teamresult_set.first().delete()
+            match = rng.choice(matches)
+            TeamResult.objects.create(match=match, team=Team.objects.exclude(match=match).first(), score=1)
+            Team.objects.filter(pk=rng.choice(Team.objects.all()).pk).update(active=False)
+            self.assertScoreboards()
+
+            Round.objects.filter(tournament=self.tournament).delete()
+            Team.objects.update(active=True)
+
+        # the scores used to create rounds are summed by the database
+        with self.assertNumQueries(2):
+            self.tournament.team_scoreboard(fill_results=True)
+
+
+class RoundSnapshotTest(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name='Test tournament')
+        for i in range(7):
+            Team.objects.create(name='Team %d' % i)
+        for i in range(4):
+            Table.objects.create(name='Table %d' % i)
+
+    def play_round(self, round, seed):
+        rng = random.Random(seed)
+        for team_result in TeamResult.objects.filter(match__round=round, match__type=NORMAL):
+            team_result.score = rng.randint(0, 2)
+            team_result.save()
+
+    def assertSnapshots(self, public=False):
+        """
+        Check the snapshots against the scores of the rounds, summed up to each round.
+        """
+        rounds = list(self.tournament.round_set.order_by('number'))
+        complete = True
+        scores = Counter()
+        for round in rounds:
+            complete = complete and round.completed_matches() == round.num_matches()
+            standings = self.tournament.snapshot_standings(round.number, public=public)
+            if not complete:
+                self.assertIsNone(standings)
+                continue
+
+            if not public or round.show_results():
+                scores = scores + sum((match.team_scoreboard() for match in round.match_set.all()), Counter())
+            self.assertEqual({team_id: score for (team_id, (score, rank)) in standings.items()}, {team.pk: score for (team, score) in scores.items()})
+            for (score, rank) in standings.values():
+                self.assertEqual(rank, 1 + sum(1 for (other, other_rank) in standings.values() if (other.primary, other.secondary) > (score.primary, score.secondary)))
+
+    def test_snapshots(self):
+        for i in range(3):
+            round, success = self.tournament.create_round()
+            self.assertSnapshots()
+            self.play_round(round, i)
+            self.assertSnapshots()
+        self.assertEqual(RoundSnapshot.objects.count(), 6)
+
+        # a pending result removes the snapshots of the following rounds
+        team_result = TeamResult.objects.filter(match__round__number=2, match__type=NORMAL).first()
+        team_result.score = None
+        team_result.save()
+        self.assertSnapshots()
+        self.assertEqual(RoundSnapshot.objects.count(), 2)
+        team_result.score = 2
+        team_result.save()
+        self.assertSnapshots()
+
+        # hide a round, change the bye score, and delete a round
+        round = Round.objects.get(number=2)
+        round.visibility = HIDE_RESULTS
+        round.save()
+        self.assertSnapshots(public=True)
+        self.tournament.bye_score = 2
+        self.tournament.save()
+        self.assertSnapshots()
+        round.delete()
+        self.assertSnapshots()
+        self.assertSnapshots(public=True)
+
+        rounds, progression = self.tournament.team_progression()
+        self.assertEqual(rounds, [1, 3])
+        self.assertEqual(progression[team_result.team_id][1], self.tournament.snapshot_standings(3)[team_result.team_id])
+
+        response = self.client.get(reverse('progression'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['rows']), 7)
+
+
+class TiebreakersTest(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name='Test tournament', tiebreakers='buchholz,median-buchholz,sonneborn-berger,head-to-head')
+        for i in range(8):
+            Team.objects.create(name='Team %d' % i)
+        for i in range(4):
+            Table.objects.create(name='Table %d' % i)
+
+    def test_compute_tiebreakers(self):
+        # 1 beat 2 and drew with 3, 2 beat 3, 4 beat 3
+        scores = {1: (15, 0), 2: (10, 0), 3: (5, 0), 4: (10, 0)}
+        opponents = {1: [(2, 10), (3, 5)], 2: [(1, 0), (3, 10)], 3: [(1, 5), (2, 0), (4, 0)], 4: [(3, 10)]}
+        values = tiebreakers.compute_tiebreakers(tiebreakers.TIEBREAKERS, scores, opponents)
+        self.assertEqual(values[1], (15, 15, 12, 0))
+        self.assertEqual(values[2], (20, 20, 5, 0))
+        self.assertEqual(values[3], (35, 10, 7, 0))
+        self.assertEqual(values[4], (5, 5, 5, 0))
+        self.assertEqual(tiebreakers.compute_tiebreakers([tiebreakers.HEAD_TO_HEAD], scores, opponents)[2], (0,))
+
+        with self.assertRaises(ValueError):
+            tiebreakers.parse_tiebreakers('buchholz, coin-toss')
+
+    def test_scoreboard(self):
+        rng = random.Random(0)
+        for i in range(4):
+            round, success = self.tournament.create_round()
+            for team_result in TeamResult.objects.filter(match__round=round, match__type=NORMAL):
+                team_result.score = rng.randint(0, 2)
+                team_result.save()
+
+        scoreboard = self.tournament.team_scoreboard(public=True)
+        for (team, score) in scoreboard.items():
+            # opponents looked up one team at a time
+            opponents = [
+                other_result.team for team_result in TeamResult.objects.filter(team=team, match__type=NORMAL)
+                for other_result in team_result.match.teamresult_set.exclude(team=team)
+            ]
+            self.assertEqual(score.tiebreaker_scores[0], sum(scoreboard[opponent].primary for opponent in opponents))
+
+        # the tiebreakers are computed with one additional query
+        with self.assertNumQueries(2):
+            self.tournament.team_scoreboard(public=True)
+
+        # the scoreboard is sorted by score and then by tiebreakers
+        ranked = views.sorted_scoreboard(scoreboard)
+        for ((team, score, rank), (next_team, next_score, next_rank)) in zip(ranked, ranked[1:]):
+            self.assertGreaterEqual(score.tenths(), next_score.tenths())
+            self.assertEqual(rank == next_rank, score.tenths() == next_score.tenths())
+
+        # tiebreakers are included in the integer scores used to create rounds
+        score = ranked[0][1]
+        self.assertEqual(score.to_int() // TIEBREAKER_SCALE ** 4, 100 * score.tenths_primary + score.tenths_secondary)
+        self.assertEqual(score.to_int() % TIEBREAKER_SCALE, score.tiebreakers[-1])
+        round, success = self.tournament.create_round()
+        self.assertTrue(success)
+
+
+class RoundRenderingTest(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name='Test tournament')
+        for i in range(4):
+            Table.objects.create(name='Table %d' % i)
+
+    def create_rounds(self, num_teams, num_rounds):
+        Round.objects.all().delete()
+        for i in range(Team.objects.count(), num_teams):
+            team = Team.objects.create(name='Team %d' % i)
+            Player.objects.create(name='Player %d' % i, team=team)
+        for i in range(num_rounds):
+            round, success = self.tournament.create_round()
+            for team_result in TeamResult.objects.filter(match__round=round, match__type=NORMAL)[1:]:
+                team_result.score = 1
+                team_result.save()
+
+    def index_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_accessors(self):
+        self.create_rounds(7, 2)
+        rounds = list(Round.objects.filter(tournament=self.tournament).with_matches())
+        with self.assertNumQueries(0):
+            for round in rounds:
+                round.num_matches()
+                round.completed_matches()
+                for match in round.valid_matches():
+                    str(match)
+                    match.result()
+
+        # without prefetching, the same values are returned
+        for round in rounds:
+            fresh = Round.objects.get(pk=round.pk)
+            self.assertEqual(round.completed_matches(), fresh.completed_matches())
+            self.assertEqual([(str(match), match.result()) for match in round.valid_matches()], [(str(match), match.result()) for match in fresh.valid_matches()])
+
+    def test_index_queries(self):
+        self.create_rounds(6, 3)
+        num_queries = self.index_queries()
+        self.create_rounds(20, 3)
+        self.assertEqual(self.index_queries(), num_queries)
+
+    @override_settings(PUBLIC_PAGE_ROUNDS=2, CURRENT_TOURNAMENT_CACHE=True)
+    def test_older_rounds(self):
+        self.create_rounds(6, 4)
+        rounds = list(Round.objects.order_by('-number'))
+        cache.clear()
+        response = self.client.get(reverse('index'))
+
+        # only the latest rounds are shown, and older rounds are loaded on demand
+        self.assertContains(response, 'Risultato', count=2)
+        for round in rounds[2:]:
+            self.assertContains(response, reverse('round', args=(round.pk,)))
+        fragment = self.client.get(reverse('round', args=(rounds[3].pk,)))
+        self.assertContains(fragment, 'Turno 1')
+        self.assertContains(fragment, 'Risultato', count=1)
+
+        # the fragment is cached (only the round is loaded)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('round', args=(rounds[3].pk,))).content, fragment.content)
+
+        # the same fragment is shown in the public page when the round is one of the latest ones
+        with override_settings(PUBLIC_PAGE_ROUNDS=4):
+            cache.clear()
+            self.assertIn(fragment.content.decode().strip(), self.client.get(reverse('index')).content.decode())
+
+        # hidden rounds are not shown
+        Round.objects.filter(pk=rounds[3].pk).update(visibility=HIDE)
+        self.assertEqual(self.client.get(reverse('round', args=(rounds[3].pk,))).status_code, 404)
+
+
+# the tests run in a single process
+@override_settings(CURRENT_TOURNAMENT_CACHE=True)
+class PublicPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tournament = Tournament.objects.create(name='Test tournament')
+        for i in range(6):
+            team = Team.objects.create(name='Team %d' % i)
+            Player.objects.create(name='Player %d' % i, team=team)
+        for i in range(3):
+            Table.objects.create(name='Table %d' % i)
+        self.tournament.create_round()
+
+    def version(self):
+        return Tournament.objects.get(pk=self.tournament.pk).version
+
+    def test_versions(self):
+        # every write increments the version
+        version = self.version()
+        team_result = TeamResult.objects.filter(match__type=NORMAL).first()
+        team_result.score = 2
+        team_result.save()
+        self.assertGreater(self.version(), version)
+
+        for obj in (team_result.match, team_result.match.round, Team.objects.first(), Player.objects.first(), Table.objects.first(), self.tournament):
+            version = self.version()
+            obj.save()
+            self.assertGreater(self.version(), version)
+
+        version = self.version()
+        Round.objects.get().delete()
+        self.assertGreater(self.version(), version)
+
+        # saving a tournament loaded before other writes does not restore an old version
+        tournament = Tournament.objects.get(pk=self.tournament.pk)
+        Team.objects.first().save()
+        version = self.version()
+        tournament.save()
+        self.assertEqual(self.version(), version + 1)
+
+    def test_page_cache(self):
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Team 1')
+
+        # no queries (the current tournament is cached too, see CurrentTournamentMiddleware)
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(reverse('index'))
+        self.assertEqual(cached_response.content, response.content)
+
+        # changes appear on the next request
+        team = Team.objects.get(name='Team 1')
+        team.name = 'Renamed team'
+        team.save()
+        self.assertContains(self.client.get(reverse('index')), 'Renamed team')
+
+        for (team_result, score) in zip(TeamResult.objects.filter(match__type=NORMAL)[:2], (3, 1)):
+            team_result.score = score
+            team_result.save()
+        self.assertContains(self.client.get(reverse('index')), '3.0')
+
+        with override_settings(PUBLIC_PAGE_CACHE=False):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('index'))
+            self.assertGreater(len(queries), 1)
+
+    def test_conditional_requests(self):
+        for name in ('index', 'tables'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('no-cache', response['Cache-Control'])
+
+            # no queries
+            with self.assertNumQueries(0):
+                not_modified = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+            not_modified = self.client.get(reverse(name), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(not_modified.status_code, 304)
+
+            # after a write, the page is sent again with a new validator
+            Table.objects.first().save()
+            modified = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(modified.status_code, 200)
+            self.assertNotEqual(modified['ETag'], response['ETag'])
+
+
+# the tests run in a single process
+@override_settings(CURRENT_TOURNAMENT_CACHE=True)
+class CurrentTournamentTest(TestCase):
+    def setUp(self):
+        self.first = Tournament.objects.create(name='First tournament')
+        self.second = Tournament.objects.create(name='Second tournament')
+
+    def test_current_tournament(self):
+        # the latest tournament, unless one is selected
+        self.assertEqual(Tournament.current(), self.second)
+        self.first.is_current = True
+        self.first.save()
+        self.assertEqual(Tournament.current(), self.first)
+        self.second.is_current = True
+        self.second.save()
+        self.assertEqual(list(Tournament.objects.filter(is_current=True)), [self.second])
+
+        # cached until a tournament changes
+        self.assertEqual(middleware.current_tournament(), self.second)
+        version = Tournament.objects.get(pk=self.second.pk).version
+        with self.assertNumQueries(0):
+            self.assertEqual(middleware.current_tournament().version, version)
+        self.first.is_current = True
+        self.first.save()
+        self.assertEqual(middleware.current_tournament(), self.first)
+        self.first.delete()
+        self.assertEqual(middleware.current_tournament(), self.second)
+
+        # results change the version
+        Team.objects.create(name='Team')
+        self.assertEqual(middleware.current_tournament().version, Tournament.objects.get(pk=self.second.pk).version)
+
+        # views that do not use the current tournament do not load it
+        with self.assertNumQueries(0):
+            self.client.get('/static/style.css')
+
+    def test_copies(self):
+        """
+        Every request gets its own instance of the cached tournament.
+        """
+        first = middleware.current_tournament()
+        with self.assertNumQueries(0):
+            second = middleware.current_tournament()
+        self.assertEqual(first, second)
+        self.assertIsNot(first._state, second._state)
+        self.assertFalse(second._state.adding)
+        self.assertEqual(second._state.db, 'default')
+        second.name = 'Renamed'
+        self.assertEqual(middleware.current_tournament().name, 'Second tournament')
+
+    def test_process_local_cache(self):
+        """
+        With a cache backend of a single process, changes made by other processes (which do not reach the cache)
+        are seen at the next request.
+        """
+        with override_settings(CURRENT_TOURNAMENT_CACHE=None):
+            self.assertEqual(middleware.current_tournament(), self.second)
+            # as if another process changed the current tournament
+            Tournament.objects.filter(pk=self.first.pk).update(is_current=True)
+            self.assertEqual(middleware.current_tournament(), self.first)
+
+
+class FragmentCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tournament = Tournament.objects.create(name='Test tournament', shown_players=None)
+        for i in range(6):
+            team = Team.objects.create(name='Team %d' % i)
+            Player.objects.create(name='Player %d' % i, team=team)
+        for i in range(3):
+            Table.objects.create(name='Table %d' % i)
+        for i in range(2):
+            round, success = self.tournament.create_round()
+            for (k, team_result) in enumerate(TeamResult.objects.filter(match__round=round)):
+                team_result.score = k % 2
+                team_result.save()
+
+    def stats(self):
+        return {name: (hits, misses) for (name, hits, misses) in public_cache.fragment_stats()}
+
+    def get_index(self):
+        before = self.stats()
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        after = self.stats()
+        stats = {name: (hits - before.get(name, (0, 0))[0], misses - before.get(name, (0, 0))[1]) for (name, (hits, misses)) in after.items()}
+        return response, {name: value for (name, value) in stats.items() if value != (0, 0)}
+
+    def test_fragments(self):
+        response, stats = self.get_index()
+        self.assertEqual(stats['round'], (0, 2))
+
+        # a new result only renders the current round and the scoreboards again
+        team_result = TeamResult.objects.filter(match__round__number=2).first()
+        team_result.score = 2
+        team_result.save()
+        new_response, stats = self.get_index()
+        self.assertEqual(stats, {'round': (1, 1), 'team-scoreboard': (0, 1), 'player-scoreboard': (1, 0), 'teams': (1, 0)})
+        self.assertNotEqual(new_response.content, response.content)
+
+        # the result is the same as without fragments
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('index')).content, new_response.content)
+
+        # renaming a team renders all rounds again
+        team = team_result.team
+        team.name = 'Renamed team'
+        team.save()
+        response, stats = self.get_index()
+        self.assertEqual(stats['round'], (0, 2))
+        self.assertContains(response, 'Renamed team')
+
+
+class ApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tournament = Tournament.objects.create(name='Test tournament', shown_players=3)
+        for i in range(6):
+            team = Team.objects.create(name='Team %d' % i)
+            Player.objects.create(name='Player %d' % i, team=team)
+        for i in range(3):
+            Table.objects.create(name='Table %d' % i)
+        for i in range(2):
+            round, success = self.tournament.create_round()
+            for (k, team_result) in enumerate(TeamResult.objects.filter(match__round=round)):
+                team_result.score = k % 2
+                team_result.save()
+
+    def get(self, name, **params):
+        return self.client.get(reverse(name), params).json()
+
+    def test_scoreboards(self):
+        tournament = Tournament.objects.get(pk=self.tournament.pk)
+        data = self.get('api-teams')
+        self.assertEqual(data['version'], tournament.version)
+        expected = views.sorted_scoreboard(tournament.team_scoreboard(public=True))
+        self.assertEqual([row[:3] for row in data['scoreboard']], [[team.pk, rank, float(score.primary)] for (team, score, rank) in expected])
+        self.assertEqual(data['teams'][str(expected[0][0].pk)], expected[0][0].name)
+
+        # only the shown players
+        data = self.get('api-players')
+        self.assertEqual(len(data['scoreboard']), 3)
+        player_id = str(data['scoreboard'][0][0])
+        self.assertEqual(data['players'][player_id][0], Player.objects.get(pk=player_id).name)
+
+    def test_rounds(self):
+        data = self.get('api-rounds')
+        self.assertEqual([round['number'] for round in data['rounds']], [2, 1])
+        self.assertEqual(data['round_ids'], [round['id'] for round in data['rounds']])
+        for match in data['rounds'][0]['matches']:
+            for team_id in match[0]:
+                self.assertIn(str(team_id), data['teams'])
+            if match[1] is not None:
+                self.assertIn(str(match[1]), data['tables'])
+        self.assertTrue(any(match[2] is not None for match in data['rounds'][0]['matches']))
+
+        # nothing changed
+        version = data['version']
+        self.assertEqual(self.get('api-rounds', since=version)['rounds'], [])
+
+        # only the changed round is returned
+        team_result = TeamResult.objects.filter(match__round__number=1, match__type=NORMAL).first()
+        team_result.score = 2
+        team_result.save()
+        data = self.get('api-rounds', since=version)
+        self.assertEqual([round['number'] for round in data['rounds']], [1])
+        self.assertIn(2.0, [score for match in data['rounds'][0]['matches'] for score in match[2] or []])
+
+        # new rounds are returned
+        version = data['version']
+        self.tournament.create_round()
+        data = self.get('api-rounds', since=version)
+        self.assertEqual([round['number'] for round in data['rounds']], [3])
+        self.assertEqual(len(data['rounds'][0]['matches']), 3)
+        self.assertEqual(data['round_ids'], list(Round.objects.order_by('-number').values_list('pk', flat=True)))
+        Round.objects.get(number=3).delete()
+
+        # hidden results and hidden rounds
+        Round.objects.filter(number=1).update(visibility=HIDE_RESULTS)
+        Round.objects.get(number=1).save()
+        data = self.get('api-rounds')
+        self.assertTrue(all(match[2] is None for match in data['rounds'][1]['matches']))
+        round = Round.objects.get(number=2)
+        round.visibility = HIDE
+        round.save()
+        data = self.get('api-rounds')
+        self.assertEqual([round['number'] for round in data['rounds']], [1])
+        self.assertEqual(len(data['round_ids']), 1)
+
+
+class LiveFeedTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.tournament = Tournament.objects.create(name='Test tournament')
+        for i in range(4):
+            Team.objects.create(name='Team %d' % i)
+        for i in range(2):
+            Table.objects.create(name='Table %d' % i)
+
+    def events(self, last_id):
+        return [(event_type, data) for (event_id, event_type, data) in live.feed.wait(last_id, timeout=0)]
+
+    def test_feed(self):
+        feed = live.Feed(name='test-feed', size=2)
+        first_id = feed.last_id
+        self.assertEqual(feed.wait(first_id, timeout=0), [])
+        for i in range(3):
+            feed.publish('test', {'tournament': 1, 'i': i})
+        self.assertEqual(feed.wait(first_id + 1, timeout=0), [(first_id + 2, 'test', {'tournament': 1, 'i': 1}), (first_id + 3, 'test', {'tournament': 1, 'i': 2})])
+
+        # missed events, or unknown events
+        self.assertIsNone(feed.wait(first_id, timeout=0))
+        self.assertIsNone(feed.wait(first_id + 5, timeout=0))
+
+        # events published by another process are received through the cache
+        other_feed = live.Feed(name='test-feed', size=2)
+        feed.publish('test', {'tournament': 1, 'i': 3})
+        self.assertEqual(other_feed.wait(first_id + 3, timeout=0), [(first_id + 4, 'test', {'tournament': 1, 'i': 3})])
+
+        # ids are not reused if the cache loses the feed
+        cache.clear()
+        self.assertGreater(feed.last_id, first_id + 4)
+        self.assertIsNone(feed.wait(first_id + 4, timeout=0))
+
+    @override_settings(LIVE_FEED_POLL_INTERVAL=0.01)
+    def test_missing_event(self):
+        """
+        An event which is not in the cache is considered lost.
+        """
+        feed = live.Feed(name='test-feed')
+        last_id = feed.last_id
+        feed.publish('test', {'tournament': 1})
+        feed.publish('test', {'tournament': 1})
+        cache.delete(feed.event_key(last_id + 1))
+        self.assertIsNone(feed.wait(last_id, timeout=0))
+
+    def test_events(self):
+        first_id = last_id = live.feed.last_id
+        round, success = self.tournament.create_round()
+        events = self.events(last_id)
+        # the standings did not change (they were published when the teams were created)
+        self.assertEqual([event_type for (event_type, data) in events], ['round'])
+        self.assertEqual(events[0][1]['number'], 1)
+
+        # one event for the result of a match, and the changed rows of the standings
+        last_id = live.feed.last_id
+        match = Match.objects.filter(type=NORMAL).first()
+        with transaction.atomic():
+            for (team_result, score) in zip(match.teamresult_set.order_by('team__name'), (3, 1)):
+                team_result.score = score
+                team_result.save()
+        events = self.events(last_id)
+        self.assertEqual([event_type for (event_type, data) in events], ['result', 'standings'])
+        self.assertEqual(events[0][1]['scores'], [3.0, 1.0])
+        rows = {row[0]: row for row in events[1][1]['rows']}
+        self.assertEqual([rows[team_id][2] for team_id in events[0][1]['teams']], [1.0, 0.0])
+
+        # changes discarded by a rollback are not published
+        last_id = live.feed.last_id
+        try:
+            with transaction.atomic():
+                team_result.score = 2
+                team_result.save()
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(self.events(last_id), [])
+
+        # results of rounds with hidden results are not published
+        round.visibility = HIDE_RESULTS
+        round.save()
+        last_id = live.feed.last_id
+        team_result.score = 2
+        team_result.save()
+        self.assertEqual([event_type for (event_type, data) in self.events(last_id)], [])
+
+        # stream of server-sent events
+        with override_settings(LIVE_FEED_MAX_DURATION=0):
+            response = self.client.get(reverse('live'), {'last': first_id})
+            content = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('event: round\n', content)
+        self.assertIn('event: result\n', content)
+
+
+class StaticSiteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tournament = Tournament.objects.create(name='Test tournament')
+        for i in range(4):
+            team = Team.objects.create(name='Team %d' % i)
+            Player.objects.create(name='Player %d' % i, team=team)
+        for i in range(2):
+            Table.objects.create(name='Table %d' % i)
+        self.tournament.create_round()
+
+    def test_publish(self):
+        with tempfile.TemporaryDirectory() as parent:
+            root = os.path.join(parent, 'site')
+            directory = static_site.publish(root)
+            self.assertEqual(os.path.realpath(root), os.path.realpath(directory))
+
+            # the same content as the dynamic site, with compressed variants
+            for (path, filename) in static_site.PAGES:
+                with open(os.path.join(root, filename), 'rb') as f:
+                    content = f.read()
+                self.assertEqual(content, self.client.get(path).content)
+                with gzip.open(os.path.join(root, filename + '.gz')) as f:
+                    self.assertEqual(f.read(), content)
+
+            # the link is replaced, and the previous snapshot is removed
+            team = Team.objects.get(name='Team 1')
+            team.name = 'Renamed team'
+            team.save()
+            new_directory = static_site.publish(root)
+            self.assertFalse(os.path.exists(directory))
+            with open(os.path.join(root, 'index.html')) as f:
+                self.assertIn('Renamed team', f.read())
+            self.assertEqual(sorted(os.listdir(parent)), sorted(['site', 'site.lock', os.path.basename(new_directory)]))
+
+    def test_publish_order(self):
+        """
+        A snapshot does not replace one of a newer version, and snapshots left by interrupted publications are removed.
+        """
+        with tempfile.TemporaryDirectory() as parent:
+            root = os.path.join(parent, 'site')
+            directory = static_site.publish(root)
+            tournament = Tournament.objects.get(pk=self.tournament.pk)
+            self.assertEqual(static_site.snapshot_info(directory), (tournament.pk, tournament.version))
+
+            # as if another process had published a newer version
+            with open(os.path.join(directory, static_site.SNAPSHOT_INFO), 'w') as f:
+                f.write('{"tournament": %d, "version": %d}' % (tournament.pk, tournament.version + 1))
+            self.assertEqual(static_site.publish(root), directory)
+
+            os.mkdir(os.path.join(parent, 'site-interrup'))
+            os.mkdir(os.path.join(parent, 'site-unrelated-directory'))
+            tournament.save()
+            new_directory = static_site.publish(root)
+            self.assertNotEqual(new_directory, directory)
+            self.assertEqual(sorted(os.listdir(parent)), sorted(['site', 'site.lock', 'site-unrelated-directory', os.path.basename(new_directory)]))
+
+    def test_debouncer(self):
+        calls = []
+        done = threading.Event()
+        debouncer = static_site.Debouncer(lambda: (calls.append(1), done.set()), delay=0.05, max_delay=1)
+        for i in range(5):
+            debouncer.schedule()
+        self.assertTrue(done.wait(2))
+        self.assertEqual(len(calls), 1)
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_operations(self):
+        self.cache.set('a', {'value': 1})
+        self.assertEqual(self.cache.get('a'), {'value': 1})
+        self.assertIsNone(self.cache.get('b'))
+        self.assertFalse(self.cache.add('a', 2))
+        self.assertTrue(self.cache.add('b', 2))
+        self.assertEqual(self.cache.incr('b', 3), 5)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'a': {'value': 1}, 'b': 5})
+        self.cache.delete('a')
+        self.assertFalse(self.cache.has_key('a'))
+
+        # expired values
+        self.cache.set('c', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('c'))
+        self.assertTrue(self.cache.add('c', 2))
+
+        # values are shared with other processes (here, another connection to the same file)
+        other = SQLiteCache(self.path, {})
+        self.assertEqual(other.get('b'), 5)
+        other.set('b', 6)
+        self.assertEqual(self.cache.get('b'), 6)
+        thread = threading.Thread(target=lambda: other.set('d', 7))
+        thread.start()
+        thread.join()
+        self.assertEqual(self.cache.get('d'), 7)
+
+        self.cache.clear()
+        self.assertIsNone(other.get('b'))
+
+    def test_lru(self):
+        for i in range(10):
+            self.cache.set(i, i)
+        # values used recently are kept
+        self.cache.access_resolution = 0
+        time.sleep(0.01)
+        self.cache.get(0)
+        self.cache.set(10, 10)
+        self.assertEqual(self.cache.get(0), 0)
+        self.assertIsNone(self.cache.get(1))
+        self.assertLessEqual(len(self.cache.get_many(range(11))), 10)
+
+    def test_public_page(self):
+        Tournament.objects.create(name='Test tournament')
+        with override_settings(CACHES={'default': {'BACKEND': 'tournament.sqlite_cache.SQLiteCache', 'LOCATION': self.path, 'TIMEOUT': None}}):
+            response = self.client.get(reverse('index'))
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(reverse('index')).content, response.content)
+
+
+class TeamHistoryTest(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name='Test tournament')
+        for i in range(7):
+            Team.objects.create(name='Team %d' % i)
+        for i in range(4):
+            Table.objects.create(name='Table %d' % i)
+
+    def expected_history(self):
+        """
+        Previous pairs, byes and tables, computed from all matches.
+        """
+        matches = Match.objects.filter(round__tournament=self.tournament)
+        previous_pairs = set(tuple(team.pk for team in match.team_pair()) for match in matches if match.type == NORMAL and match.teams.count() == 2)
+        previous_byes = set(match.team_bye().pk for match in matches if match.type == BYE)
+        previous_tables = {}
+        for match in matches:
+            if match.table is not None:
+                for team in match.teams.all():
+                    previous_tables.setdefault(match.table.pk, set()).add(team.pk)
+        return previous_pairs, previous_byes, previous_tables
+
+    def test_history(self):
+        for i in range(3):
+            # new rounds are appended to the histories, without reading previous matches
+            with mock.patch.object(TeamHistory, 'refresh', side_effect=AssertionError):
+                self.tournament.create_round()
+            with self.assertNumQueries(1):
+                history = TeamHistory.load(self.tournament)
+            self.assertEqual(history, self.expected_history())
+
+        # change the table of a match
+        match = Match.objects.filter(type=NORMAL).first()
+        match.table = Table.objects.exclude(pk=match.table.pk).first()
+        match.save()
+        self.assertEqual(TeamHistory.load(self.tournament), self.expected_history())
+
+        # change a team of a match
+        team_result = match.teamresult_set.first()
+        team_result.team = Team.objects.exclude(pk__in=match.teams.all()).first()
+        team_result.save()
+        self.assertEqual(TeamHistory.load(self.tournament), self.expected_history())
+
+        # delete a result, a match, and a round
+        match.teamresult_set.first().delete()
+        self.assertEqual(TeamHistory.load(self.tournament), self.expected_history())
+        Match.objects.filter(type=BYE).first().delete()
+        self.assertEqual(TeamHistory.load(self.tournament), self.expected_history())
+        Round.objects.get(number=2).delete()
+        self.assertEqual(TeamHistory.load(self.tournament), self.expected_history())
+
+        TeamHistory.rebuild(self.tournament)
+        self.assertEqual(TeamHistory.load(self.tournament), self.expected_history())
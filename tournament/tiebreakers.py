@@ -0,0 +1,85 @@
+"""
+Tiebreakers for the team scoreboard, computed from an index of the opponents of every team
+(see Tournament.opponent_index), in linear time in the number of matches.
+
+All scores are integer numbers of tenths (see Score).
+"""
+
+BUCHHOLZ = 'buchholz'
+MEDIAN_BUCHHOLZ = 'median-buchholz'
+SONNEBORN_BERGER = 'sonneborn-berger'
+HEAD_TO_HEAD = 'head-to-head'
+
+TIEBREAKERS = (BUCHHOLZ, MEDIAN_BUCHHOLZ, SONNEBORN_BERGER, HEAD_TO_HEAD)
+
+
+def parse_tiebreakers(s):
+    """
+    Parse a comma-separated list of tiebreakers, and return it as a list.
+    Raise ValueError if a tiebreaker is unknown.
+    """
+    names = [name.strip().lower() for name in (s or '').split(',') if name.strip()]
+    for name in names:
+        if name not in TIEBREAKERS:
+            raise ValueError('Unknown tiebreaker: %s' % name)
+    return names
+
+
+def buchholz(opponents, primary):
+    """
+    Sum of the primary scores of the opponents.
+    """
+    return sum(primary.get(opponent, 0) for (opponent, result) in opponents)
+
+
+def median_buchholz(opponents, primary):
+    """
+    Sum of the primary scores of the opponents, except the highest and the lowest one
+    (if there are at least three opponents).
+    """
+    scores = [primary.get(opponent, 0) for (opponent, result) in opponents]
+    if len(scores) < 3:
+        return sum(scores)
+    return sum(scores) - max(scores) - min(scores)
+
+
+def sonneborn_berger(opponents, primary):
+    """
+    Sum of the primary scores of the opponents, each weighted by the result against it
+    (full for a victory, half for a draw), rounded down to tenths.
+    """
+    return sum(primary.get(opponent, 0) * result for (opponent, result) in opponents) // 10
+
+
+def head_to_head(opponents, group, team_group):
+    """
+    Sum of the results against the opponents with the same score (and the same previous tiebreakers).
+    """
+    return sum(result for (opponent, result) in opponents if team_group.get(opponent) == group)
+
+
+def compute_tiebreakers(names, scores, opponents):
+    """
+    Compute the given tiebreakers for every team.
+
+    names: list of tiebreakers (see TIEBREAKERS), in order of importance.
+    scores: dictionary team id -> (primary, secondary) score.
+    opponents: dictionary team id -> list of (opponent id, result), where the result is
+        the primary score obtained against that opponent (10 for a victory, 5 for a draw, 0 for a defeat).
+    Return a dictionary team id -> tuple with the value of each tiebreaker.
+    """
+    primary = {team: score[0] for (team, score) in scores.items()}
+    values = {team: () for team in scores}
+
+    for name in names:
+        if name == HEAD_TO_HEAD:
+            # the results only count among teams that are still tied
+            team_group = {team: scores[team] + values[team] for team in scores}
+            for team in scores:
+                values[team] += (head_to_head(opponents.get(team, []), team_group[team], team_group),)
+        else:
+            function = {BUCHHOLZ: buchholz, MEDIAN_BUCHHOLZ: median_buchholz, SONNEBORN_BERGER: sonneborn_berger}[name]
+            for team in scores:
+                values[team] += (function(opponents.get(team, []), primary),)
+
+    return values
@@ -1,4 +1,7 @@
+import time
+
 import django
+from django.conf import settings
 from django.shortcuts import render
 from django.views import View
 from django.views.generic.base import TemplateView
@@ -8,11 +11,17 @@ from django.views.generic.edit import FormView, CreateView
 
 from django.utils.decorators import method_decorator
 
-from django.shortcuts import redirect
+from django.shortcuts import redirect, get_object_or_404
+from django.db.models import prefetch_related_objects
+from django.http import JsonResponse, StreamingHttpResponse, Http404
+from django.urls import reverse
+from django.utils.html import format_html
+from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 
 from .models import *
 from .forms import *
+from . import jobs, cache, live
 
 def sorted_scoreboard(scoreboard):
     """
@@ -24,9 +33,9 @@ def sorted_scoreboard(scoreboard):
         if not entity.active:
             continue
 
-        if score.raw() not in by_score:
-            by_score[score.raw()] = []
-        by_score[score.raw()].append(entity)
+        if score.tenths() not in by_score:
+            by_score[score.tenths()] = []
+        by_score[score.tenths()].append(entity)
 
     res = []
     rank = 1
@@ -40,6 +49,24 @@ def sorted_scoreboard(scoreboard):
     return res
 
 
+def public_team_scoreboard(tournament):
+    """
+    Sorted public team scoreboard of the tournament, cached for its current version.
+    """
+    return cache.get_or_compute(tournament, 'team-scoreboard', lambda: sorted_scoreboard(tournament.team_scoreboard(public=True)))
+
+
+def public_player_scoreboard(tournament):
+    """
+    Sorted public player scoreboard of the tournament, cached for its current version,
+    and truncated to the shown players.
+    """
+    scoreboard = cache.get_or_compute(tournament, 'player-scoreboard', lambda: sorted_scoreboard(tournament.player_scoreboard(public=True)))
+    if tournament.shown_players is not None:
+        scoreboard = scoreboard[:tournament.shown_players]
+    return scoreboard
+
+
 class IndexView(TemplateView):
     template_name = 'index.html'
 
@@ -49,14 +76,214 @@ class IndexView(TemplateView):
         tournament = self.request.current_tournament
         context['tournament'] = tournament
 
-        if tournament is not None:
-            context['team_scoreboard'] = sorted_scoreboard(tournament.team_scoreboard(public=True))
-            context['player_scoreboard'] = sorted_scoreboard(tournament.player_scoreboard(public=True))
-            context['rounds'] = tournament.round_set.exclude(visibility=HIDE).order_by('-number').prefetch_related('match_set__teams', 'match_set__teamresult_set', 'match_set__table')
+        if tournament:
+            context['team_scoreboard'] = public_team_scoreboard(tournament)
+            context['player_scoreboard'] = public_player_scoreboard(tournament)
             context['teams'] = Team.objects.filter(active=True).prefetch_related('player_set')
 
-            if tournament.shown_players is not None:
-                context['player_scoreboard'] = context['player_scoreboard'][:min(tournament.shown_players, len(context['player_scoreboard']))]
+            # inputs of the cached fragments of the page (see the cachefragment template tag)
+            context['team_scoreboard_key'] = cache.digest(tournament.tiebreakers, [(team.pk, team.name, score.tenths(), score.num_matches, rank) for (team, score, rank) in context['team_scoreboard']])
+            context['player_scoreboard_key'] = cache.digest([(player.pk, player.name, player.team.name, score.tenths(), rank) for (player, score, rank) in context['player_scoreboard']])
+            context['teams_key'] = cache.digest([(team.pk, team.name, [(player.name, player.is_captain) for player in team.player_set.all()]) for team in context['teams']])
+
+            # only the latest rounds are shown, and older rounds are loaded on demand (see RoundFragmentView);
+            # matches are loaded only for the shown rounds which are not cached
+            rounds = list(tournament.round_set.exclude(visibility=HIDE).order_by('-number'))
+            num_shown = getattr(settings, 'PUBLIC_PAGE_ROUNDS', 3)
+            context['rounds'] = rounds[:num_shown]
+            context['older_rounds'] = rounds[num_shown:]
+            cached = cache.cached_fragments('round', [(round.pk, round.version, k == 0) for (k, round) in enumerate(context['rounds'])])
+            prefetch_related_objects([round for (k, round) in enumerate(context['rounds']) if (round.pk, round.version, k == 0) not in cached], matches_prefetch())
+
+        return context
+
+
+class RoundFragmentView(TemplateView):
+    """
+    A round of the public page, as an HTML fragment (used to load older rounds on demand, see IndexView).
+    It is cached per round, as in the public page.
+    """
+    template_name = 'round.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        tournament = self.request.current_tournament
+        if not tournament:
+            raise Http404
+        round = get_object_or_404(Round.objects.exclude(visibility=HIDE), pk=kwargs['pk'], tournament=tournament)
+
+        if (round.pk, round.version, False) not in cache.cached_fragments('round', [(round.pk, round.version, False)]):
+            prefetch_related_objects([round], matches_prefetch())
+        context['round'] = round
+        context['first'] = False
+        return context
+
+
+def json_score(value):
+    # scores have one decimal digit
+    return float(value)
+
+
+def round_data(round):
+    """
+    Compact representation of a public round: each match is a list [team ids, table id, scores],
+    where scores is None if the match is not completed or the results of the round are hidden.
+    """
+    return {
+        'id': round.pk,
+        'number': round.number,
+        'version': round.version,
+        'scheduled_time': round.scheduled_time,
+        'matches': [[
+            [team_result.team_id for team_result in match.team_results()],
+            match.table_id,
+            [json_score(team_result.score) for team_result in match.team_results()] if round.show_results() and match.type == NORMAL and match.result() is not None else None,
+        ] for match in round.valid_matches()],
+    }
+
+
+class ApiView(View):
+    """
+    Base class of the read-only JSON API of the public page (see mtt/urls.py).
+    Payloads are compact: teams, players and tables are referred to by id, and their names are given once.
+    """
+    def get(self, request):
+        tournament = request.current_tournament
+        if not tournament:
+            return JsonResponse({'tournament': None})
+        data = {'tournament': tournament.pk, 'version': tournament.version}
+        data.update(self.get_data(tournament))
+        return JsonResponse(data)
+
+    def get_data(self, tournament):
+        raise NotImplementedError
+
+
+def team_scoreboard_row(team, score, rank):
+    return [team.pk, rank, json_score(score.primary), json_score(score.secondary), score.num_matches, [json_score(value) for value in score.tiebreaker_scores]]
+
+
+class TeamScoreboardApiView(ApiView):
+    """
+    Team scoreboard: list of [team id, rank, primary score, secondary score, number of matches, tiebreakers].
+    """
+    def get_data(self, tournament):
+        scoreboard = public_team_scoreboard(tournament)
+        return {
+            'teams': {team.pk: team.name for (team, score, rank) in scoreboard},
+            'scoreboard': [team_scoreboard_row(team, score, rank) for (team, score, rank) in scoreboard],
+        }
+
+
+class PlayerScoreboardApiView(ApiView):
+    """
+    Player scoreboard (only the shown players): list of [player id, rank, score].
+    """
+    def get_data(self, tournament):
+        scoreboard = public_player_scoreboard(tournament)
+        return {
+            'teams': {player.team_id: player.team.name for (player, score, rank) in scoreboard},
+            'players': {player.pk: [player.name, player.team_id] for (player, score, rank) in scoreboard},
+            'scoreboard': [[player.pk, rank, json_score(score.primary)] for (player, score, rank) in scoreboard],
+        }
+
+
+class RoundsApiView(ApiView):
+    """
+    Public rounds, with their matches, tables and (visible) results, from the latest one.
+    With ?since=<version>, only the rounds changed after the given version of the tournament are returned
+    (round_ids always lists all public rounds, so that clients can drop the deleted or hidden ones).
+    """
+    def get_data(self, tournament):
+        try:
+            since = int(self.request.GET.get('since', -1))
+        except ValueError:
+            since = -1
+
+        rounds = list(tournament.round_set.exclude(visibility=HIDE).order_by('-number'))
+        changed = [round for round in rounds if round.version > since]
+
+        # the data of each round is cached for its version, and matches are loaded only for the rounds which are not cached
+        data = {round.pk: cache.get_fragment('round-data', round.pk, round.version) for round in changed}
+        missing = [round for round in changed if data[round.pk] is None]
+        prefetch_related_objects(missing, matches_prefetch())
+        for round in missing:
+            data[round.pk] = round_data(round)
+            cache.set_fragment(data[round.pk], 'round-data', round.pk, round.version, permanent=round.is_complete())
+
+        team_ids = set(team_id for round in changed for match in data[round.pk]['matches'] for team_id in match[0])
+        table_ids = set(match[1] for round in changed for match in data[round.pk]['matches'] if match[1] is not None)
+        return {
+            'round_ids': [round.pk for round in rounds],
+            'rounds': [data[round.pk] for round in changed],
+            'teams': dict(Team.objects.filter(pk__in=team_ids).values_list('pk', 'name')),
+            'tables': dict(Table.objects.filter(pk__in=table_ids).values_list('pk', 'name')),
+        }
+
+
+class LiveFeedView(View):
+    """
+    Stream of the changes of the public data of the current tournament, as server-sent events (see live.py).
+    Clients wait for events without running queries, but every open stream keeps a thread of the server busy
+    (with WSGI, a worker thread per client); every LIVE_FEED_KEEPALIVE seconds a comment is sent
+    to keep the connection open, and after LIVE_FEED_MAX_DURATION seconds the stream ends (browsers reconnect
+    automatically, and receive the events they missed through the Last-Event-ID header).
+    A reset event tells the client that some events were lost, and that it should reload the data (e.g., from the JSON API).
+    """
+    def get(self, request):
+        tournament = request.current_tournament
+        try:
+            last_id = int(request.META.get('HTTP_LAST_EVENT_ID', request.GET.get('last', live.feed.last_id)))
+        except ValueError:
+            last_id = -1
+
+        response = StreamingHttpResponse(self.stream(tournament.pk if tournament else None, last_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # ask nginx not to buffer the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stream(self, tournament_id, last_id):
+        keepalive = getattr(settings, 'LIVE_FEED_KEEPALIVE', 15)
+        end_time = time.monotonic() + getattr(settings, 'LIVE_FEED_MAX_DURATION', 300)
+
+        yield 'retry: %d\n\n' % (1000 * keepalive)
+        while True:
+            events = live.feed.wait(last_id, timeout=max(0, min(keepalive, end_time - time.monotonic())))
+            if events is None:
+                last_id = live.feed.last_id
+                yield live.format_event(last_id, 'reset', {})
+            elif events:
+                last_id = events[-1][0]
+                yield ''.join(live.format_event(*event) for event in events if event[2]['tournament'] == tournament_id)
+            else:
+                yield ': keepalive\n\n'
+
+            if time.monotonic() >= end_time:
+                break
+
+
+class ProgressionView(TemplateView):
+    """
+    Score and rank of every team after each complete round, read from the round snapshots.
+    """
+    template_name = 'progression.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        tournament = self.request.current_tournament
+        context['tournament'] = tournament
+
+        if tournament:
+            rounds, progression = tournament.team_progression(public=True)
+            teams = Team.objects.filter(active=True).in_bulk(progression.keys())
+            rows = [(teams[team_id], items) for (team_id, items) in progression.items() if team_id in teams]
+
+            # sort by the latest rank
+            context['rows'] = sorted(rows, key=lambda x: (x[1][-1][1] if x[1][-1] is not None else len(rows) + 1, x[0].name))
+            context['rounds'] = rounds
 
         return context
 
@@ -175,5 +402,106 @@ class TablesView(ListView):
 class CreateRoundView(View):
     def dispatch(self, request, pk):
         tournament = Tournament.objects.get(pk=pk)
-        round, success = tournament.create_round()
+        job = jobs.submit_round_job(tournament)
+        round_job_message(request, job)
         return redirect('admin:index')
+
+
+def round_job_message(request, job):
+    """
+    Tell the user about the status of a round job.
+    """
+    if job.status == DONE:
+        link = format_html('<a href="{}">Round {}</a>', reverse('admin:tournament_round_change', args=(job.round.id,)), job.round.number)
+        if job.success:
+            messages.success(request, format_html('{} created.', link))
+        else:
+            messages.warning(request, format_html('{} created, but not all teams could be paired.', link))
+    elif job.status == FAILED:
+        messages.error(request, 'Round generation failed: %s' % job.error.strip().splitlines()[-1])
+    else:
+        messages.info(request, 'The new round is being generated in the background (see the progress in the admin home page).')
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class RoundJobView(View):
+    """
+    Status of a round job, as JSON.
+    """
+    def get(self, request, pk):
+        job = get_object_or_404(RoundJob, pk=pk)
+        return JsonResponse({
+            'id': job.pk,
+            'tournament': job.tournament_id,
+            'status': job.get_status_display().lower(),
+            'pending': job.pending(),
+            'round': job.round.number if job.round is not None else None,
+            'success': job.success,
+            'error': job.error,
+            'creation_time': job.creation_time,
+            'start_time': job.start_time,
+            'end_time': job.end_time,
+        })
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class PreviewRoundView(TemplateView):
+    """
+    Compute a new round without saving it, and show its pairs, tables and timings.
+    With ?format=json, the preview is returned as JSON.
+    """
+    template_name = 'round_preview.html'
+
+    def get(self, request, pk):
+        tournament = Tournament.objects.get(pk=pk)
+        preview = tournament.preview_round()
+
+        teams = Team.objects.in_bulk(preview['teams'])
+        tables = Table.objects.in_bulk(preview['tables'].values())
+        matches = [{
+            'teams': [teams[team] for team in pair],
+            'table': tables.get(preview['tables'].get(pair)),
+        } for pair in preview['pairs']]
+
+        if request.GET.get('format') == 'json':
+            return JsonResponse({
+                'token': preview['token'],
+                'round': preview['num_rounds'] + 1,
+                'matches': [{
+                    'teams': [{'id': team.pk, 'name': team.name} for team in match['teams']],
+                    'table': {'id': match['table'].pk, 'name': match['table'].name} if match['table'] is not None else None,
+                } for match in matches],
+                'timings': preview['timings'],
+            })
+
+        from .admin import admin_site
+        context = self.get_context_data(
+            **admin_site.each_context(request),
+            tournament=tournament,
+            preview=preview,
+            round_number=preview['num_rounds'] + 1,
+            matches=matches,
+            success=sum(len(pair) for pair in preview['pairs']) == len(preview['teams']),
+        )
+        return self.render_to_response(context)
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class CommitRoundView(View):
+    """
+    Create the round computed by PreviewRoundView.
+    """
+    def post(self, request, pk):
+        tournament = Tournament.objects.get(pk=pk)
+        result = tournament.commit_round_preview(request.POST.get('token'))
+        if result is None:
+            messages.error(request, 'The preview is no longer valid: please compute it again.')
+            return redirect('previewround', pk=pk)
+
+        round, success = result
+        if success:
+            messages.success(request, '%s created.' % round)
+        else:
+            messages.warning(request, '%s created, but not all teams could be paired.' % round)
+        return redirect('admin:index')
+